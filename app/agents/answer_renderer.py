@@ -0,0 +1,219 @@
+import math
+import numbers
+from typing import Any, Dict, List, Optional
+
+from app.data.filter_engine import describe_where
+
+
+# Per-tool phrasing, keyed by operation ("*" = any operation)
+DEFAULT_TEMPLATES: Dict[str, Dict[str, str]] = {
+    "direct": {
+        "count": "There are {value} matching records{filters}.",
+    },
+    "aggregation": {
+        "count": "Number of records by {group_by}:",
+        "sum": "Total {column} by {group_by}:",
+        "average": "Average {column} by {group_by}:",
+        "std": "Standard deviation of {column} by {group_by}:",
+        "min": "Lowest {column} by {group_by}:",
+        "max": "Highest {column} by {group_by}:",
+        "nunique": "Distinct {column} values by {group_by}:",
+        "*": "Results by {group_by}:",
+    },
+    "comparison": {
+        "count": "Number of records by {group_by}, compared with {baseline}:",
+        "sum": "Total {column} by {group_by}, compared with {baseline}:",
+        "average": "Average {column} by {group_by}, compared with {baseline}:",
+    },
+    "trend": {
+        "count": "Number of records{by} per year, {first_year}-{last_year}:",
+        "sum": "Total {column}{by} per year, {first_year}-{last_year}:",
+        "average": "Average {column}{by} per year, {first_year}-{last_year}:",
+    },
+}
+
+ROW_TEMPLATE = "- {group}: {value}"
+COMPARISON_ROW_TEMPLATE = "{rank}. {group}: {value}{versus}"
+TREND_ROW_TEMPLATE = "- {group}: {first} -> {last} ({change}, {pct_change}; CAGR {cagr}), {slope} per year"
+
+
+class AnswerRenderer:
+    """
+    Deterministic answers for small structured results.
+
+    Scalar (`direct`), grouped (`aggregation`), `comparison` and `trend`
+    outputs up to `max_rows` rows are phrased from templates. Everything else
+    (large results, free-text `list` rows) returns None and is left to
+    the answer LLM.
+    """
+
+    def __init__(
+        self,
+        max_rows: int = 20,
+        templates: Optional[Dict[str, Dict[str, str]]] = None
+    ):
+        self.max_rows = max_rows
+        self.templates = DEFAULT_TEMPLATES if templates is None else templates
+
+    def render(self, tool_response: Dict[str, Any]) -> Optional[str]:
+        tool = tool_response.get("tool")
+        templates = self.templates.get(tool)
+        if not templates:
+            return None
+
+        template = templates.get(tool_response.get("operation")) or templates.get("*")
+        if template is None:
+            return None
+
+        if tool == "direct":
+            return self._render_direct(template, tool_response)
+
+        if tool == "aggregation":
+            return self._render_aggregation(template, tool_response)
+
+        if tool == "comparison":
+            return self._render_comparison(template, tool_response)
+
+        if tool == "trend":
+            return self._render_trend(template, tool_response)
+
+        return None
+
+    # ---------- Per tool ----------
+
+    def _render_direct(self, template: str, response: Dict[str, Any]) -> Optional[str]:
+        value = response.get("value")
+        if value is None:
+            return None
+
+        filters = response.get("filters") or {}
+        conditions = [f"{column} = {val}" for column, val in filters.items()]
+        if response.get("where"):
+            conditions.append(describe_where(response["where"]))
+        described = " and ".join(conditions)
+
+        return template.format(
+            value=_format_number(value),
+            filters=f" for {described}" if described else "",
+        )
+
+    def _render_aggregation(self, template: str, response: Dict[str, Any]) -> Optional[str]:
+        rows: List[Dict[str, Any]] = response.get("results") or []
+        if not rows or len(rows) > self.max_rows:
+            return None
+
+        group_by = response.get("group_by")
+        keys = [group_by] if isinstance(group_by, str) else list(group_by or [])
+        metrics = response.get("metrics") or [response.get("operation")]
+
+        heading = template.format(group_by=", ".join(keys), column=response.get("column"))
+        if response.get("where"):
+            heading = f"{heading.rstrip(':')} for {describe_where(response['where'])}:"
+        # Thresholded groups must not read as if they were all of them
+        if response.get("having"):
+            heading = f"{heading.rstrip(':')} with {describe_where(response['having'])}:"
+
+        groups = response.get("groups")
+        if groups and groups > len(rows):
+            heading = f"{heading.rstrip(':')} ({len(rows)} of {groups} groups):"
+
+        lines = [heading]
+        for row in rows:
+            if len(metrics) == 1:
+                value = _format_number(row.get(metrics[0]))
+            else:
+                value = "; ".join(f"{metric} {_format_number(row.get(metric))}" for metric in metrics)
+
+            lines.append(ROW_TEMPLATE.format(
+                group=" / ".join(str(row.get(key)) for key in keys),
+                value=value,
+            ))
+
+        return "\n".join(lines)
+
+    def _render_comparison(self, template: str, response: Dict[str, Any]) -> Optional[str]:
+        rows: List[Dict[str, Any]] = response.get("results") or []
+        if not isinstance(rows, list) or not rows or len(rows) > self.max_rows:
+            return None
+
+        operation = response.get("operation")
+        group_by = response.get("group_by")
+        baseline = response.get("baseline")
+
+        heading = template.format(
+            group_by=group_by,
+            column=response.get("column"),
+            baseline=baseline,
+        )
+        if response.get("where"):
+            heading = f"{heading.rstrip(':')} for {describe_where(response['where'])}:"
+
+        lines = [heading]
+        for row in rows:
+            if row.get(group_by) == baseline:
+                versus = " (baseline)"
+            else:
+                versus = f" ({_format_signed(row.get('difference'))}, {_format_number(row.get('ratio'))}x)"
+
+            lines.append(COMPARISON_ROW_TEMPLATE.format(
+                rank=row.get("rank"),
+                group=row.get(group_by),
+                value=_format_number(row.get(operation)),
+                versus=versus,
+            ))
+
+        return "\n".join(lines)
+
+    def _render_trend(self, template: str, response: Dict[str, Any]) -> Optional[str]:
+        rows: List[Dict[str, Any]] = response.get("results") or []
+        years = response.get("years") or []
+        if not rows or not years or len(rows) > self.max_rows:
+            return None
+
+        group_by = response.get("group_by")
+        heading = template.format(
+            column=response.get("column"),
+            by=f" by {group_by}" if group_by else "",
+            first_year=years[0],
+            last_year=years[-1],
+        )
+        if response.get("where"):
+            heading = f"{heading.rstrip(':')} for {describe_where(response['where'])}:"
+
+        lines = [heading]
+        for row in rows:
+            lines.append(TREND_ROW_TEMPLATE.format(
+                group=row.get(group_by or "group"),
+                first=f"{_format_number(row.get('first'))} in {row.get('first_year')}",
+                last=f"{_format_number(row.get('last'))} in {row.get('last_year')}",
+                change=_format_signed(row.get("change")),
+                pct_change=_format_percent(row.get("pct_change")),
+                cagr=_format_percent(row.get("cagr_pct")),
+                slope=_format_signed(row.get("slope_per_year")),
+            ))
+
+        return "\n".join(lines)
+
+
+def _format_signed(value: Any) -> str:
+    formatted = _format_number(value)
+    if isinstance(value, numbers.Real) and not isinstance(value, bool) and value > 0:
+        return f"+{formatted}"
+    return formatted
+
+
+def _format_percent(value: Any) -> str:
+    return "n/a" if value is None else f"{_format_signed(value)}%"
+
+
+def _format_number(value: Any) -> str:
+    if value is None or (isinstance(value, numbers.Real) and math.isnan(value)):
+        return "n/a"
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, numbers.Integral):
+        return f"{int(value):,}"
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return f"{value:,.0f}" if value.is_integer() else f"{value:,.2f}"
+    return str(value)
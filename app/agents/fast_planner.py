@@ -0,0 +1,570 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import pandas as pd
+
+
+# Natural-language names for dataset columns (applied only if the column exists)
+DEFAULT_SYNONYMS = {
+    "country": "SITE_COUNTRY",
+    "region": "SITE_REGION",
+    "site": "SITE_NAME",
+    "year": "EFFECTIVE_YEAR",
+    "category": "CATEGORY",
+    "level": "CLASSIFICATION_LEVEL",
+    "classification": "CLASSIFICATION_LEVEL",
+    "maturity level": "CLASSIFICATION_LEVEL",
+    "company": "INITIATIVE_NAME",
+    "survey": "SURVEY_NAME",
+    "verification": "VERIFICATION_STATUS",
+    "score": "SCORE",
+}
+
+# Words that introduce the group-by column
+GROUP_MARKERS = re.compile(r"\b(?:grouped by|broken down by|for each|by|per|across)\b")
+
+OPERATION_WORDS = {
+    "count": {"how many", "number of", "count", "count of"},
+    "sum": {"total", "sum", "sum of", "combined"},
+    "average": {"average", "avg", "mean", "typical"},
+    "std": {"std", "standard deviation", "variability", "spread"},
+    "min": {"min", "minimum"},
+    "max": {"max", "maximum"},
+}
+
+# Operations trend and comparison support
+SERIES_OPERATIONS = {"count", "sum", "average"}
+
+# "top 5 sites by ..." -> top-k of the aggregation
+TOP_RE = re.compile(r"\b(top|bottom) (\d+)\b")
+
+LIST_WORDS = {"list", "show", "which", "what", "display", "find", "give"}
+
+# Free-text intent ("related to X") needs the LLM's semantic judgement
+FREE_TEXT_MARKERS = re.compile(
+    r"\b(?:related to|relating to|about|mention|mentions|mentioning|contain|"
+    r"contains|containing|involving|regarding|anything to do with|like)\b"
+)
+
+# Negation inverts a filter; the templates cannot express it safely
+NEGATION_MARKERS = re.compile(
+    r"\b(?:not|except|excluding|exclude|excludes|excluded|without|other than|"
+    r"outside|neither|nor|[a-z]+n't)\b"
+)
+
+# Change-over-time intent ("how has X changed over the years")
+TREND_MARKERS = re.compile(
+    r"\b(?:over the years|over time|year over year|year on year|trends?|trending|"
+    r"changed|change|evolved|grown|growth)\b"
+)
+
+# Several values set against each other ("India vs Kenya")
+COMPARE_MARKERS = re.compile(r"\b(?:compare|compared|comparing|comparison|versus|vs|against)\b")
+
+# Words that carry no meaning of their own in these templates
+FILLER_WORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "is", "are", "was",
+    "were", "there", "me", "please", "can", "you", "all", "and", "with",
+    "do", "does", "we", "have", "has", "each", "under", "from", "during",
+    "data", "dataset", "currently", "present", "overall", "or", "how", "did",
+}
+
+# What a row is called; "how many initiatives" counts rows
+RECORD_NOUNS = {
+    "initiative", "initiatives", "record", "records", "row", "rows",
+    "entry", "entries", "response", "responses", "result", "results",
+}
+
+WORD_RE = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+
+# Year ranges on the year-like column ("since 2022", "between 2021 and 2023")
+YEAR_SPAN_RE = re.compile(r"\b(?:between|from) (\d{4}) (?:and|to) (\d{4})\b")
+YEAR_BOUND_RE = re.compile(r"\b(since|after|before|until|till|from) (\d{4})\b")
+YEAR_BOUNDS = {"since": "gte", "from": "gte", "after": "gt", "before": "lt", "until": "lte", "till": "lte"}
+
+
+class FastPathPlanner:
+    """
+    Deterministic planner for the common query shapes:
+
+    - "how many X by Y"                   -> aggregation / count
+    - "total|average SCORE by CATEGORY"   -> aggregation / sum|average
+    - "top 5 Y by average SCORE", "... by Y and Z" -> top-k / multi-key aggregation
+    - "how many X in 2024 for <value>"    -> direct / count with filters
+    - "list initiatives in 2024 for <v>"  -> list with filters
+    - "how has average SCORE changed by Y" -> trend over the year column
+    - "compare <value> and <value>"      -> comparison of those values
+
+    Several values of one column become an `in` condition and year
+    phrases such as "since 2022" a `range` (see app.data.filter_engine).
+
+    Column names, synonyms and known cell values come from the loaded
+    frame and are rebuilt whenever a new snapshot is loaded. Every plan
+    carries a confidence; the agent only trusts high-confidence plans
+    and asks the LLM otherwise.
+    """
+
+    # Columns with more distinct values than this are not matched by value
+    MAX_VALUE_CARDINALITY = 500
+    # Cell values longer than this (free text) are not matched by value
+    MAX_VALUE_LENGTH = 60
+    # Per unexplained content word: one is enough to drop the surest
+    # template (0.95) below the default trust threshold (0.75)
+    LEFTOVER_PENALTY = 0.7
+
+    def __init__(self, dataframe_manager, synonyms: Optional[Dict[str, str]] = None):
+        self.df_manager = dataframe_manager
+        self.synonyms = DEFAULT_SYNONYMS if synonyms is None else synonyms
+
+        self._generation: Optional[int] = None
+        self._columns: Dict[str, str] = {}
+        self._values: Dict[str, List[Tuple[str, Any]]] = {}
+        self._numeric: set = set()
+        self._year_columns: List[str] = []
+        self._max_phrase = 1
+        self._lock = threading.Lock()
+
+    # ---------- Vocabulary ----------
+
+    def refresh(self) -> None:
+        generation = self.df_manager.generation
+        if generation == self._generation:
+            return
+
+        with self._lock:
+            if generation == self._generation:
+                return
+
+            df = self.df_manager.get_dataframe()
+            columns: Dict[str, str] = {}
+            values: Dict[str, List[Tuple[str, Any]]] = {}
+
+            for column in df.columns:
+                columns[_phrase(column.replace("_", " "))] = column
+
+            for phrase, column in self.synonyms.items():
+                if column in df.columns:
+                    columns.setdefault(_phrase(phrase), column)
+
+            for column in df.columns:
+                for value in self._matchable_values(df[column]):
+                    values.setdefault(_phrase(str(value)), []).append((column, value))
+
+            self._columns = columns
+            self._values = values
+            self._numeric = {
+                column for column in df.columns
+                if pd.api.types.is_numeric_dtype(df[column])
+            }
+            self._year_columns = [column for column in df.columns if _is_year_like(df[column])]
+            self._max_phrase = max(
+                len(phrase.split()) for phrase in list(columns) + list(values)
+            )
+            self._generation = generation
+
+    def _matchable_values(self, series: pd.Series) -> List[Any]:
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories
+            if len(categories) > self.MAX_VALUE_CARDINALITY:
+                return []
+            return [
+                value for value in categories
+                if isinstance(value, str) and 3 <= len(value) <= self.MAX_VALUE_LENGTH
+            ]
+
+        # Year-like integer columns: "2024" is a value of EFFECTIVE_YEAR
+        if _is_year_like(series):
+            return [int(value) for value in series.unique()]
+
+        return []
+
+    # ---------- Planning ----------
+
+    def plan(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        {"tool", "params", "confidence"} for the best matching template,
+        or None when the query does not look like any of them.
+        """
+        self.refresh()
+
+        text = " ".join(WORD_RE.findall(query.lower().replace("’", "'")))
+        if not text or NEGATION_MARKERS.search(text):
+            return None
+
+        penalty = 1.0
+        if FREE_TEXT_MARKERS.search(text):
+            penalty *= 0.5
+
+        ranges, text = self._extract_year_range(text)
+
+        trend = TREND_MARKERS.search(text) is not None
+        if trend:
+            text = " ".join(TREND_MARKERS.sub(" ", text).split())
+
+        compare = COMPARE_MARKERS.search(text) is not None
+        if compare:
+            text = " ".join(COMPARE_MARKERS.sub(" ", text).split())
+
+        top = TOP_RE.search(text)
+        if top:
+            text = " ".join((text[:top.start()] + " " + text[top.end():]).split())
+
+        operation, text = _extract_operation(text, self._protected_spans(text))
+
+        # Last group marker that is not part of a column name
+        # ("total score by initiatives")
+        protected = self._protected_spans(text)
+        marker = None
+        for match in GROUP_MARKERS.finditer(text):
+            if not _inside(match.span(), protected):
+                marker = match
+        head, tail = (text[:marker.start()], text[marker.end():]) if marker else (text, "")
+
+        # Top-k only fits a grouped aggregation
+        if top and (marker is None or trend or compare):
+            return None
+
+        head_matches, head_leftover = self._match(head)
+        tail_matches, tail_leftover = self._match(tail)
+
+        filters, alternatives, ambiguous = _filters(
+            head_matches + [m for m in tail_matches if m[0] == "value"]
+        )
+        if ambiguous:
+            penalty *= 0.6
+
+        # Conditions plain column = value filters cannot express
+        conditions = [{"in": alternatives}] if alternatives else []
+        if ranges:
+            conditions.append({"range": ranges})
+
+        leftover = [
+            word for word in head_leftover + tail_leftover
+            if word not in FILLER_WORDS
+            and word not in RECORD_NOUNS
+            and word not in LIST_WORDS
+        ]
+        penalty *= self.LEFTOVER_PENALTY ** len(leftover)
+
+        # "how many sites ..." counts distinct values, not rows
+        counted = [
+            m[1] for m in head_matches
+            if m[0] == "column" and m[1] not in self._numeric
+        ]
+        if counted and not top:
+            penalty *= 0.5
+
+        # ----------------------------
+        # "how has ... changed (by <column>)" -> trend
+        # ----------------------------
+        if trend:
+            if not self._year_columns:
+                return None
+
+            group_columns = [
+                m[1] for m in tail_matches
+                if m[0] == "column" and m[1] not in self._year_columns
+            ]
+            if len(group_columns) > 1:
+                penalty *= 0.6
+
+            measures = [
+                m[1] for m in head_matches
+                if m[0] == "column" and m[1] in self._numeric
+                and m[1] not in self._year_columns and m[1] not in group_columns
+            ]
+
+            operation = operation or ("average" if measures else "count")
+            if operation not in SERIES_OPERATIONS:
+                return None
+
+            params = {
+                "operation": operation,
+                "group_by": group_columns[0] if group_columns else None,
+                "column": None,
+            }
+            if operation != "count":
+                if not measures:
+                    return None
+                params["column"] = measures[0]
+
+            where = _where(([{"eq": filters}] if filters else []) + conditions)
+            if where:
+                params["where"] = where
+
+            return {
+                "tool": "trend",
+                "params": params,
+                "confidence": round(0.9 * penalty, 3),
+            }
+
+        # ----------------------------
+        # "compare <value> and <value>" -> comparison
+        # ----------------------------
+        if compare and len(alternatives) == 1:
+            (group_by, values), = alternatives.items()
+
+            measures = [
+                m[1] for m in head_matches + tail_matches
+                if m[0] == "column" and m[1] in self._numeric and m[1] != group_by
+            ]
+
+            operation = operation or ("average" if measures else "count")
+            if operation not in SERIES_OPERATIONS:
+                return None
+
+            params = {
+                "operation": operation,
+                "group_by": group_by,
+                "values": values,
+                "column": None,
+            }
+            if operation != "count":
+                if not measures:
+                    return None
+                params["column"] = measures[0]
+
+            where = _where(
+                ([{"eq": filters}] if filters else [])
+                + ([{"range": ranges}] if ranges else [])
+            )
+            if where:
+                params["where"] = where
+
+            return {
+                "tool": "comparison",
+                "params": params,
+                "confidence": round(0.9 * penalty, 3),
+            }
+
+        # ----------------------------
+        # "... by <column>" -> aggregation
+        # ----------------------------
+        if marker is not None:
+            # "top 5 sites by average score": the groups come before the
+            # marker and the ranking metric after it
+            group_side, measure_side = (head_matches, tail_matches) if top else (tail_matches, head_matches)
+
+            group_columns = list(dict.fromkeys(
+                m[1] for m in group_side
+                if m[0] == "column" and not (top and m[1] in self._numeric)
+            ))
+            if not group_columns:
+                return None
+
+            # "by category and year" -> one multi-column key
+            group_by = group_columns[0] if len(group_columns) == 1 else group_columns
+            measures = [
+                m[1] for m in measure_side
+                if m[0] == "column" and m[1] in self._numeric and m[1] not in group_columns
+            ]
+
+            operation = operation or ("sum" if measures else "count")
+            column = None
+
+            if operation != "count":
+                if not measures:
+                    return None
+                column = measures[0]
+
+            params = {
+                "operation": operation,
+                "group_by": group_by,
+                "column": column,
+            }
+
+            # AggregationTool takes row conditions as a `where` tree only
+            where = _where(([{"eq": filters}] if filters else []) + conditions)
+            if where:
+                params["where"] = where
+
+            if top:
+                params["limit"] = int(top.group(2))
+                if top.group(1) == "bottom":
+                    params["order"] = "asc"
+
+            return {
+                "tool": "aggregation",
+                "params": params,
+                "confidence": round(0.95 * penalty, 3),
+            }
+
+        # ----------------------------
+        # "how many ... <values>" -> direct count
+        # ----------------------------
+        where = _where(conditions)
+
+        if operation == "count":
+            params = {"operation": "count", "filters": filters}
+            if where:
+                params["where"] = where
+
+            return {
+                "tool": "direct",
+                "params": params,
+                "confidence": round(0.9 * penalty, 3),
+            }
+
+        # ----------------------------
+        # "list ... <values>" -> list
+        # ----------------------------
+        if operation is None and set(head.split()) & LIST_WORDS and (filters or where):
+            params = {"filters": filters}
+            if where:
+                params["where"] = where
+
+            return {
+                "tool": "list",
+                "params": params,
+                "confidence": round(0.9 * penalty, 3),
+            }
+
+        return None
+
+    def _extract_year_range(self, text: str) -> Tuple[Dict[str, Dict[str, int]], str]:
+        """
+        {year column: bounds} for "since 2022" / "between 2021 and 2023"
+        phrases, and the text without them. Needs exactly one year-like
+        column to attach the range to.
+        """
+        if len(self._year_columns) != 1:
+            return {}, text
+
+        bounds: Dict[str, int] = {}
+
+        span = YEAR_SPAN_RE.search(text)
+        if span:
+            low, high = sorted((int(span.group(1)), int(span.group(2))))
+            bounds.update(gte=low, lte=high)
+            text = text[:span.start()] + " " + text[span.end():]
+
+        for match in list(YEAR_BOUND_RE.finditer(text))[::-1]:
+            bounds[YEAR_BOUNDS[match.group(1)]] = int(match.group(2))
+            text = text[:match.start()] + " " + text[match.end():]
+
+        if not bounds:
+            return {}, text
+
+        return {self._year_columns[0]: bounds}, " ".join(text.split())
+
+    def _protected_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Spans of multi-word column names, whose words must not be read
+        as operations or group markers.
+        """
+        return [
+            match.span()
+            for phrase in self._columns
+            if " " in phrase
+            for match in re.finditer(rf"\b{re.escape(phrase)}s?\b", text)
+        ]
+
+    def _match(self, text: str) -> Tuple[List[Tuple], List[str]]:
+        """
+        Longest-match scan for value and column phrases.
+
+        Returns ("value", column, value, ambiguous_columns) and
+        ("column", column) matches, plus the words nothing explained.
+        """
+        words = text.split()
+        matches: List[Tuple] = []
+        leftover: List[str] = []
+        i = 0
+
+        while i < len(words):
+            for n in range(min(self._max_phrase, len(words) - i), 0, -1):
+                phrase = " ".join(words[i:i + n])
+                singular = _singular(phrase)
+
+                hits = self._values.get(phrase) or self._values.get(singular)
+                if hits:
+                    column, value = hits[0]
+                    matches.append(("value", column, value, len(hits) > 1))
+                    i += n
+                    break
+
+                column = self._columns.get(phrase) or self._columns.get(singular)
+                if column:
+                    matches.append(("column", column))
+                    i += n
+                    break
+            else:
+                leftover.append(words[i])
+                i += 1
+
+        return matches, leftover
+
+
+# ---------- Helpers ----------
+
+def _phrase(text: str) -> str:
+    return " ".join(WORD_RE.findall(text.lower()))
+
+
+def _singular(phrase: str) -> str:
+    # "countries" -> "country"
+    if len(phrase) > 4 and phrase.endswith("ies"):
+        return phrase[:-3] + "y"
+    if len(phrase) > 3 and phrase.endswith("s") and not phrase.endswith("ss"):
+        return phrase[:-1]
+    return phrase
+
+
+def _inside(span: Tuple[int, int], protected: List[Tuple[int, int]]) -> bool:
+    return any(start <= span[0] and span[1] <= end for start, end in protected)
+
+
+def _extract_operation(
+    text: str,
+    protected: List[Tuple[int, int]]
+) -> Tuple[Optional[str], str]:
+    """
+    Detect the aggregation operation and remove its words from `text`.
+    Longer phrases win ("number of" before "number").
+    """
+    candidates = sorted(
+        ((phrase, operation) for operation, phrases in OPERATION_WORDS.items() for phrase in phrases),
+        key=lambda item: -len(item[0])
+    )
+
+    for phrase, operation in candidates:
+        for match in re.finditer(rf"\b{re.escape(phrase)}\b", text):
+            if not _inside(match.span(), protected):
+                remaining = text[:match.start()] + " " + text[match.end():]
+                return operation, " ".join(remaining.split())
+
+    return None, text
+
+
+def _is_year_like(series: pd.Series) -> bool:
+    if not pd.api.types.is_integer_dtype(series) or not len(series):
+        return False
+    return 1900 <= series.min() and series.max() <= 2100
+
+
+def _filters(matches: List[Tuple]) -> Tuple[Dict[str, Any], Dict[str, List[Any]], bool]:
+    """
+    column = value filters, plus {column: [values]} for columns named
+    with several values ("in 2023 and 2024"), plus an ambiguity flag.
+    """
+    values: Dict[str, List[Any]] = {}
+    ambiguous = False
+
+    for match in matches:
+        if match[0] != "value":
+            continue
+        _, column, value, is_ambiguous = match
+        if value not in values.setdefault(column, []):
+            values[column].append(value)
+        ambiguous = ambiguous or is_ambiguous
+
+    filters = {column: found[0] for column, found in values.items() if len(found) == 1}
+    alternatives = {column: found for column, found in values.items() if len(found) > 1}
+
+    return filters, alternatives, ambiguous
+
+
+def _where(conditions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"and": conditions}
@@ -0,0 +1,240 @@
+import copy
+import re
+import threading
+import zlib
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+
+from app.agents.fast_planner import NEGATION_MARKERS
+
+
+# Function words that do not change which tool / params a question maps to
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "by", "per", "with",
+    "and", "or", "is", "are", "was", "were", "be", "do", "does", "did",
+    "what", "which", "how", "much", "me", "show", "give", "list", "tell",
+    "please", "can", "could", "you", "i", "we", "there", "each", "every",
+    "all", "across", "grouped", "group", "broken", "down",
+}
+
+# Different words for the same operation share one token
+SYNONYMS = {
+    "many": "count",
+    "number": "count",
+    "total": "sum",
+    "amount": "sum",
+    "mean": "average",
+    "avg": "average",
+}
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def canonical_query(query: str) -> str:
+    """
+    Lowercase, collapse whitespace, strip trailing punctuation.
+
+    Identity for "the same question": unlike normalize_query it keeps
+    every word, so "India and Kenya" and "India or Kenya" stay apart.
+    """
+    return WHITESPACE_RE.sub(" ", query.lower()).strip().rstrip("?.!").rstrip()
+
+
+def normalize_query(query: str) -> str:
+    """
+    Lowercase, drop punctuation and stopwords, map operation synonyms,
+    strip plurals ("-ies" -> "-y", else a trailing "s").
+
+    "How many initiatives per country?" and "number of initiatives by
+    country" both normalize to "count initiative country".
+    """
+    words = []
+    for word in WORD_RE.findall(query.lower()):
+        if word in STOPWORDS:
+            continue
+        words.append(_singular(SYNONYMS.get(word, word)))
+
+    return " ".join(words)
+
+
+class PlanCache:
+    """
+    Semantic cache of tool plans keyed by normalized query.
+
+    Lookups embed the query as a hashed word + character-trigram vector
+    and take the most similar stored query by cosine similarity (one
+    NumPy matrix-vector product). A similar query only matches if it
+    has the same numbers, negations and column words (see
+    `_exact_terms`). Entries are dropped whenever the dataset schema
+    changes.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.92,
+        max_entries: int = 1024,
+        dimensions: int = 1024
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+
+        self._matrix = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self._keys: List[Optional[str]] = [None] * max_entries
+        self._plans: List[Optional[Dict[str, Any]]] = [None] * max_entries
+        self._exact: List[frozenset] = [frozenset()] * max_entries
+        self._column_words: frozenset = frozenset()
+        self._slots: Dict[str, int] = {}
+        self._next_slot = 0
+        self._schema: Optional[Hashable] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    # ---------- Access ----------
+
+    def lookup(self, query: str, schema: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Cached plan for the closest stored query, or None.
+        Returns a copy: tools may mutate their params.
+        """
+        key = normalize_query(query)
+
+        with self._lock:
+            self._check_schema(schema)
+
+            slot = self._slots.get(key)
+
+            if slot is None and self._slots:
+                similarities = self._matrix @ self._vectorize(key)
+                best = int(np.argmax(similarities))
+
+                # Numbers, negations and column words must match exactly:
+                # "2023" / "2024", "verified" / "not verified" and "by
+                # country" / "by site" are lexically close but mean
+                # different plans
+                if (
+                    similarities[best] >= self.similarity_threshold
+                    and self._exact[best] == self._exact_terms(query, key)
+                ):
+                    slot = best
+
+            if slot is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return copy.deepcopy(self._plans[slot])
+
+    def store(self, query: str, schema: Hashable, plan: Dict[str, Any]) -> None:
+        key = normalize_query(query)
+
+        with self._lock:
+            self._check_schema(schema)
+
+            slot = self._slots.get(key)
+            if slot is None:
+                # Ring buffer: overwrite the oldest entry when full
+                slot = self._next_slot
+                self._next_slot = (slot + 1) % self.max_entries
+
+                evicted = self._keys[slot]
+                if evicted is not None:
+                    del self._slots[evicted]
+
+            self._matrix[slot] = self._vectorize(key)
+            self._keys[slot] = key
+            self._plans[slot] = copy.deepcopy(plan)
+            self._exact[slot] = self._exact_terms(query, key)
+            self._slots[key] = slot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._slots),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    # ---------- Internals ----------
+
+    def _check_schema(self, schema: Hashable) -> None:
+        if schema != self._schema:
+            self._clear()
+            self._schema = schema
+            self._column_words = _column_words(schema)
+
+    def _clear(self) -> None:
+        self._matrix[:] = 0
+        self._keys = [None] * self.max_entries
+        self._plans = [None] * self.max_entries
+        self._exact = [frozenset()] * self.max_entries
+        self._slots = {}
+        self._next_slot = 0
+
+    def _exact_terms(self, query: str, normalized: str) -> frozenset:
+        """
+        Terms two queries must share to reuse a plan: numbers, negation
+        markers (same list as the fast path; read from the raw query, as
+        normalization splits "isn't") and words naming a column.
+        """
+        words = normalized.split()
+        return frozenset(
+            [("number", word) for word in words if word.isdigit()]
+            + [("negation", marker) for marker in NEGATION_MARKERS.findall(query.lower())]
+            + [("column", word) for word in words if word in self._column_words]
+        )
+
+    def _vectorize(self, normalized: str) -> np.ndarray:
+        """
+        L2-normalized hashed bag of words (weight 1) and
+        character trigrams (weight 0.5).
+        """
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+
+        for word in normalized.split():
+            vector[_bucket("w:" + word, self.dimensions)] += 1.0
+
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                vector[_bucket("g:" + padded[i:i + 3], self.dimensions)] += 0.5
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def _bucket(feature: str, dimensions: int) -> int:
+    # crc32 is stable across processes, unlike hash()
+    return zlib.crc32(feature.encode("utf-8")) % dimensions
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _column_words(schema: Hashable) -> frozenset:
+    """
+    Normalized words of the column names in a schema tuple
+    ("SITE_COUNTRY" -> "site", "country").
+    """
+    if not isinstance(schema, (tuple, list)):
+        return frozenset()
+
+    return frozenset(
+        word
+        for column in schema
+        for word in normalize_query(str(column).replace("_", " ")).split()
+    )
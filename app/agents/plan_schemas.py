@@ -0,0 +1,269 @@
+from functools import lru_cache
+from typing import Annotated, Any, Dict, List, Literal, Optional, Sequence, Tuple, Type, Union
+from pydantic import AfterValidator, BaseModel, ConfigDict, Field, ValidationError, model_validator
+
+from app.data.filter_engine import compile_where, map_columns
+
+
+def _check_where(tree: Dict[str, Any]) -> Dict[str, Any]:
+    compile_where(tree)  # ValueError -> validation error naming the bad node
+    return tree
+
+
+# Predicate tree, see app.data.filter_engine
+WhereTree = Annotated[
+    Dict[str, Any],
+    AfterValidator(_check_where),
+    Field(description=(
+        "Row conditions: {op: operand} with op in eq, in, range "
+        "(gt/gte/lt/lte), is_null, contains, not, and, or. "
+        'E.g. {"and": [{"range": {"EFFECTIVE_YEAR": {"gte": 2022}}}, '
+        '{"in": {"SITE_COUNTRY": ["India", "Kenya"]}}]}'
+    )),
+]
+
+
+# ---------- Per-tool params ----------
+
+class _Params(BaseModel):
+    # Unknown keys are hallucinations: reject them so the repair turn fixes them
+    model_config = ConfigDict(extra="forbid")
+
+
+AggregationOperation = Literal["count", "sum", "average", "std", "min", "max", "nunique"]
+
+
+class MetricSpec(_Params):
+    operation: AggregationOperation
+    column: Optional[str] = None
+
+
+class AggregationParams(_Params):
+    operation: Optional[AggregationOperation] = None
+    group_by: Union[str, List[str]]
+    column: Optional[str] = None
+    metrics: Optional[List[MetricSpec]] = Field(
+        default=None,
+        min_length=1,
+        description='Several metrics at once; result columns "count" and "<operation>_<column>".',
+    )
+    where: Optional[WhereTree] = None
+    having: Optional[WhereTree] = Field(
+        default=None,
+        description="Conditions on the per-group results, naming metric result columns.",
+    )
+    sort_by: Optional[str] = None
+    order: Optional[Literal["asc", "desc"]] = None
+    limit: Optional[int] = Field(default=None, ge=1)
+
+    @model_validator(mode="after")
+    def _needs_operation(self) -> "AggregationParams":
+        if self.operation is None and not self.metrics:
+            raise ValueError("either operation or metrics is required")
+        return self
+
+
+class ListParams(_Params):
+    filters: Dict[str, Any] = Field(default_factory=dict)
+    where: Optional[WhereTree] = None
+    contains: Optional[Union[Dict[str, str], str]] = None
+    keywords: Optional[Union[Dict[str, str], str]] = None
+    sort: Optional[Literal["relevance"]] = None
+    limit: Optional[int] = Field(default=None, ge=1)
+    columns: Optional[List[str]] = None
+
+
+class DirectParams(_Params):
+    operation: Literal["count"] = "count"
+    filters: Dict[str, Any] = Field(default_factory=dict)
+    where: Optional[WhereTree] = None
+
+
+class ComparisonParams(_Params):
+    operation: Literal["count", "sum", "average"] = "count"
+    group_by: str
+    values: Optional[List[Union[int, float, str]]] = Field(default=None, min_length=2)
+    column: Optional[str] = None
+    where: Optional[WhereTree] = None
+
+
+class TrendParams(_Params):
+    operation: Literal["count", "sum", "average"] = "count"
+    group_by: Optional[str] = None
+    column: Optional[str] = None
+    where: Optional[WhereTree] = None
+
+
+class NoneParams(_Params):
+    pass
+
+
+PARAM_MODELS: Dict[str, Type[_Params]] = {
+    "aggregation": AggregationParams,
+    "list": ListParams,
+    "direct": DirectParams,
+    "comparison": ComparisonParams,
+    "trend": TrendParams,
+    "none": NoneParams,
+}
+
+TOOL_DESCRIPTIONS = {
+    "aggregation": "Counts, totals, averages, spread, min / max or distinct counts per group, optionally thresholded and top-k.",
+    "list": "Row-level records matching filters and text conditions.",
+    "direct": "A single number, e.g. how many records match some filters.",
+    "comparison": "Rank and compare a count, total or average across values of a column.",
+    "trend": "How a count, total or average changes over EFFECTIVE_YEAR, overall or per group.",
+    "none": "The question cannot be answered from the dataset columns.",
+}
+
+
+class PlanValidationError(ValueError):
+    pass
+
+
+# ---------- Function-calling schema ----------
+
+@lru_cache(maxsize=16)
+def plan_functions(tools: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """
+    One function per available tool (plus "none"), parameters given by
+    the tool's params model, in Chat Completions `tools` format.
+    Cached: the schema only changes with the tool set.
+    """
+    names = [name for name in PARAM_MODELS if name in tools or name == "none"]
+
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": name,
+                "description": TOOL_DESCRIPTIONS[name],
+                "parameters": PARAM_MODELS[name].model_json_schema(),
+            },
+        }
+        for name in names
+    ]
+
+
+# ---------- Validation ----------
+
+def validate_plan(
+    plan: Any,
+    columns: Sequence[str],
+    tools: Sequence[str]
+) -> Dict[str, Any]:
+    """
+    Check a {"tool", "params"} plan against the params model of its tool
+    and the live column set.
+
+    Returns the plan with params normalized (defaults filled in, column
+    names mapped to their exact spelling). Raises PlanValidationError
+    listing every problem.
+    """
+    if not isinstance(plan, dict) or "tool" not in plan or "params" not in plan:
+        raise PlanValidationError('Plan must be an object with "tool" and "params"')
+
+    tool = plan["tool"]
+    if tool != "none" and tool not in tools:
+        raise PlanValidationError(f"Unsupported tool selected: {tool}")
+
+    model = PARAM_MODELS.get(tool)
+    if model is None:
+        raise PlanValidationError(f"Unsupported tool selected: {tool}")
+
+    try:
+        params = model.model_validate(plan["params"] or {})
+    except ValidationError as e:
+        problems = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'params'}: {error['msg']}"
+            for error in e.errors()
+        )
+        raise PlanValidationError(f"Invalid params for {tool}: {problems}") from e
+
+    resolver = _ColumnResolver(columns)
+    params = _resolve_columns(params, resolver)
+
+    if resolver.unknown:
+        raise PlanValidationError(
+            "Unknown columns: " + ", ".join(sorted(resolver.unknown))
+        )
+
+    return {"tool": tool, "params": params.model_dump(exclude_none=True)}
+
+
+class _ColumnResolver:
+    def __init__(self, columns: Sequence[str]):
+        self._by_key = {_column_key(column): column for column in columns}
+        self.unknown: set = set()
+
+    def __call__(self, column: str) -> str:
+        resolved = self._by_key.get(_column_key(column))
+        if resolved is None:
+            self.unknown.add(column)
+            return column
+        return resolved
+
+    def known(self, column: str) -> str:
+        """
+        Exact spelling of a dataset column; anything else unchanged.
+        """
+        return self._by_key.get(_column_key(column), column)
+
+    def mapping(self, values: Optional[Union[Dict[str, Any], str]]):
+        if not isinstance(values, dict):
+            return values
+        return {self(column): value for column, value in values.items()}
+
+
+def _resolve_columns(params: _Params, resolve: _ColumnResolver) -> _Params:
+    if isinstance(params, AggregationParams):
+        return params.model_copy(update={
+            "group_by": (
+                resolve(params.group_by) if isinstance(params.group_by, str)
+                else [resolve(c) for c in params.group_by]
+            ),
+            "column": resolve(params.column) if params.column else None,
+            "metrics": [
+                metric.model_copy(update={"column": resolve(metric.column) if metric.column else None})
+                for metric in params.metrics
+            ] if params.metrics else None,
+            "where": map_columns(params.where, resolve),
+            # Metric result names ("count") are not dataset columns
+            "sort_by": resolve.known(params.sort_by) if params.sort_by else None,
+        })
+
+    if isinstance(params, ListParams):
+        return params.model_copy(update={
+            "filters": resolve.mapping(params.filters),
+            "where": map_columns(params.where, resolve),
+            "contains": resolve.mapping(params.contains),
+            "keywords": resolve.mapping(params.keywords),
+            "columns": [resolve(c) for c in params.columns] if params.columns else None,
+        })
+
+    if isinstance(params, DirectParams):
+        return params.model_copy(update={
+            "filters": resolve.mapping(params.filters),
+            "where": map_columns(params.where, resolve),
+        })
+
+    if isinstance(params, TrendParams):
+        return params.model_copy(update={
+            "group_by": resolve(params.group_by) if params.group_by else None,
+            "column": resolve(params.column) if params.column else None,
+            "where": map_columns(params.where, resolve),
+        })
+
+    if isinstance(params, ComparisonParams):
+        return params.model_copy(update={
+            "group_by": resolve(params.group_by),
+            "column": resolve(params.column) if params.column else None,
+            "where": map_columns(params.where, resolve),
+        })
+
+    return params
+
+
+def _column_key(column: str) -> str:
+    # Same normalization as BaseTool._normalize_column
+    return column.strip().replace(" ", "_").upper()
@@ -1,6 +1,27 @@
-from typing import Dict, Any
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, Union
+import asyncio
 import json
 import re
+import threading
+import time
+
+from app.agents.answer_renderer import AnswerRenderer
+from app.agents.fast_planner import FastPathPlanner
+from app.agents.plan_cache import PlanCache, canonical_query
+from app.agents.plan_schemas import plan_functions, validate_plan
+from app.agents.result_compactor import ResultCompactor
+from app.tools.base_tool import count_rows_scanned
+from app.utils.metrics import PLAN_SOURCE, TOOL_ROWS_RETURNED, TOOL_ROWS_SCANNED, TOOL_SECONDS
+from app.utils.resilience import CircuitOpenError
+from app.utils.result_cache import ResultCache
+from app.utils.token_estimator import estimate_message_tokens, estimate_tokens
+from app.utils.tracing import annotate, span
+
+
+NO_DATA_ANSWER = (
+    "The dataset does not contain enough information "
+    "to answer this question."
+)
 
 
 class ReActAgent:
@@ -12,15 +33,47 @@ class ReActAgent:
     - Generates human-readable answers
     """
 
-    def __init__(self, llm_client, dataframe_manager, tools: Dict[str, Any]):
+    def __init__(
+        self,
+        llm_client,
+        dataframe_manager,
+        tools: Dict[str, Any],
+        result_cache: Optional[ResultCache] = None,
+        plan_cache: Optional[PlanCache] = None,
+        fast_planner: Optional[FastPathPlanner] = None,
+        fast_path_min_confidence: float = 0.75,
+        answer_renderer: Optional[AnswerRenderer] = None,
+        result_compactor: Optional[ResultCompactor] = None
+    ):
         self.llm = llm_client
         self.df_manager = dataframe_manager
         self.tools = tools
+        self.result_cache = result_cache
+        self.plan_cache = plan_cache
+        self.fast_planner = fast_planner
+        self.fast_path_min_confidence = fast_path_min_confidence
+        self.answer_renderer = answer_renderer
+        self.result_compactor = result_compactor
+
+        # Static planning prefix: (schema key, prompt, token count)
+        self._planning_prefix: Optional[Tuple[tuple, str, int]] = None
+        self._prefix_lock = threading.Lock()
+        self.planning_tokens = {
+            "prefix_builds": 0,
+            "requests": 0,
+            "prefix_tokens": 0,
+            "query_tokens": 0,
+        }
 
     # -------------------------------------------------
     # SEMANTIC TOOL PLANNING PROMPT (CORE OF PHASE 5.3)
     # -------------------------------------------------
-    def _tool_planning_prompt(self, query: str, columns: list[str]) -> str:
+    def _tool_planning_prompt(self, columns: list[str]) -> str:
+        """
+        Static system prompt: depends only on the schema, never on the
+        query, so it is byte-identical across requests (provider-side
+        prompt caching) and built once per dataset generation.
+        """
         cols = ", ".join(columns)
         return f"""
 You are a data analytics reasoning engine.
@@ -54,18 +107,33 @@ Required JSON format:
 {{
   "tool": "aggregation",
   "params": {{
-    "operation": "count | sum | average",
-    "group_by": "<column name>",
-    "column": "<numeric column name or null>"
+    "operation": "count | sum | average | std | min | max | nunique",
+    "group_by": "<column name, or a list of column names>",
+    "column": "<numeric column name or null>",
+    "where": <optional condition tree, see Row conditions>
   }}
 }}
 
+Optional params:
+- "metrics": [{{"operation": "...", "column": "..."}}, ...] instead of
+  operation / column, for several numbers per group; result columns are
+  "count" and "<operation>_<column>" (e.g. "average_SCORE")
+- "having": condition tree on result columns, e.g.
+  {{"range": {{"count": {{"gte": 10}}}}}}
+- "sort_by": a result column or group_by column, "order": "asc | desc",
+  "limit": <n> for the top n groups
+
 Rules for aggregation:
 - Use "count" for how many, number of, volume, prevalence
 - Use "sum" for total, combined, overall amount
 - Use "average" for mean or typical value
+- Use "std" for spread, variability or standard deviation
+- Use "min" / "max" for lowest / highest values
+- Use "nunique" for how many distinct values of column per group
 - column MUST be null for count
-- group_by MUST be one of the provided columns
+- group_by MUST be one of the provided columns (or a list of them)
+- For "top" / "most" / "least" questions use sort_by and limit; always
+  set limit when grouping by a column with many values (e.g. SITE_NAME)
 
 2. list  
 Used when the user wants to see records, initiatives, examples, details,
@@ -77,7 +145,15 @@ Required JSON format:
   "params": {{
     "filters": {{
       "<column name>": "<value>"
-    }}
+    }},
+    "contains": {{
+      "<column name>": "<text>"
+    }},
+    "keywords": {{
+      "<column name>": "<words>"
+    }},
+    "sort": "relevance",
+    "limit": <number of rows, default 10>
   }}
 }}
 
@@ -85,31 +161,219 @@ Rules for list:
 - Infer semantic meaning (e.g. "support for new mothers" → CATEGORY = "Breastfeeding Support")
 - Filters MUST map to existing columns
 - Values do NOT need exact string match but must be semantically correct
+- Use "contains" (case-insensitive substring) for phrases that must appear
+  inside free-text columns such as QUESTION, ANSWER or
+  PROVIDENCE_AND_EVIDENCE; omit it otherwise
+- Use "keywords" when every word must appear as a whole word, in any
+  order (e.g. "leave parental" matches "parental leave policy")
+- Add "sort": "relevance" with contains / keywords to list the most
+  focused matches first
+- contains / keywords given as a plain string search QUESTION
+
+3. trend
+Used when the user asks how something changed over the years, growth,
+year-over-year movement or a trend.
+
+Required JSON format:
+{{
+  "tool": "trend",
+  "params": {{
+    "operation": "count | sum | average",
+    "group_by": "<column name or null for one overall series>",
+    "column": "<numeric column name or null>"
+  }}
+}}
+
+Rules for trend:
+- The time axis is always EFFECTIVE_YEAR; never use it as group_by
+- column MUST be null for count
+
+4. comparison
+Used when the user compares specific values of one column against each
+other ("India vs Kenya", "compare 2023 and 2024"), or asks which group
+ranks highest.
+
+Required JSON format:
+{{
+  "tool": "comparison",
+  "params": {{
+    "operation": "count | sum | average",
+    "group_by": "<column name>",
+    "values": ["<value>", "<value>", ...],
+    "column": "<numeric column name or null>"
+  }}
+}}
+
+Rules for comparison:
+- values are values of group_by; the first one is the baseline that
+  differences and ratios are measured against
+- omit values to rank every value of group_by
+- column MUST be null for count
+
+Row conditions (optional "where" param of aggregation, list, direct, trend and comparison):
+{{
+  "where": {{
+    "and": [
+      {{"range": {{"EFFECTIVE_YEAR": {{"gte": 2022, "lte": 2024}}}}}},
+      {{"in": {{"SITE_COUNTRY": ["India", "Kenya"]}}}},
+      {{"not": {{"is_null": "SCORE"}}}}
+    ]
+  }}
+}}
+- Operators: eq, in, range (gt | gte | lt | lte, numeric columns only),
+  is_null, contains, not, and, or
+- Use "filters" for plain column = value matches; use "where" for ranges,
+  alternatives (in / or), negation or missing values
 
 STRICT RULES:
-- Respond ONLY with valid JSON
+- If functions are provided, call exactly one of them with the params;
+  otherwise respond ONLY with valid JSON
 - DO NOT explain anything
 - DO NOT invent column names
 - If something cannot be inferred, set it explicitly to null
-
-User query:
-{query}
 """
 
     # -------------------------------------------------
-    # PLAN: TOOL + PARAMS (LLM-ONLY, SCHEMA-GROUNDED)
+    # PLAN: TOOL + PARAMS (FAST PATH, CACHE, THEN LLM)
     # -------------------------------------------------
     def plan(self, user_query: str) -> Dict[str, Any]:
-        df = self.df_manager.get_dataframe()
-        prompt = self._tool_planning_prompt(
-            query=user_query,
-            columns=df.columns.tolist()
-        )
+        schema, local = self._local_plan(user_query)
+        if local is not None:
+            return local
 
-        response = self.llm.chat([
-            {"role": "system", "content": prompt}
-        ])
+        messages = self._planning_messages(user_query)
+        try:
+            reply = self._planner_call(messages)
+        except CircuitOpenError:
+            fallback = self._degraded_plan(user_query)
+            if fallback is None:
+                raise
+            return fallback
 
+        try:
+            plan = self._parse_plan(reply)
+        except ValueError as e:
+            # One cheap repair turn instead of failing the request
+            reply = self._planner_call(messages + self._repair_messages(reply, e))
+            plan = self._parse_plan(reply)
+
+        return self._accept_plan(user_query, schema, plan)
+
+    def _local_plan(self, user_query: str) -> Tuple[tuple, Optional[Dict[str, Any]]]:
+        """
+        Current schema, plus a plan that needs no LLM call: a confident
+        fast-path match, or a cached plan for a near-identical question.
+        """
+        schema = tuple(self.df_manager.get_dataframe().columns)
+
+        if self.fast_planner is not None:
+            fast = self.fast_planner.plan(user_query)
+            if fast is not None and fast["confidence"] >= self.fast_path_min_confidence:
+                PLAN_SOURCE.inc(source="fast_path")
+                annotate(plan_source="fast_path")
+                return schema, {"tool": fast["tool"], "params": fast["params"]}
+
+        if self.plan_cache is None:
+            return schema, None
+
+        cached = self.plan_cache.lookup(user_query, schema)
+        if cached is not None:
+            PLAN_SOURCE.inc(source="plan_cache")
+            annotate(plan_source="plan_cache")
+
+        return schema, cached
+
+    def _degraded_plan(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """
+        Best fast-path guess at any confidence, used while the LLM
+        circuit is open. Not cached.
+        """
+        if self.fast_planner is None:
+            return None
+
+        fast = self.fast_planner.plan(user_query)
+        if fast is None:
+            return None
+
+        PLAN_SOURCE.inc(source="degraded")
+        annotate(plan_source="degraded")
+        return {"tool": fast["tool"], "params": fast["params"]}
+
+    def _planning_messages(self, user_query: str) -> List[Dict[str, str]]:
+        prefix, prefix_tokens = self.planning_system_prompt()
+        content = f"User query:\n{user_query}"
+
+        query_tokens = estimate_tokens(content)
+        with self._prefix_lock:
+            counters = self.planning_tokens
+            counters["requests"] += 1
+            counters["prefix_tokens"] += prefix_tokens
+            counters["query_tokens"] += query_tokens
+
+        annotate(prefix_tokens=prefix_tokens, query_tokens=query_tokens)
+
+        return [
+            {"role": "system", "content": prefix},
+            {"role": "user", "content": content},
+        ]
+
+    def planning_system_prompt(self) -> Tuple[str, int]:
+        """
+        Cached static prefix and its token count, rebuilt only when the
+        dataset generation or schema changes.
+        """
+        df = self.df_manager.get_dataframe()
+        key = (self.df_manager.generation, tuple(df.columns))
+
+        cached = self._planning_prefix
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        with self._prefix_lock:
+            cached = self._planning_prefix
+            if cached is None or cached[0] != key:
+                prompt = self._tool_planning_prompt(columns=df.columns.tolist())
+                cached = (key, prompt, estimate_tokens(prompt))
+                self._planning_prefix = cached
+                self.planning_tokens["prefix_builds"] += 1
+
+        return cached[1], cached[2]
+
+    def planning_token_stats(self) -> Dict[str, Any]:
+        with self._prefix_lock:
+            counters = dict(self.planning_tokens)
+        prefix = self._planning_prefix
+        counters["current_prefix_tokens"] = prefix[2] if prefix else 0
+        return counters
+
+    def _planner_call(self, messages: List[Dict[str, str]]) -> Any:
+        """
+        Function calling when the client supports it, plain JSON text otherwise.
+        """
+        with span("llm.plan"):
+            if hasattr(self.llm, "chat_with_tools"):
+                return self.llm.chat_with_tools(messages, plan_functions(tuple(self.tools)))
+            return self.llm.chat(messages)
+
+    def _parse_plan(self, reply: Any) -> Dict[str, Any]:
+        """
+        Turn a planner reply (tool call or JSON text) into a plan
+        validated against the tool's params model and the live columns.
+        """
+        if isinstance(reply, dict) and "tool" in reply:
+            try:
+                params = json.loads(reply.get("arguments") or "{}")
+            except json.JSONDecodeError as e:
+                raise ValueError(f"LLM returned invalid JSON arguments:\n{reply['arguments']}") from e
+            plan = {"tool": reply["tool"], "params": params}
+        else:
+            text = reply.get("content", "") if isinstance(reply, dict) else reply
+            plan = self._parse_plan_text(text)
+
+        columns = self.df_manager.get_dataframe().columns.tolist()
+        return validate_plan(plan, columns, list(self.tools))
+
+    def _parse_plan_text(self, response: str) -> Dict[str, Any]:
         cleaned = response.strip()
         cleaned = re.sub(r"^```json", "", cleaned, flags=re.IGNORECASE)
         cleaned = re.sub(r"^```", "", cleaned)
@@ -121,20 +385,48 @@ User query:
         except json.JSONDecodeError as e:
             raise ValueError(f"LLM returned invalid JSON:\n{response}") from e
 
-        if "tool" not in plan or "params" not in plan:
+        if not isinstance(plan, dict) or "tool" not in plan or "params" not in plan:
             raise ValueError("Invalid tool plan structure returned by LLM")
 
         return plan
 
+    def _repair_messages(self, reply: Any, error: Exception) -> List[Dict[str, str]]:
+        previous = reply if isinstance(reply, str) else json.dumps(reply)
+        columns = ", ".join(self.df_manager.get_dataframe().columns)
+
+        return [
+            {"role": "assistant", "content": previous},
+            {
+                "role": "user",
+                "content": (
+                    f"That plan is invalid: {error}\n"
+                    f"Valid columns: {columns}\n"
+                    "Return a corrected plan only."
+                ),
+            },
+        ]
+
+    def _accept_plan(self, user_query: str, schema: tuple, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Cache a validated plan.
+        """
+        PLAN_SOURCE.inc(source="llm")
+        annotate(plan_source="llm")
+
+        if self.plan_cache is not None:
+            self.plan_cache.store(user_query, schema, plan)
+
+        return plan
+
     # -------------------------------------------------
     # EXECUTION (DETERMINISTIC)
     # -------------------------------------------------
     def run(self, user_query: str) -> Dict[str, Any]:
         plan = self.plan(user_query)
 
-        df = self.df_manager.get_dataframe()
-        schema = list(df.columns)
+        return self._execute_plan(plan)
 
+    def _execute_plan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
         tool_name = plan["tool"]
         params = plan["params"]
 
@@ -148,16 +440,45 @@ User query:
         if tool_name not in self.tools:
             raise ValueError(f"Unsupported tool selected: {tool_name}")
 
+        return self._execute_tool(tool_name, params)
+
+    def _execute_tool(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run a tool, serving repeated (tool, params, dataset) combinations
+        from the result cache.
+        """
         tool = self.tools[tool_name]
         df = self.df_manager.get_dataframe()
 
-        return tool.execute(df=df, params=params)
-        
-        plan = self.plan(user_query)
-        if plan["tool"] == "none":
-            return self._clarify(user_query, df.columns.tolist())
+        if self.result_cache is None:
+            return self._timed_execute(tool_name, tool, df, params)
+
+        generation = self.df_manager.generation
+        key = ResultCache.make_key(tool_name, params, generation)
+
+        cached = self.result_cache.get(key, generation)
+        annotate(result_cache="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+        result = self._timed_execute(tool_name, tool, df, params)
+        self.result_cache.put(key, generation, result)
+
+        return result
+
+    def _timed_execute(self, tool_name: str, tool, df, params: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        with count_rows_scanned() as scanned:
+            result = tool.execute(df=df, params=params)
+        TOOL_SECONDS.observe(time.perf_counter() - started, tool=tool_name)
+
+        results = result.get("results")
+        returned = len(results) if isinstance(results, list) else int(result.get("value") is not None)
+        TOOL_ROWS_SCANNED.inc(scanned[0], tool=tool_name)
+        TOOL_ROWS_RETURNED.inc(returned, tool=tool_name)
+
+        return result
 
-    
     def _clarify(self, query: str, columns: list[str]) -> Dict[str, Any]:
         return {
         "tool": "none",
@@ -175,13 +496,49 @@ User query:
     # ANSWER GENERATION (NLP RESPONSE LAYER)
     # -------------------------------------------------
     def generate_answer(self, query: str, tool_response: dict) -> str:
+        rendered = self._render_answer(tool_response)
+        if rendered is not None:
+            return rendered
+
+        messages = self._answer_messages(query, tool_response)
+        if messages is None:
+            return NO_DATA_ANSWER
+
+        with span("llm.answer") as current:
+            if current:
+                current.set(prompt_tokens=estimate_message_tokens(messages))
+            response = self.llm.chat(messages)
+        return response.strip()
+
+    def _render_answer(self, tool_response: dict) -> Optional[str]:
+        """
+        Template answer for small structured results (no LLM call),
+        or None when the answer LLM is needed.
+        """
+        if self.answer_renderer is None:
+            return None
+
+        return self.answer_renderer.render(tool_response)
+
+    def _answer_messages(
+        self,
+        query: str,
+        tool_response: dict
+    ) -> Optional[List[Dict[str, str]]]:
+        """
+        Messages for the answer LLM call, or None when there is no data.
+        """
         results = tool_response.get("results") or []
         if not results:
-            return (
-            "The dataset does not contain enough information "
-            "to answer this question."
-        )
-        messages = [
+            return None
+
+        # Token-budgeted table instead of every row pretty-printed
+        if self.result_compactor is not None:
+            data = self.result_compactor.compact(query, results)
+        else:
+            data = json.dumps(results, indent=2)
+
+        return [
         {
             "role": "system",
             "content": """
@@ -199,7 +556,7 @@ STRICT RULES:
             "content": f"""
         User question: {query}
         Data:
-        {json.dumps(results, indent=2)}
+        {data}
 
 Task:
 - Answer in plain English
@@ -207,5 +564,161 @@ Task:
 """
         }
     ]
-        response = self.llm.chat(messages)
+
+
+class AsyncReActAgent(ReActAgent):
+    """
+    ReActAgent with awaitable plan / run / generate_answer.
+
+    LLM calls go through an async client, so a slow completion never
+    blocks the event loop; pandas work runs in a worker thread.
+    """
+
+    async def plan(self, user_query: str) -> Dict[str, Any]:  # type: ignore[override]
+        schema, local = self._local_plan(user_query)
+        if local is not None:
+            return local
+
+        messages = self._planning_messages(user_query)
+        try:
+            reply = await self._planner_call(messages)
+        except CircuitOpenError:
+            fallback = self._degraded_plan(user_query)
+            if fallback is None:
+                raise
+            return fallback
+
+        try:
+            plan = self._parse_plan(reply)
+        except ValueError as e:
+            # One cheap repair turn instead of failing the request
+            reply = await self._planner_call(messages + self._repair_messages(reply, e))
+            plan = self._parse_plan(reply)
+
+        return self._accept_plan(user_query, schema, plan)
+
+    async def _planner_call(self, messages: List[Dict[str, str]]) -> Any:  # type: ignore[override]
+        with span("llm.plan"):
+            if hasattr(self.llm, "chat_with_tools"):
+                return await self.llm.chat_with_tools(messages, plan_functions(tuple(self.tools)))
+            return await self.llm.chat(messages)
+
+    async def run(self, user_query: str) -> Dict[str, Any]:  # type: ignore[override]
+        plan = await self.plan(user_query)
+
+        return await self.execute_plan(plan)
+
+    async def execute_plan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        # CPU-bound: keep it off the event loop
+        return await asyncio.to_thread(self._execute_plan, plan)
+
+    async def generate_answer(self, query: str, tool_response: dict) -> str:  # type: ignore[override]
+        rendered = self._render_answer(tool_response)
+        if rendered is not None:
+            return rendered
+
+        messages = self._answer_messages(query, tool_response)
+        if messages is None:
+            return NO_DATA_ANSWER
+
+        with span("llm.answer") as current:
+            if current:
+                current.set(prompt_tokens=estimate_message_tokens(messages))
+            response = await self.llm.chat(messages)
         return response.strip()
+
+    async def run_batch(
+        self,
+        queries: List[str],
+        max_concurrency: int = 8
+    ) -> Tuple[List[Union[Dict[str, Any], Exception]], int]:
+        """
+        Answer many questions at once.
+
+        - identical questions (see canonical_query) are planned and answered once
+        - planning / answer LLM calls run concurrently, at most
+          `max_concurrency` at a time
+        - identical plans execute once; distinct plans run in parallel
+          worker threads over the shared frame
+
+        Returns one response dict (or the exception raised) per query, in
+        input order, plus the number of distinct plans executed.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def bounded(make):
+            async with semaphore:
+                return await make()
+
+        originals: Dict[str, str] = {}
+        for query in queries:
+            originals.setdefault(canonical_query(query), query)
+
+        # 1. Plan each distinct question
+        plans = await asyncio.gather(
+            *(bounded(lambda q=q: self.plan(q)) for q in originals.values()),
+            return_exceptions=True
+        )
+        plan_by_question = dict(zip(originals, plans))
+
+        # 2. Execute each distinct plan
+        generation = self.df_manager.generation
+        plan_keys: Dict[str, str] = {}
+        unique: Dict[str, Dict[str, Any]] = {}
+
+        for question, plan in plan_by_question.items():
+            if isinstance(plan, BaseException):
+                continue
+            key = ResultCache.make_key(plan["tool"], plan["params"], generation)
+            plan_keys[question] = key
+            unique.setdefault(key, plan)
+
+        executed = await asyncio.gather(
+            *(bounded(lambda p=p: self.execute_plan(p)) for p in unique.values()),
+            return_exceptions=True
+        )
+        result_by_key = dict(zip(unique, executed))
+
+        # 3. Answer each distinct question
+        async def answer(question: str) -> Dict[str, Any]:
+            plan = plan_by_question[question]
+            if isinstance(plan, BaseException):
+                raise plan
+
+            tool_response = result_by_key[plan_keys[question]]
+            if isinstance(tool_response, BaseException):
+                raise tool_response
+
+            text = await self.generate_answer(originals[question], tool_response)
+            return {
+                "tool": tool_response.get("tool"),
+                "answer": text,
+                "results": tool_response.get("results"),
+                "value": tool_response.get("value"),
+            }
+
+        answers = await asyncio.gather(
+            *(bounded(lambda q=q: answer(q)) for q in originals),
+            return_exceptions=True
+        )
+        answer_by_question = dict(zip(originals, answers))
+
+        return [answer_by_question[canonical_query(query)] for query in queries], len(unique)
+
+    async def stream_answer(self, query: str, tool_response: dict) -> AsyncIterator[str]:
+        """
+        Answer text, yielded token by token as the LLM produces it.
+        Template answers arrive as a single chunk.
+        """
+        rendered = self._render_answer(tool_response)
+        if rendered is not None:
+            yield rendered
+            return
+
+        messages = self._answer_messages(query, tool_response)
+        if messages is None:
+            yield NO_DATA_ANSWER
+            return
+
+        async for token in self.llm.stream_chat(messages):
+            yield token
@@ -0,0 +1,157 @@
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List, Sequence
+
+from app.utils.token_estimator import estimate_tokens
+
+
+# Long, rarely useful columns; kept only when the question mentions them
+LOW_VALUE_COLUMNS = ("PROVIDENCE_AND_EVIDENCE", "QUESTION_INSTRUCTIONS", "NOTES")
+
+# Overflow rows are summarized by value counts of at most this many columns
+SUMMARY_COLUMNS = 3
+SUMMARY_MAX_DISTINCT = 5
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class ResultCompactor:
+    """
+    Turns tool result rows into a compact, token-budgeted table for the
+    answer LLM.
+
+    - drops low-value and all-empty columns (unless the question names them)
+    - hoists columns with a single value into one "constant" line
+    - truncates long cells
+    - encodes rows as a pipe-separated table (header once)
+    - stops at the token budget and summarizes the remaining rows
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        max_cell_chars: int = 300,
+        low_value_columns: Sequence[str] = LOW_VALUE_COLUMNS
+    ):
+        self.token_budget = token_budget
+        self.max_cell_chars = max_cell_chars
+        self.low_value_columns = set(low_value_columns)
+
+    def compact(self, query: str, results: List[Dict[str, Any]]) -> str:
+        if not results:
+            return ""
+
+        columns = self._select_columns(query, results)
+        constants = {
+            column: results[0].get(column)
+            for column in columns
+            if len(results) > 1 and _is_constant(results, column)
+        }
+        varying = [column for column in columns if column not in constants]
+
+        lines = []
+        if constants:
+            lines.append("Constant for all rows: " + "; ".join(
+                f"{column}={self._cell(value)}" for column, value in constants.items()
+            ))
+
+        header = " | ".join(varying)
+        used = estimate_tokens("\n".join(lines + [header])) + 20
+
+        rows: List[str] = []
+        for record in results:
+            row = " | ".join(self._cell(record.get(column)) for column in varying)
+            cost = estimate_tokens(row) + 1
+
+            # Always keep at least one row
+            if rows and used + cost > self.token_budget:
+                break
+
+            rows.append(row)
+            used += cost
+
+        shown = len(rows)
+        lines.append(f"Rows ({shown} of {len(results)} shown):")
+        if varying:
+            lines.append(header)
+            lines.extend(rows)
+
+        if shown < len(results):
+            lines.append(self._summarize(results[shown:], varying))
+
+        return "\n".join(lines)
+
+    # ---------- Internals ----------
+
+    def _select_columns(self, query: str, results: List[Dict[str, Any]]) -> List[str]:
+        columns: Dict[str, None] = {}
+        for record in results:
+            columns.update(dict.fromkeys(record))
+
+        query_words = set(WORD_RE.findall(query.lower()))
+
+        selected = []
+        for column in columns:
+            mentioned = _mentions(query_words, column)
+
+            if column in self.low_value_columns and not mentioned:
+                continue
+
+            if not mentioned and all(_is_empty(record.get(column)) for record in results):
+                continue
+
+            selected.append(column)
+
+        return selected
+
+    def _cell(self, value: Any) -> str:
+        if _is_empty(value):
+            return ""
+
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+
+        text = " ".join(str(value).split()).replace("|", "/")
+        if len(text) > self.max_cell_chars:
+            text = text[:self.max_cell_chars - 1].rstrip() + "…"
+
+        return text
+
+    def _summarize(self, overflow: List[Dict[str, Any]], columns: List[str]) -> str:
+        parts = [f"{len(overflow)} more rows not shown."]
+
+        summarized = 0
+        for column in columns:
+            counts = Counter(self._cell(record.get(column)) for record in overflow)
+            if len(counts) > SUMMARY_MAX_DISTINCT:
+                continue
+
+            parts.append(f"{column}: " + ", ".join(
+                f"{value or 'empty'} ({count})" for value, count in counts.most_common()
+            ))
+
+            summarized += 1
+            if summarized == SUMMARY_COLUMNS:
+                break
+
+        return " ".join(parts)
+
+
+def _mentions(query_words: set, column: str) -> bool:
+    words = [word for word in column.lower().split("_") if len(word) > 3]
+    return any(
+        word in query_words or word + "s" in query_words or word.rstrip("s") in query_words
+        for word in words
+    )
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or (isinstance(value, float) and math.isnan(value))
+
+
+def _is_constant(results: List[Dict[str, Any]], column: str) -> bool:
+    first = results[0].get(column)
+    if _is_empty(first):
+        return all(_is_empty(record.get(column)) for record in results)
+    return all(record.get(column) == first for record in results)
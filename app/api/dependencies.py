@@ -1,4 +1,19 @@
-from app.bootstrap import agent
+from fastapi import HTTPException
+
+from app.bootstrap import AppContainer, container
+
+
+def get_container() -> AppContainer:
+    return container
+
 
 def get_agent():
-    return agent
+    if not container.ready or container.agent is None:
+        raise HTTPException(status_code=503, detail="Agent is still starting up")
+    return container.agent
+
+
+def get_single_flight():
+    if container.single_flight is None:
+        raise HTTPException(status_code=503, detail="Agent is still starting up")
+    return container.single_flight
@@ -1,20 +1,41 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.concurrency import run_in_threadpool
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import Response, StreamingResponse
+from typing import Any, AsyncIterator, Dict, Optional
+import json
 import logging
+import time
 
-from app.api.schemas import ChatRequest, ChatResponse
-from app.api.dependencies import get_agent
-from app.agents.reAct_agents import ReActAgent
+from app.api.schemas import (
+    BatchChatItem,
+    BatchChatRequest,
+    BatchChatResponse,
+    ChatRequest,
+    ChatResponse,
+    ChatStreamResult,
+)
+from app.api.dependencies import get_agent, get_single_flight
+from app.agents.plan_cache import canonical_query
+from app.agents.reAct_agents import AsyncReActAgent
+from app.config import settings
+from app.utils.metrics import STAGE_SECONDS
+from app.utils.resilience import CircuitOpenError
+from app.utils.single_flight import SingleFlight
+from app.utils.tracing import span, start_trace
 
 logger = logging.getLogger("chat_api")
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
+LLM_UNAVAILABLE = "Language model temporarily unavailable, please retry shortly"
+
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
-    agent: ReActAgent = Depends(get_agent)
+    trace: Optional[str] = Query(None, description="1 for a trace tree, profile to add a profiler capture"),
+    x_trace: Optional[str] = Header(None),
+    agent: AsyncReActAgent = Depends(get_agent),
+    single_flight: SingleFlight = Depends(get_single_flight)
 ):
     query = (request.query or "").strip()
     if not query:
@@ -22,31 +43,23 @@ async def chat(
 
     logger.info(f"Incoming chat query: {query}")
 
-    try:
-        # 1️⃣ Run tool selection + execution safely
-        tool_response = await run_in_threadpool(agent.run, query)
-
-        # 2️⃣ Defensive validation FIRST
-        if not isinstance(tool_response, dict):
-            logger.error("Agent returned non-dict response")
-            raise HTTPException(
-                status_code=500,
-                detail="Invalid response format from agent"
-            )
-
-        # 3️⃣ Generate natural language answer
-        answer = agent.generate_answer(query, tool_response)
+    started = time.perf_counter()
+    trace_mode = _trace_mode(trace or x_trace)
 
-        logger.info(
-            f"Chat processed successfully | tool={tool_response.get('tool')}"
-        )
+    try:
+        if trace_mode is not None:
+            # Traced requests run alone so the tree describes this request only
+            with start_trace("chat", profile=trace_mode == "profile", query=query) as root:
+                payload = await _answer_query(agent, query)
+            payload = {**payload, "trace": root.to_dict()}
+        else:
+            # Identical questions in flight at the same time share one computation
+            key = (canonical_query(query), agent.df_manager.generation)
+            payload = await single_flight.do(key, lambda: _answer_query(agent, query))
 
-        return {
-            "tool": tool_response.get("tool"),
-            "answer": answer,
-            "results": tool_response.get("results"),
-            "value": tool_response.get("value"),
-        }
+    except CircuitOpenError:
+        logger.warning("LLM circuit open, failing fast")
+        raise HTTPException(status_code=503, detail=LLM_UNAVAILABLE)
 
     except ValueError as ve:
         logger.warning(f"Validation error: {ve}")
@@ -58,3 +71,187 @@ async def chat(
             status_code=500,
             detail="Internal server error while processing query"
         )
+
+    with STAGE_SECONDS.time(stage="serialize"):
+        body = ChatResponse(**payload).model_dump_json(exclude_unset=True)
+
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage="total")
+    return Response(content=body, media_type="application/json")
+
+
+async def _answer_query(agent: AsyncReActAgent, query: str) -> Dict[str, Any]:
+    # 1️⃣ Run tool selection + execution (pandas runs off the event loop)
+    with STAGE_SECONDS.time(stage="plan"), span("plan"):
+        plan = await agent.plan(query)
+
+    with STAGE_SECONDS.time(stage="execute"), span("execute", tool=plan["tool"]):
+        tool_response = await agent.execute_plan(plan)
+
+    # 2️⃣ Defensive validation FIRST
+    if not isinstance(tool_response, dict):
+        logger.error("Agent returned non-dict response")
+        raise HTTPException(
+            status_code=500,
+            detail="Invalid response format from agent"
+        )
+
+    # 3️⃣ Generate natural language answer
+    with STAGE_SECONDS.time(stage="answer"), span("answer"):
+        answer = await agent.generate_answer(query, tool_response)
+
+    logger.info(
+        f"Chat processed successfully | tool={tool_response.get('tool')}"
+    )
+
+    return {
+        "tool": tool_response.get("tool"),
+        "answer": answer,
+        "results": tool_response.get("results"),
+        "value": tool_response.get("value"),
+    }
+
+
+def _trace_mode(flag: Optional[str]) -> Optional[str]:
+    """
+    "trace" or "profile" for an opted-in request, else None.
+    """
+    if not settings.TRACE_ENABLED or not flag:
+        return None
+
+    flag = flag.strip().lower()
+    if flag == "profile":
+        return "profile"
+    if flag in ("1", "true", "yes", "on"):
+        return "trace"
+    return None
+
+
+# -------------------------------------------------
+# Batch Chat
+# -------------------------------------------------
+@router.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(
+    request: BatchChatRequest,
+    agent: AsyncReActAgent = Depends(get_agent)
+):
+    """
+    Many questions in one call. Items come back in request order, each
+    with its own status (200 / 400 / 500) and either answer or error.
+    """
+    if len(request.queries) > settings.BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_MAX_QUERIES} queries per batch"
+        )
+
+    queries = [(query or "").strip() for query in request.queries]
+    valid = [query for query in queries if query]
+
+    logger.info(f"Incoming batch chat: {len(queries)} queries")
+
+    outcomes, distinct_plans = await agent.run_batch(
+        valid,
+        max_concurrency=settings.BATCH_MAX_CONCURRENCY
+    )
+    outcome_by_query = dict(zip(valid, outcomes))
+
+    items = []
+    for query in queries:
+        if not query:
+            items.append(BatchChatItem(query=query, status=400, error="Query must not be empty"))
+            continue
+
+        outcome = outcome_by_query[query]
+
+        if isinstance(outcome, CircuitOpenError):
+            items.append(BatchChatItem(query=query, status=503, error=LLM_UNAVAILABLE))
+        elif isinstance(outcome, ValueError):
+            logger.warning(f"Validation error in batch: {outcome}")
+            items.append(BatchChatItem(query=query, status=400, error=str(outcome)))
+        elif isinstance(outcome, BaseException):
+            logger.error("Unhandled exception in batch item", exc_info=outcome)
+            items.append(BatchChatItem(
+                query=query,
+                status=500,
+                error="Internal server error while processing query",
+            ))
+        else:
+            items.append(BatchChatItem(query=query, status=200, **outcome))
+
+    logger.info(f"Batch chat processed | queries={len(queries)} plans={distinct_plans}")
+
+    return BatchChatResponse(items=items, distinct_plans=distinct_plans)
+
+
+# -------------------------------------------------
+# Streaming Chat (Server-Sent Events)
+# -------------------------------------------------
+@router.post("/chat/stream")
+async def chat_stream(
+    request: ChatRequest,
+    agent: AsyncReActAgent = Depends(get_agent)
+):
+    """
+    Events, in order:
+    - plan:   tool + params, as soon as planning finishes
+    - result: structured results / value, as soon as the tool finishes
+    - token:  answer text chunks while the answer LLM call streams
+    - done:   end of stream (or `error` with status + detail)
+    """
+    query = (request.query or "").strip()
+    if not query:
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+
+    logger.info(f"Incoming streaming chat query: {query}")
+
+    return StreamingResponse(
+        _chat_events(agent, query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _chat_events(agent: AsyncReActAgent, query: str) -> AsyncIterator[str]:
+    try:
+        with STAGE_SECONDS.time(stage="plan"):
+            plan = await agent.plan(query)
+        yield _sse("plan", json.dumps(plan, default=str))
+
+        with STAGE_SECONDS.time(stage="execute"):
+            tool_response = await agent.execute_plan(plan)
+        if not isinstance(tool_response, dict):
+            raise RuntimeError("Agent returned non-dict response")
+
+        result = ChatStreamResult(
+            tool=tool_response.get("tool"),
+            results=tool_response.get("results"),
+            value=tool_response.get("value"),
+        )
+        yield _sse("result", result.model_dump_json())
+
+        async for token in agent.stream_answer(query, tool_response):
+            yield _sse("token", json.dumps({"text": token}))
+
+        logger.info(
+            f"Streaming chat processed successfully | tool={tool_response.get('tool')}"
+        )
+        yield _sse("done", "{}")
+
+    except CircuitOpenError:
+        logger.warning("LLM circuit open, failing fast")
+        yield _sse("error", json.dumps({"status": 503, "detail": LLM_UNAVAILABLE}))
+
+    except ValueError as ve:
+        logger.warning(f"Validation error: {ve}")
+        yield _sse("error", json.dumps({"status": 400, "detail": str(ve)}))
+
+    except Exception:
+        logger.exception("Unhandled exception during streaming chat execution")
+        yield _sse("error", json.dumps({
+            "status": 500,
+            "detail": "Internal server error while processing query",
+        }))
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Any, Dict, List, Optional
 
 
@@ -17,6 +17,37 @@ class ChatResponse(BaseModel):
     answer: str 
     results: Optional[List[Dict[str, Any]]] = None
     value: Optional[Any] = None
+    # Only present on traced requests (?trace=1 or X-Trace: 1)
+    trace: Optional[Dict[str, Any]] = None
+
+# -----------------------------
+# Streaming "result" Event Schema
+# -----------------------------
+class ChatStreamResult(BaseModel):
+    tool: Optional[Any]
+    results: Optional[List[Dict[str, Any]]] = None
+    value: Optional[Any] = None
+
+# -----------------------------
+# Batch Chat Schemas
+# -----------------------------
+class BatchChatRequest(BaseModel):
+    queries: List[str] = Field(min_length=1)
+
+
+class BatchChatItem(BaseModel):
+    query: str
+    status: int
+    tool: Optional[Any] = None
+    answer: Optional[str] = None
+    results: Optional[List[Dict[str, Any]]] = None
+    value: Optional[Any] = None
+    error: Optional[str] = None
+
+
+class BatchChatResponse(BaseModel):
+    items: List[BatchChatItem]
+    distinct_plans: int
 
 # -----------------------------
 # Error Response Schema
@@ -1,31 +1,243 @@
-from app.agents.reAct_agents import ReActAgent
+from typing import Any, Dict, Optional
+
+from app.agents.answer_renderer import AnswerRenderer
+from app.agents.fast_planner import FastPathPlanner
+from app.agents.plan_cache import PlanCache
+from app.agents.result_compactor import ResultCompactor
+from app.agents.reAct_agents import AsyncReActAgent
+from app.config import settings
 from app.data.dataframe_manager import DataFrameManager
 from app.tools.direct_query_tool import DirectQueryTool
 from app.tools.list_tool import ListTool
 from app.tools.aggregation_tool import AggregationTool
 from app.tools.comparison_tool import ComparisonTool
-from app.utils.llm_client import AzureOpenAIClient
-
-# Load dataset once
-df_manager = DataFrameManager()
-df_manager.load_from_csv(
-    "app/data/snapshots/G17_WFN_CONSOLIDATED_REPORT.csv"
-)
-
-# LLM client
-llm_client = AzureOpenAIClient()
-
-# Tools (stateless)
-tools = {
-    "direct": DirectQueryTool(),
-    "list": ListTool(),
-    "aggregation": AggregationTool(),
-    "comparison": ComparisonTool(),
-}
-
-# Singleton agent
-agent = ReActAgent(
-    llm_client=llm_client,
-    dataframe_manager=df_manager,
-    tools=tools,
-)
+from app.tools.trend_analysis_tool import TrendAnalysisTool
+from app.utils.llm_client import AsyncAzureOpenAIClient
+from app.utils.llm_replay import RecordingLLMClient, ReplayLLMClient
+from app.utils.metrics import CACHE_ENTRIES, CACHE_HIT_RATIO, MEMORY_BYTES
+from app.utils.resilience import CircuitBreaker, ResilientLLMClient
+from app.utils.result_cache import ResultCache
+from app.utils.single_flight import SingleFlight
+
+
+# Two-column group-bys pre-aggregated at load (single columns always are)
+CUBE_PAIRS = [
+    ("CATEGORY", "EFFECTIVE_YEAR"),
+    ("SITE_COUNTRY", "EFFECTIVE_YEAR"),
+    ("CLASSIFICATION_LEVEL", "EFFECTIVE_YEAR"),
+    ("CATEGORY", "CLASSIFICATION_LEVEL"),
+]
+
+
+def build_llm_client():
+    """
+    Base LLM client for settings.LLM_MODE.
+    """
+    mode = settings.LLM_MODE
+
+    if mode == "replay":
+        return ReplayLLMClient(settings.LLM_RECORDINGS_PATH)
+
+    # Async, pooled connections, bounded concurrency; retries happen
+    # in ResilientLLMClient, not in the SDK
+    azure = AsyncAzureOpenAIClient(
+        max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        max_connections=settings.LLM_MAX_CONNECTIONS,
+        max_retries=0,
+    )
+
+    if mode == "record":
+        return RecordingLLMClient(azure, settings.LLM_RECORDINGS_PATH)
+
+    if mode == "azure":
+        return azure
+
+    raise ValueError(f"Unsupported LLM_MODE: {mode}")
+
+
+class AppContainer:
+    """
+    Process-wide singletons: dataset, LLM client, tools and agent.
+
+    Nothing is built at import time. The FastAPI lifespan calls
+    `startup()` exactly once per worker, and `ready` only turns
+    True after warm-up has finished.
+    """
+
+    def __init__(self):
+        self.df_manager: Optional[DataFrameManager] = None
+        self.llm_client: Optional[ResilientLLMClient] = None
+        self.tools: Dict[str, Any] = {}
+        self.agent: Optional[AsyncReActAgent] = None
+        self.result_cache: Optional[ResultCache] = None
+        self.plan_cache: Optional[PlanCache] = None
+        self.single_flight: Optional[SingleFlight] = None
+        self.ready: bool = False
+        # (generation, memory report): the report scans every column
+        self._memory: Optional[tuple] = None
+
+    def startup(self) -> None:
+        if self.ready:
+            return
+
+        # Load dataset once
+        df_manager = DataFrameManager(cube_pairs=CUBE_PAIRS)
+        df_manager.load_from_csv_or_snapshot(settings.DATA_SNAPSHOT_PATH)
+
+        # LLM client (Azure, recording or replay), behind deadlines,
+        # hedging, retries and a circuit breaker
+        llm_client = ResilientLLMClient(
+            build_llm_client(),
+            timeout_seconds=settings.LLM_TIMEOUT_SECONDS,
+            hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+            max_retries=settings.LLM_MAX_RETRIES,
+            backoff_seconds=settings.LLM_RETRY_BACKOFF_SECONDS,
+            breaker=CircuitBreaker(
+                failure_threshold=settings.LLM_BREAKER_FAILURES,
+                reset_seconds=settings.LLM_BREAKER_RESET_SECONDS,
+            ),
+        )
+
+        # Tools (read-only access to the manager's load-time indexes)
+        tools = {
+            "direct": DirectQueryTool(df_manager),
+            "list": ListTool(df_manager),
+            "aggregation": AggregationTool(df_manager),
+            "comparison": ComparisonTool(df_manager),
+            "trend": TrendAnalysisTool(df_manager),
+        }
+
+        # Tool results, invalidated whenever a new snapshot is loaded
+        result_cache = ResultCache(
+            max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+            ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+        )
+
+        # Tool plans for near-identical questions, reset on schema change
+        plan_cache = PlanCache(
+            similarity_threshold=settings.PLAN_CACHE_SIMILARITY,
+            max_entries=settings.PLAN_CACHE_MAX_ENTRIES,
+        )
+
+        # Rule-based planner for common query shapes (skips the LLM)
+        fast_planner = FastPathPlanner(df_manager) if settings.FAST_PATH_ENABLED else None
+
+        # Singleton agent
+        agent = AsyncReActAgent(
+            llm_client=llm_client,
+            dataframe_manager=df_manager,
+            tools=tools,
+            result_cache=result_cache,
+            plan_cache=plan_cache,
+            fast_planner=fast_planner,
+            fast_path_min_confidence=settings.FAST_PATH_MIN_CONFIDENCE,
+            answer_renderer=AnswerRenderer(max_rows=settings.ANSWER_TEMPLATE_MAX_ROWS),
+            result_compactor=ResultCompactor(
+                token_budget=settings.ANSWER_TOKEN_BUDGET,
+                max_cell_chars=settings.ANSWER_MAX_CELL_CHARS,
+            ),
+        )
+
+        self.df_manager = df_manager
+        self.llm_client = llm_client
+        self.tools = tools
+        self.result_cache = result_cache
+        self.plan_cache = plan_cache
+        self.agent = agent
+
+        # Concurrent identical chat queries share one computation
+        self.single_flight = SingleFlight()
+
+        self.warm_up()
+        self.ready = True
+
+    def warm_up(self) -> None:
+        """
+        Touch everything the first request would otherwise pay for.
+        """
+        if self.df_manager is None:
+            raise RuntimeError("Container not started")
+
+        self.df_manager.get_dataframe()
+
+        # Loads leave the derived structures to first use; build them
+        # before readiness, not on the first filtered / keyword / cube query
+        self.df_manager.equality_index
+        self.df_manager.text_index
+        self.df_manager.aggregate_cube
+
+        if self.agent is not None:
+            # Build the fast-path vocabulary now, not on the first question
+            if self.agent.fast_planner is not None:
+                self.agent.fast_planner.refresh()
+
+            # Compile the static planning prompt for this dataset
+            self.agent.planning_system_prompt()
+
+    async def aclose(self) -> None:
+        """
+        Release pooled LLM connections, then drop all singletons.
+        """
+        if self.llm_client is not None:
+            await self.llm_client.aclose()
+
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        self.ready = False
+        self.agent = None
+        self.result_cache = None
+        self.plan_cache = None
+        self.single_flight = None
+        self.tools = {}
+        self.llm_client = None
+        self.df_manager = None
+        self._memory = None
+
+    def status(self) -> Dict[str, Any]:
+        rows = None
+        if self.ready and self.df_manager is not None:
+            rows = len(self.df_manager.get_dataframe())
+
+        return {
+            "status": "ok",
+            "agent": "ready" if self.ready else "starting",
+            "tools": list(self.tools.keys()),
+            "rows": rows,
+            "result_cache": self.result_cache.stats() if self.result_cache else None,
+            "plan_cache": self.plan_cache.stats() if self.plan_cache else None,
+            "llm": self.llm_client.stats() if self.llm_client else None,
+            "single_flight": self.single_flight.stats() if self.single_flight else None,
+            "planning_tokens": self.agent.planning_token_stats() if self.agent else None,
+        }
+
+    def collect_metrics(self) -> None:
+        """
+        Refresh scrape-time gauges: dataset memory and cache hit ratios.
+        """
+        if self.ready and self.df_manager is not None:
+            generation = self.df_manager.generation
+            if self._memory is None or self._memory[0] != generation:
+                self._memory = (generation, self.df_manager.memory_report())
+
+            report = self._memory[1]
+            MEMORY_BYTES.set(report["total_bytes"], part="dataframe")
+            MEMORY_BYTES.set(report["index_bytes"], part="indexes")
+
+        caches = {
+            "result": self.result_cache.stats() if self.result_cache else None,
+            "plan": self.plan_cache.stats() if self.plan_cache else None,
+        }
+        for name, stats in caches.items():
+            if stats is not None:
+                CACHE_HIT_RATIO.set(stats["hit_ratio"], cache=name)
+                CACHE_ENTRIES.set(stats["entries"], cache=name)
+
+        if self.single_flight is not None:
+            stats = self.single_flight.stats()
+            CACHE_HIT_RATIO.set(stats["shared_ratio"], cache="single_flight")
+            CACHE_ENTRIES.set(stats["in_flight"], cache="single_flight")
+
+
+# Singleton container (populated by the FastAPI lifespan)
+container = AppContainer()
@@ -20,7 +20,20 @@ class Settings(BaseSettings):
     AZ_OAI_ENDPOINT: str
     AZ_OAI_API_KEY: str
     AZ_OAI_DEPLOYMENT: str
-    AZ_OAI_API_VERSION: str = "2023-07-01-preview"
+    # Function calling (`tools`) needs 2024-02-01 or later
+    AZ_OAI_API_VERSION: str = "2024-02-01"
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_MAX_CONNECTIONS: int = 32
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BACKOFF_SECONDS: float = 0.2
+    # Hedge a second request after this latency percentile (0 disables)
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_RESET_SECONDS: float = 30.0
+    # azure | record (azure + write request/response pairs) | replay (offline)
+    LLM_MODE: str = "azure"
+    LLM_RECORDINGS_PATH: str = "tests/fixtures/llm_recordings.jsonl"
 
     # --------------------
     # OpenAI Config (REQUIRED for fallback)
@@ -31,8 +44,40 @@ class Settings(BaseSettings):
     # App-level
     # --------------------
     DATA_REFRESH_INTERVAL: int = 3600
+    DATA_SNAPSHOT_PATH: str = "app/data/snapshots/G17_WFN_CONSOLIDATED_REPORT.csv"
     MAX_DATAFRAME_ROWS: int = 100_000
 
+    # --------------------
+    # Caching
+    # --------------------
+    RESULT_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    RESULT_CACHE_TTL_SECONDS: int = 600
+    PLAN_CACHE_SIMILARITY: float = 0.92
+    PLAN_CACHE_MAX_ENTRIES: int = 1024
+
+    # --------------------
+    # Planning
+    # --------------------
+    FAST_PATH_ENABLED: bool = True
+    FAST_PATH_MIN_CONFIDENCE: float = 0.75
+    # Larger direct / aggregation / comparison results go to the answer LLM
+    ANSWER_TEMPLATE_MAX_ROWS: int = 20
+    # Result data sent to the answer LLM
+    ANSWER_TOKEN_BUDGET: int = 2000
+    ANSWER_MAX_CELL_CHARS: int = 300
+
+    # --------------------
+    # Batch chat
+    # --------------------
+    BATCH_MAX_QUERIES: int = 500
+    BATCH_MAX_CONCURRENCY: int = 8
+
+    # --------------------
+    # Tracing
+    # --------------------
+    # Per-request traces on demand (?trace=1|profile or X-Trace header)
+    TRACE_ENABLED: bool = True
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,105 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+
+
+GroupKey = Tuple[str, ...]
+
+
+class AggregateCube:
+    """
+    Pre-aggregated count / sum / sum-of-squares per group.
+
+    One table per group key (a single column or a column pair), holding
+    for every numeric measure the non-null count, sum and sum of squares.
+    Count, sum, average and standard deviation for any (key, measure)
+    are then derived without touching the rows.
+
+    Built once per loaded DataFrame; only valid for that frame, see
+    `covers()`.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        keys: Iterable[Sequence[str]],
+        measures: Sequence[str]
+    ):
+        self._df = df
+        self.measures: List[str] = list(measures)
+        self.sizes: Dict[GroupKey, pd.Series] = {}
+        self.tables: Dict[GroupKey, pd.DataFrame] = {}
+
+        values = df[self.measures].astype("float64")
+        stats = pd.concat(
+            {"count": values.notna(), "sum": values, "sumsq": values ** 2},
+            axis=1
+        )
+
+        for key in keys:
+            self._build(df, stats, tuple(key))
+
+    def _build(self, df: pd.DataFrame, stats: pd.DataFrame, key: GroupKey) -> None:
+        grouped = stats.groupby([df[column] for column in key], observed=True)
+
+        # One pass: non-null counts are summed booleans
+        table = grouped.sum()
+        table.index.names = list(key)
+
+        self.sizes[key] = grouped.size()
+        self.tables[key] = table
+
+    def covers(self, df: pd.DataFrame) -> bool:
+        return df is self._df
+
+    def aggregate(
+        self,
+        group_by: Union[str, Sequence[str]],
+        operation: str,
+        column: Optional[str] = None
+    ) -> Optional[pd.Series]:
+        """
+        Per-group result indexed by the group key, or None when the
+        (key, measure, operation) combination was not materialized.
+        """
+        key = (group_by,) if isinstance(group_by, str) else tuple(group_by)
+
+        if key not in self.tables:
+            return None
+
+        if operation == "count":
+            return self.sizes[key]
+
+        table = self.tables[key]
+        if column is None or ("sum", column) not in table.columns:
+            return None
+
+        count = table[("count", column)]
+        total = table[("sum", column)]
+
+        if operation == "sum":
+            return self._restore_dtype(total, column)
+
+        if operation == "average":
+            return total / count.where(count > 0)
+
+        if operation == "std":
+            squares = table[("sumsq", column)]
+            n = count.where(count > 1)
+            variance = ((squares - total ** 2 / n) / (n - 1)).clip(lower=0)
+            return np.sqrt(variance)
+
+        return None
+
+    def _restore_dtype(self, total: pd.Series, column: str) -> pd.Series:
+        # Integer measures sum to integers, as a live group-by would
+        if pd.api.types.is_integer_dtype(self._df[column]):
+            return total.astype("int64")
+        return total
+
+    @property
+    def nbytes(self) -> int:
+        return int(
+            sum(table.memory_usage(deep=True).sum() for table in self.tables.values())
+            + sum(size.memory_usage(deep=True) for size in self.sizes.values())
+        )
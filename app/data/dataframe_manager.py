@@ -80,20 +80,65 @@
 #         return query_func(self.df.copy())
 
 
-from typing import Optional, Dict, Any
+import os
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, Sequence
+import sys
+import tempfile
+import threading
+import numpy as np
 import pandas as pd
 
+from app.data.aggregate_cube import AggregateCube
+from app.data.equality_index import EqualityIndex
+from app.data.filter_engine import filter_positions
+from app.data.text_index import TextIndex
+
 
 class DataFrameManager:
     """
     Manages a pandas DataFrame and provides filtered views
     for downstream tools.
 
-    Data source can be CSV, Snowflake, or injected DataFrame.
+    Data source can be a columnar snapshot, CSV, Snowflake,
+    or injected DataFrame.
+
+    The equality index, text index and aggregate cube are derived from
+    the loaded frame on first use, so a load only pays for the frame.
     """
 
-    def __init__(self):
+    SNAPSHOT_SUFFIX = ".feather"
+
+    # String columns whose distinct/non-null ratio is at or below this
+    # are dictionary-encoded (pandas categorical)
+    CATEGORICAL_MAX_RATIO = 0.5
+
+    # Group-by columns with more distinct values than this are not cubed
+    CUBE_MAX_GROUPS = 10_000
+
+    def __init__(
+        self,
+        cube_pairs: Optional[Sequence[Sequence[str]]] = None,
+        text_columns: Optional[Sequence[str]] = None
+    ):
         self._df: Optional[pd.DataFrame] = None
+        self._equality_index: Optional[EqualityIndex] = None
+        self._text_index: Optional[TextIndex] = None
+        self._aggregate_cube: Optional[AggregateCube] = None
+
+        # Guards the lazy index builds against concurrent first use and
+        # reloads; re-entrant because the text index and cube build on
+        # the equality index
+        self._index_lock = threading.RLock()
+
+        # Bumped on every load; caches key their entries on it
+        self._generation = 0
+
+        # Two-column group keys to pre-aggregate in addition to single columns
+        self._cube_pairs = [tuple(pair) for pair in cube_pairs or []]
+
+        # Columns to text-index; None = every string column
+        self._text_columns = list(text_columns) if text_columns is not None else None
 
     # ---------- Loaders (ONLY ONE USED AT A TIME) ----------
 
@@ -102,13 +147,69 @@ class DataFrameManager:
         Load data from a CSV file into memory.
         Primary data source for POC.
         """
-        self._df = pd.read_csv(file_path)
+        self._set_dataframe(pd.read_csv(file_path))
+
+    def load_from_snapshot(
+        self,
+        file_path: str,
+        columns: Optional[list[str]] = None
+    ) -> None:
+        """
+        Load a columnar Arrow IPC (Feather v2) snapshot.
+
+        The file is memory-mapped: only the requested columns are
+        paged in, and fixed-width columns are handed to pandas
+        without copying.
+        """
+        feather = _import_feather()
+
+        table = feather.read_table(
+            file_path,
+            columns=columns,
+            memory_map=True
+        )
+        self._set_dataframe(
+            table.to_pandas(split_blocks=True, self_destruct=True)
+        )
+
+    def load_from_csv_or_snapshot(self, csv_path: str) -> None:
+        """
+        Prefer the columnar snapshot stored next to the CSV.
+
+        If it is missing or older than the CSV, parse the CSV once and
+        write the snapshot so the next process start can memory-map it.
+        """
+        snapshot_path = self.snapshot_path_for(csv_path)
+
+        if self._snapshot_is_fresh(snapshot_path, csv_path):
+            self.load_from_snapshot(str(snapshot_path))
+            return
+
+        self.load_from_csv(csv_path)
+
+        # Workers starting together: another one may have written it
+        # while this one parsed the CSV
+        if self._snapshot_is_fresh(snapshot_path, csv_path):
+            return
+
+        try:
+            self.write_snapshot(self.get_dataframe(), str(snapshot_path))
+        except (RuntimeError, OSError):
+            # Snapshot is an optimisation only; CSV data is already loaded
+            pass
+
+    @staticmethod
+    def _snapshot_is_fresh(snapshot_path: Path, csv_path: str) -> bool:
+        return (
+            snapshot_path.exists()
+            and snapshot_path.stat().st_mtime >= Path(csv_path).stat().st_mtime
+        )
 
     def load_from_dataframe(self, df: pd.DataFrame) -> None:
         """
         Inject a DataFrame directly (used for tests / mocks).
         """
-        self._df = df.copy()
+        self._set_dataframe(df.copy())
 
     # def load_from_snowflake(self, connector) -> None:
     #     """
@@ -123,6 +224,165 @@ class DataFrameManager:
         "Use CSV snapshots only."
     )
 
+    def _set_dataframe(self, df: pd.DataFrame) -> None:
+        df = self._optimize_dtypes(df)
+
+        with self._index_lock:
+            self._df = df
+            self._equality_index = None
+            self._text_index = None
+            self._aggregate_cube = None
+            self._generation += 1
+
+    def _derived(self, attribute: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+        """
+        Structure derived from the loaded frame, built on first use.
+        """
+        value = getattr(self, attribute)
+        if value is not None or self._df is None:
+            return value
+
+        with self._index_lock:
+            value = getattr(self, attribute)
+            if value is None:
+                value = build(self._df)
+                setattr(self, attribute, value)
+            return value
+
+    def _build_equality_index(self, df: pd.DataFrame) -> EqualityIndex:
+        return EqualityIndex(df, max_cardinality_ratio=self.CATEGORICAL_MAX_RATIO)
+
+    def _build_text_index(self, df: pd.DataFrame) -> TextIndex:
+        return TextIndex(df, self.equality_index, self._text_columns)
+
+    def _build_cube(self, df: pd.DataFrame) -> AggregateCube:
+        """
+        Cube every indexed column (and configured pair) against every
+        non-empty numeric column.
+        """
+        index = self.equality_index
+        measures = [
+            column for column in df.columns
+            if pd.api.types.is_numeric_dtype(df[column]) and df[column].notna().any()
+        ]
+        keys = [
+            (column,) for column, postings in index.columns.items()
+            if len(postings.values) <= self.CUBE_MAX_GROUPS
+        ]
+        keys += [
+            pair for pair in self._cube_pairs
+            if all(column in df.columns for column in pair)
+        ]
+
+        return AggregateCube(df, keys=keys, measures=measures)
+
+    # ---------- Memory Layout ----------
+
+    def _optimize_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Dictionary-encode low-cardinality strings and downcast integers.
+
+        Categorical columns store one int8/int16 code per row plus each
+        distinct string once, so equality checks and group-bys run on
+        integer codes instead of Python objects.
+        """
+        converted: Dict[str, pd.Series] = {}
+
+        for column in df.columns:
+            series = df[column]
+
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                continue
+
+            if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                non_null = series.count()
+                if non_null and series.nunique() / non_null <= self.CATEGORICAL_MAX_RATIO:
+                    converted[column] = series.astype("category")
+
+            elif pd.api.types.is_integer_dtype(series):
+                converted[column] = pd.to_numeric(series, downcast="integer")
+
+        if not converted:
+            return df
+
+        return df.assign(**converted)
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Per-column memory breakdown of the loaded DataFrame.
+        """
+        df = self.get_dataframe()
+        usage = df.memory_usage(index=False, deep=True)
+
+        columns = [
+            {
+                "column": column,
+                "dtype": str(df[column].dtype),
+                "cardinality": int(df[column].nunique()),
+                "bytes": int(usage[column]),
+                "original_bytes": _unencoded_bytes(df[column], int(usage[column])),
+            }
+            for column in df.columns
+        ]
+        columns.sort(key=lambda row: row["bytes"], reverse=True)
+
+        total = sum(row["bytes"] for row in columns)
+        original = sum(row["original_bytes"] for row in columns)
+
+        # Counts the derived structures in full, building any not yet used
+        index_bytes = sum(
+            index.nbytes
+            for index in (self.equality_index, self.text_index, self.aggregate_cube)
+            if index is not None
+        )
+
+        return {
+            "rows": len(df),
+            "total_bytes": total,
+            "original_bytes": original,
+            "index_bytes": index_bytes,
+            "columns": columns,
+        }
+
+    # ---------- Snapshot Helpers ----------
+
+    @classmethod
+    def snapshot_path_for(cls, csv_path: str) -> Path:
+        """
+        Columnar snapshot location for a given CSV snapshot.
+        """
+        return Path(csv_path).with_suffix(cls.SNAPSHOT_SUFFIX)
+
+    @staticmethod
+    def write_snapshot(df: pd.DataFrame, file_path: str) -> None:
+        """
+        Write an uncompressed Arrow IPC (Feather v2) snapshot.
+
+        Compression is disabled on purpose: compressed buffers
+        cannot be memory-mapped without decoding.
+
+        The file is written next to its destination and renamed into
+        place, so concurrent readers never map a partial snapshot.
+        """
+        feather = _import_feather()
+
+        directory = os.path.dirname(os.path.abspath(file_path))
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=".snapshot-", suffix=".tmp"
+        )
+        os.close(fd)
+
+        try:
+            feather.write_feather(
+                df.reset_index(drop=True),
+                temp_path,
+                compression="uncompressed"
+            )
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
     # ---------- Core Accessors ----------
 
     def get_dataframe(self) -> pd.DataFrame:
@@ -130,20 +390,52 @@ class DataFrameManager:
             raise ValueError("DataFrame not initialized. Load data first.")
         return self._df
 
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    @property
+    def equality_index(self) -> Optional[EqualityIndex]:
+        return self._derived("_equality_index", self._build_equality_index)
+
+    @property
+    def text_index(self) -> Optional[TextIndex]:
+        return self._derived("_text_index", self._build_text_index)
+
+    @property
+    def aggregate_cube(self) -> Optional[AggregateCube]:
+        return self._derived("_aggregate_cube", self._build_cube)
+
     # ---------- Query Helpers (USED BY TOOLS) ----------
 
-    def filter_dataframe(self, filters: Dict[str, Any]) -> pd.DataFrame:
+    def filter_positions(
+        self,
+        filters: Dict[str, Any],
+        where: Optional[Dict[str, Any]] = None
+    ) -> np.ndarray:
         """
-        Apply column=value filters.
+        Resolve column=value filters and a `where` predicate tree
+        (see app.data.filter_engine) to sorted row positions.
         """
         df = self.get_dataframe()
 
-        for column, value in filters.items():
+        for column in filters:
             if column not in df.columns:
                 raise ValueError(f"Invalid column: {column}")
-            df = df[df[column] == value]
 
-        return df
+        return filter_positions(df, filters, where, self.equality_index, self.text_index)
+
+    def filter_dataframe(
+        self,
+        filters: Dict[str, Any],
+        where: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """
+        Apply column=value filters and a `where` predicate tree.
+
+        Rows are materialized once, after all filters are resolved.
+        """
+        return self.get_dataframe().take(self.filter_positions(filters, where))
 
     def select_columns(self, columns: list[str]) -> pd.DataFrame:
         df = self.get_dataframe()
@@ -154,4 +446,33 @@ class DataFrameManager:
 
         return df[columns]
 
-    
+
+def _unencoded_bytes(series: pd.Series, encoded_bytes: int) -> int:
+    """
+    Estimated size of a column before dtype optimization
+    (object strings / int64), computed from the encoded column.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        counts = series.cat.codes.value_counts()
+        sizes = {
+            code: sys.getsizeof(series.cat.categories[code]) if code >= 0 else sys.getsizeof(np.nan)
+            for code in counts.index
+        }
+        return int(8 * len(series) + sum(count * sizes[code] for code, count in counts.items()))
+
+    if pd.api.types.is_integer_dtype(series):
+        return 8 * len(series)
+
+    return encoded_bytes
+
+
+def _import_feather():
+    try:
+        from pyarrow import feather
+    except ImportError as e:
+        raise RuntimeError(
+            "pyarrow is required for columnar snapshots. "
+            "Install it or load the CSV snapshot instead."
+        ) from e
+
+    return feather
@@ -0,0 +1,128 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+
+class ColumnPostings:
+    """
+    Row positions of every distinct value of one column.
+
+    Rows are stored grouped by value in a single int32 array
+    (`order`); the rows of value i are order[offsets[i]:offsets[i + 1]],
+    already sorted ascending.
+    """
+
+    def __init__(self, series: pd.Series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            values = series.cat.categories
+        else:
+            codes, values = pd.factorize(series)
+
+        self.values = pd.Index(values)
+
+        # Stable sort keeps row positions ascending inside each value;
+        # missing values (code -1) sort first and are dropped
+        order = np.argsort(codes, kind="stable").astype(np.int32)
+        missing = int((codes < 0).sum())
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.values))
+
+        self.order = order[missing:]
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def code_of(self, value: Any) -> int:
+        try:
+            return int(self.values.get_indexer([value])[0])
+        except TypeError as e:
+            raise ValueError(f"Unsupported filter value: {value!r}") from e
+
+    def positions_of_code(self, code: int) -> np.ndarray:
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+    def lookup(self, value: Any) -> np.ndarray:
+        """
+        Sorted row positions where the column equals `value`.
+        """
+        code = self.code_of(value)
+        if code < 0:
+            return np.empty(0, dtype=np.int32)
+        return self.positions_of_code(code)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.order.nbytes + self.offsets.nbytes)
+
+
+class EqualityIndex:
+    """
+    Inverted value -> row-positions index for low-cardinality columns.
+
+    Built once per loaded DataFrame. Positions are only meaningful for
+    that exact frame, see `covers()`.
+    """
+
+    def __init__(self, df: pd.DataFrame, max_cardinality_ratio: float = 0.5):
+        self._df = df
+        self.columns: Dict[str, ColumnPostings] = {}
+
+        for column in df.columns:
+            series = df[column]
+            non_null = series.count()
+
+            if not non_null:
+                continue
+
+            if (
+                isinstance(series.dtype, pd.CategoricalDtype)
+                or series.nunique() / non_null <= max_cardinality_ratio
+            ):
+                self.columns[column] = ColumnPostings(series)
+
+    def covers(self, df: pd.DataFrame) -> bool:
+        return df is self._df
+
+    def lookup(self, column: str, value: Any) -> np.ndarray:
+        return self.columns[column].lookup(value)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(postings.nbytes for postings in self.columns.values())
+
+
+# ---------- Position Helpers ----------
+
+def equality_mask(series: pd.Series, value: Any) -> np.ndarray:
+    """
+    Boolean mask for `series == value`.
+
+    Categorical columns are compared on their integer codes: the value
+    is looked up once in the categories instead of per row.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        code = series.cat.categories.get_indexer([value])[0]
+        if code < 0:
+            return np.zeros(len(series), dtype=bool)
+        return series.cat.codes.to_numpy() == code
+
+    return (series == value).to_numpy()
+
+
+def intersect_sorted(arrays: List[np.ndarray]) -> np.ndarray:
+    """
+    Intersect sorted, duplicate-free position arrays.
+
+    Starts from the shortest list and probes the others with binary
+    search, so cost scales with the most selective filter.
+    """
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+
+    for other in arrays[1:]:
+        if not len(result):
+            break
+        idx = np.searchsorted(other, result)
+        idx[idx == len(other)] = 0
+        result = result[other[idx] == result]
+
+    return result
+
@@ -0,0 +1,471 @@
+"""
+Predicate trees shared by every tool.
+
+A `where` tree is plain JSON, so the planner can emit it directly:
+
+    {"and": [
+        {"eq": {"CATEGORY": "Breastfeeding Support"}},
+        {"in": {"SITE_COUNTRY": ["India", "Kenya"]}},
+        {"range": {"EFFECTIVE_YEAR": {"gte": 2022, "lte": 2024}}},
+        {"not": {"is_null": "SCORE"}},
+        {"contains": {"QUESTION": "parental leave"}}
+    ]}
+
+Operators: eq, in, range (gt / gte / lt / lte), is_null, contains
+(case-insensitive substring), not, and, or. eq / in / range / contains
+accept several columns at once, which are AND-ed.
+
+The tree is compiled once into predicate objects and evaluated into a
+single boolean mask (or sorted row positions) over the frame; no
+intermediate DataFrames are created.
+"""
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from app.data.equality_index import EqualityIndex, equality_mask, intersect_sorted
+from app.data.text_index import REGEX_METACHARACTERS, TextIndex
+
+
+RANGE_OPERATORS: Dict[str, Callable[[Any, Any], np.ndarray]] = {
+    "gt": np.greater,
+    "gte": np.greater_equal,
+    "lt": np.less,
+    "lte": np.less_equal,
+}
+
+OPERATORS = ("eq", "in", "range", "is_null", "contains", "not", "and", "or")
+
+
+class _Context:
+    """
+    Frame plus the load-time indexes that cover it.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        equality_index: Optional[EqualityIndex],
+        text_index: Optional[TextIndex]
+    ):
+        self.df = df
+        self.equality_index = equality_index if equality_index is not None and equality_index.covers(df) else None
+        self.text_index = text_index if text_index is not None and text_index.covers(df) else None
+
+    def series(self, column: str) -> pd.Series:
+        if column not in self.df.columns:
+            raise ValueError(f"Invalid column: {column}")
+        return self.df[column]
+
+    def indexed(self, column: str) -> bool:
+        return self.equality_index is not None and column in self.equality_index.columns
+
+    def from_positions(self, positions: np.ndarray) -> np.ndarray:
+        mask = np.zeros(len(self.df), dtype=bool)
+        mask[positions] = True
+        return mask
+
+
+# -------------------------------------------------
+# Compiled predicates
+# -------------------------------------------------
+class Predicate(ABC):
+
+    @abstractmethod
+    def mask(self, ctx: _Context) -> np.ndarray:
+        """Boolean mask over every row of the frame."""
+
+    def positions(self, ctx: _Context) -> Optional[np.ndarray]:
+        """
+        Sorted matching row positions when an index answers this
+        predicate directly, else None (evaluate `mask` instead).
+        """
+        return None
+
+
+class Eq(Predicate):
+
+    def __init__(self, column: str, value: Any):
+        self.column = column
+        self.value = value
+
+    def mask(self, ctx: _Context) -> np.ndarray:
+        return equality_mask(ctx.series(self.column), self.value)
+
+    def positions(self, ctx: _Context) -> Optional[np.ndarray]:
+        if not ctx.indexed(self.column):
+            return None
+        return ctx.equality_index.lookup(self.column, self.value)  # type: ignore[union-attr]
+
+
+class In(Predicate):
+
+    def __init__(self, column: str, values: List[Any]):
+        self.column = column
+        # Repeated values would repeat their rows in the postings merge
+        self.values = list(dict.fromkeys(values))
+
+    def mask(self, ctx: _Context) -> np.ndarray:
+        series = ctx.series(self.column)
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Lookup table over category codes; the extra slot is code -1 (NaN)
+            codes = series.cat.categories.get_indexer(self.values)
+            table = np.zeros(len(series.cat.categories) + 1, dtype=bool)
+            table[codes[codes >= 0]] = True
+            return table[series.cat.codes.to_numpy()]
+
+        return series.isin(self.values).to_numpy()
+
+    def positions(self, ctx: _Context) -> Optional[np.ndarray]:
+        if not ctx.indexed(self.column):
+            return None
+
+        # Each value's rows are disjoint and sorted; one sort merges them
+        lists = [ctx.equality_index.lookup(self.column, value) for value in self.values]  # type: ignore[union-attr]
+        return np.sort(np.concatenate(lists)) if lists else np.empty(0, dtype=np.int32)
+
+
+class Range(Predicate):
+
+    def __init__(self, column: str, bounds: Dict[str, Any]):
+        self.column = column
+        self.bounds = bounds
+
+    def mask(self, ctx: _Context) -> np.ndarray:
+        series = ctx.series(self.column)
+        if not pd.api.types.is_numeric_dtype(series):
+            raise ValueError(f"Range filter needs a numeric column, got '{self.column}'")
+
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        mask = np.ones(len(values), dtype=bool)
+
+        # NaN compares False, so missing values never match a range
+        for operator, bound in self.bounds.items():
+            mask &= RANGE_OPERATORS[operator](values, bound)
+
+        return mask
+
+
+class IsNull(Predicate):
+
+    def __init__(self, column: str):
+        self.column = column
+
+    def mask(self, ctx: _Context) -> np.ndarray:
+        return ctx.series(self.column).isna().to_numpy()
+
+
+class Contains(Predicate):
+
+    def __init__(self, column: str, text: str):
+        self.column = column
+        self.text = text
+
+    def mask(self, ctx: _Context) -> np.ndarray:
+        positions = self.positions(ctx)
+        if positions is not None:
+            return ctx.from_positions(positions)
+
+        series = ctx.series(self.column)
+        regex = bool(REGEX_METACHARACTERS & set(self.text))
+
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Match each distinct value once, then broadcast over the codes
+            hits = series.cat.categories.astype(str).str.contains(
+                self.text, case=False, regex=regex
+            )
+            table = np.append(np.asarray(hits, dtype=bool), False)
+            return table[series.cat.codes.to_numpy()]
+
+        return series.astype(str).str.contains(
+            self.text, case=False, regex=regex
+        ).to_numpy(dtype=bool) & series.notna().to_numpy()
+
+    def positions(self, ctx: _Context) -> Optional[np.ndarray]:
+        if ctx.text_index is None:
+            return None
+
+        hit = ctx.text_index.search(self.column, self.text, "substring")
+        return hit[0] if hit is not None else None
+
+
+class Not(Predicate):
+
+    def __init__(self, child: Predicate):
+        self.child = child
+
+    def mask(self, ctx: _Context) -> np.ndarray:
+        return ~self.child.mask(ctx)
+
+
+class And(Predicate):
+
+    def __init__(self, children: List[Predicate]):
+        self.children = children
+
+    def mask(self, ctx: _Context) -> np.ndarray:
+        mask = np.ones(len(ctx.df), dtype=bool)
+        for child in self.children:
+            mask &= child.mask(ctx)
+        return mask
+
+
+class Or(Predicate):
+
+    def __init__(self, children: List[Predicate]):
+        self.children = children
+
+    def mask(self, ctx: _Context) -> np.ndarray:
+        mask = np.zeros(len(ctx.df), dtype=bool)
+        for child in self.children:
+            mask |= child.mask(ctx)
+        return mask
+
+
+# -------------------------------------------------
+# Compilation
+# -------------------------------------------------
+def compile_where(tree: Any) -> Predicate:
+    """
+    Validate a `where` tree and compile it into predicates.
+    Raises ValueError describing the first malformed node.
+    """
+    if not isinstance(tree, dict) or len(tree) != 1:
+        raise ValueError(f"Each condition must be an object with one operator, got {tree!r}")
+
+    operator, operand = next(iter(tree.items()))
+
+    if operator in ("and", "or"):
+        if not isinstance(operand, list) or not operand:
+            raise ValueError(f"'{operator}' needs a non-empty list of conditions")
+        children = [compile_where(child) for child in operand]
+        return And(children) if operator == "and" else Or(children)
+
+    if operator == "not":
+        return Not(compile_where(operand))
+
+    if operator == "is_null":
+        columns = [operand] if isinstance(operand, str) else operand
+        if not isinstance(columns, list) or not columns:
+            raise ValueError("'is_null' needs a column name or a list of them")
+        return _all([IsNull(column) for column in columns])
+
+    if operator not in OPERATORS:
+        raise ValueError(f"Unsupported filter operator: {operator}")
+
+    if not isinstance(operand, dict) or not operand:
+        raise ValueError(f"'{operator}' needs an object of column -> value")
+
+    return _all([_leaf(operator, column, value) for column, value in operand.items()])
+
+
+def _leaf(operator: str, column: str, value: Any) -> Predicate:
+    if operator == "eq":
+        return Eq(column, value)
+
+    if operator == "in":
+        if not isinstance(value, list) or not value:
+            raise ValueError(f"'in' on {column} needs a non-empty list of values")
+        return In(column, value)
+
+    if operator == "range":
+        if not isinstance(value, dict) or not value or set(value) - set(RANGE_OPERATORS):
+            raise ValueError(
+                f"'range' on {column} needs bounds among {', '.join(RANGE_OPERATORS)}"
+            )
+        try:
+            bounds = {bound: float(limit) for bound, limit in value.items()}
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"'range' bounds on {column} must be numbers") from e
+        return Range(column, bounds)
+
+    # contains
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"'contains' on {column} needs a non-empty string")
+    return Contains(column, value)
+
+
+def _all(predicates: List[Predicate]) -> Predicate:
+    return predicates[0] if len(predicates) == 1 else And(predicates)
+
+
+def map_columns(tree: Any, resolve: Callable[[str], str]) -> Any:
+    """
+    Copy of a (structurally valid) `where` tree with every column name
+    passed through `resolve`.
+    """
+    if not isinstance(tree, dict):
+        return tree
+
+    result = {}
+    for operator, operand in tree.items():
+        if operator in ("and", "or") and isinstance(operand, list):
+            result[operator] = [map_columns(child, resolve) for child in operand]
+        elif operator == "not":
+            result[operator] = map_columns(operand, resolve)
+        elif operator == "is_null":
+            result[operator] = (
+                resolve(operand) if isinstance(operand, str)
+                else [resolve(column) for column in operand]
+            )
+        elif isinstance(operand, dict):
+            result[operator] = {resolve(column): value for column, value in operand.items()}
+        else:
+            result[operator] = operand
+
+    return result
+
+
+RANGE_SYMBOLS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+def describe_where(tree: Any) -> str:
+    """
+    Human-readable form of a `where` tree, for answers and logs.
+    """
+    if not isinstance(tree, dict) or len(tree) != 1:
+        return str(tree)
+
+    operator, operand = next(iter(tree.items()))
+
+    if operator in ("and", "or"):
+        parts = [describe_where(child) for child in operand]
+        joined = f" {operator} ".join(parts)
+        return f"({joined})" if operator == "or" and len(parts) > 1 else joined
+
+    if operator == "not":
+        return f"not ({describe_where(operand)})"
+
+    if operator == "is_null":
+        columns = [operand] if isinstance(operand, str) else operand
+        return " and ".join(f"{column} is missing" for column in columns)
+
+    parts = []
+    for column, value in operand.items():
+        if operator == "eq":
+            parts.append(f"{column} = {value}")
+        elif operator == "in":
+            parts.append(f"{column} in ({', '.join(str(v) for v in value)})")
+        elif operator == "range":
+            parts.extend(
+                f"{column} {RANGE_SYMBOLS.get(bound, bound)} {limit}"
+                for bound, limit in value.items()
+            )
+        else:
+            parts.append(f'{column} contains "{value}"')
+
+    return " and ".join(parts)
+
+
+# -------------------------------------------------
+# Evaluation
+# -------------------------------------------------
+def build_predicate(
+    filters: Optional[Dict[str, Any]] = None,
+    where: Optional[Dict[str, Any]] = None
+) -> Optional[Predicate]:
+    """
+    Legacy column=value `filters` and a `where` tree, AND-ed.
+    None when there is nothing to filter on.
+    """
+    predicates: List[Predicate] = [Eq(column, value) for column, value in (filters or {}).items()]
+    if where:
+        predicates.append(compile_where(where))
+
+    return _all(predicates) if predicates else None
+
+
+def evaluate_positions(
+    df: pd.DataFrame,
+    predicate: Optional[Predicate],
+    equality_index: Optional[EqualityIndex] = None,
+    text_index: Optional[TextIndex] = None
+) -> np.ndarray:
+    """
+    Sorted row positions matching `predicate` (all rows for None).
+
+    Top-level conjuncts an index can answer (eq / in on indexed columns,
+    plain-text contains) become posting lists, intersected from the
+    most selective one; everything else is folded into one boolean
+    mask, evaluated in a single vectorized pass and applied to the
+    surviving positions.
+    """
+    return _evaluate(df, predicate, equality_index, text_index)[0]
+
+
+def _evaluate(
+    df: pd.DataFrame,
+    predicate: Optional[Predicate],
+    equality_index: Optional[EqualityIndex],
+    text_index: Optional[TextIndex]
+) -> Tuple[np.ndarray, int]:
+    """
+    Positions plus the number of rows examined: the whole frame once
+    any conjunct needed a mask, else only the index candidates.
+    """
+    if predicate is None:
+        return np.arange(len(df)), 0
+
+    ctx = _Context(df, equality_index, text_index)
+    conjuncts = list(_conjuncts(predicate))
+
+    postings: List[np.ndarray] = []
+    mask: Optional[np.ndarray] = None
+
+    for conjunct in conjuncts:
+        positions = conjunct.positions(ctx)
+        if positions is not None:
+            postings.append(positions)
+            continue
+
+        conjunct_mask = conjunct.mask(ctx)
+        mask = conjunct_mask if mask is None else mask & conjunct_mask
+
+    if postings:
+        positions = intersect_sorted(postings)
+        if mask is not None:
+            return positions[mask[positions]], len(df)
+        return positions, len(positions)
+
+    if mask is not None:
+        return np.flatnonzero(mask), len(df)
+
+    return np.arange(len(df)), 0
+
+
+def _conjuncts(predicate: Predicate) -> Iterator[Predicate]:
+    if isinstance(predicate, And):
+        for child in predicate.children:
+            yield from _conjuncts(child)
+    else:
+        yield predicate
+
+
+def filter_positions(
+    df: pd.DataFrame,
+    filters: Optional[Dict[str, Any]] = None,
+    where: Optional[Dict[str, Any]] = None,
+    equality_index: Optional[EqualityIndex] = None,
+    text_index: Optional[TextIndex] = None
+) -> np.ndarray:
+    """
+    Sorted row positions matching column=value `filters` and `where`.
+    """
+    return scan_positions(df, filters, where, equality_index, text_index)[0]
+
+
+def scan_positions(
+    df: pd.DataFrame,
+    filters: Optional[Dict[str, Any]] = None,
+    where: Optional[Dict[str, Any]] = None,
+    equality_index: Optional[EqualityIndex] = None,
+    text_index: Optional[TextIndex] = None
+) -> Tuple[np.ndarray, int]:
+    """
+    `filter_positions` plus the number of rows it had to examine.
+    """
+    predicate = build_predicate(filters, where)
+    return _evaluate(df, predicate, equality_index, text_index)
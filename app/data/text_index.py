@@ -0,0 +1,196 @@
+import re
+from collections import defaultdict
+from typing import Dict, Optional, Sequence, Set, Tuple
+import numpy as np
+import pandas as pd
+
+from app.data.equality_index import ColumnPostings, EqualityIndex, intersect_sorted
+
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Characters that make a `str.contains` pattern an actual regex
+REGEX_METACHARACTERS = set(".^$*+?{}[]\\|()")
+
+NGRAM_SIZE = 3
+
+
+class TextColumn:
+    """
+    Token and trigram postings over the distinct values of one column.
+
+    Postings point at value codes of the column's ColumnPostings, so a
+    column with 5M rows but 200 distinct answers only indexes 200 strings.
+    """
+
+    def __init__(self, postings: ColumnPostings):
+        self.postings = postings
+        self.values = [
+            str(value).lower() if isinstance(value, str) else ""
+            for value in postings.values
+        ]
+
+        tokens: Dict[str, Set[int]] = defaultdict(set)
+        grams: Dict[str, Set[int]] = defaultdict(set)
+        token_counts = []
+
+        for code, text in enumerate(self.values):
+            value_tokens = TOKEN_RE.findall(text)
+            token_counts.append(len(value_tokens))
+
+            for token in value_tokens:
+                tokens[token].add(code)
+
+            for i in range(len(text) - NGRAM_SIZE + 1):
+                grams[text[i:i + NGRAM_SIZE]].add(code)
+
+        self.token_counts = np.maximum(np.array(token_counts, dtype=np.int32), 1)
+        self.tokens = {key: _sorted_codes(codes) for key, codes in tokens.items()}
+        self.grams = {key: _sorted_codes(codes) for key, codes in grams.items()}
+
+    def substring_codes(self, needle: str) -> np.ndarray:
+        """
+        Codes of values containing `needle` (already lowercased).
+
+        Trigram postings narrow the candidates; candidates are then
+        verified against the distinct value itself.
+        """
+        if len(needle) >= NGRAM_SIZE:
+            lists = []
+            for i in range(len(needle) - NGRAM_SIZE + 1):
+                codes = self.grams.get(needle[i:i + NGRAM_SIZE])
+                if codes is None:
+                    return np.empty(0, dtype=np.int32)
+                lists.append(codes)
+            candidates = intersect_sorted(lists)
+        else:
+            candidates = np.arange(len(self.values), dtype=np.int32)
+
+        return np.array(
+            [code for code in candidates if needle in self.values[code]],
+            dtype=np.int32
+        )
+
+    def keyword_codes(self, text: str) -> np.ndarray:
+        """
+        Codes of values containing every token of `text` as a whole word.
+        """
+        lists = []
+        for token in set(TOKEN_RE.findall(text)):
+            codes = self.tokens.get(token)
+            if codes is None:
+                return np.empty(0, dtype=np.int32)
+            lists.append(codes)
+
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+
+        return intersect_sorted(lists)
+
+    def relevance(self, codes: np.ndarray, text: str) -> np.ndarray:
+        """
+        Share of each value's tokens that are query tokens.
+        Short, focused values rank above long ones mentioning the term.
+        """
+        query_tokens = TOKEN_RE.findall(text)
+        hits = np.array(
+            [
+                sum(TOKEN_RE.findall(self.values[code]).count(token) for token in query_tokens)
+                for code in codes
+            ],
+            dtype=np.float64
+        )
+        return hits / self.token_counts[codes]
+
+
+class TextIndex:
+    """
+    Inverted text index for `contains` / keyword search.
+
+    Covers the string columns of the frame, chosen by dtype (or the
+    explicit `columns`), whatever their cardinality: high-cardinality
+    free text is where a scan costs most. Columns already in the
+    EqualityIndex reuse its postings; the others get their own.
+    Matching distinct values are expanded to row positions through
+    those postings.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        equality_index: Optional[EqualityIndex] = None,
+        columns: Optional[Sequence[str]] = None
+    ):
+        self._df = df
+        self.columns: Dict[str, TextColumn] = {}
+
+        if columns is None:
+            columns = [column for column in df.columns if _is_text_column(df[column])]
+
+        for column in columns:
+            if column not in df.columns or not df[column].count():
+                continue
+
+            postings = equality_index.columns.get(column) if equality_index is not None else None
+            self.columns[column] = TextColumn(postings or ColumnPostings(df[column]))
+
+    def covers(self, df: pd.DataFrame) -> bool:
+        return df is self._df
+
+    def search(
+        self,
+        column: str,
+        text: str,
+        mode: str = "substring"
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Sorted row positions matching `text` plus a relevance score per row.
+
+        Returns None when the index cannot serve the query (column not
+        indexed or pattern uses regex syntax); callers then fall back to
+        a scan.
+        """
+        text_column = self.columns.get(column)
+        if text_column is None or not isinstance(text, str):
+            return None
+
+        needle = text.lower()
+
+        if mode == "keywords":
+            codes = text_column.keyword_codes(needle)
+        elif mode == "substring":
+            if REGEX_METACHARACTERS & set(needle):
+                return None
+            codes = text_column.substring_codes(needle)
+        else:
+            raise ValueError(f"Unsupported text search mode: {mode}")
+
+        if not len(codes):
+            empty = np.empty(0, dtype=np.int32)
+            return empty, np.empty(0, dtype=np.float64)
+
+        scores = text_column.relevance(codes, needle)
+        row_lists = [text_column.postings.positions_of_code(code) for code in codes]
+
+        positions = np.concatenate(row_lists)
+        row_scores = np.repeat(scores, [len(rows) for rows in row_lists])
+
+        order = np.argsort(positions, kind="stable")
+        return positions[order], row_scores[order]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            sum(codes.nbytes for codes in column.tokens.values())
+            + sum(codes.nbytes for codes in column.grams.values())
+            for column in self.columns.values()
+        )
+
+
+def _sorted_codes(codes: Set[int]) -> np.ndarray:
+    return np.array(sorted(codes), dtype=np.int32)
+
+
+def _is_text_column(series: pd.Series) -> bool:
+    values = series.cat.categories if isinstance(series.dtype, pd.CategoricalDtype) else series
+    return pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)
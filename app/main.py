@@ -1,13 +1,25 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.api.routes import router
-from app.agents.reAct_agents import ReActAgent
-from app.data.dataframe_manager import DataFrameManager
-from app.tools.direct_query_tool import DirectQueryTool
-from app.tools.list_tool import ListTool
-from app.tools.aggregation_tool import AggregationTool
-from app.tools.comparison_tool import ComparisonTool
-from app.utils.llm_client import AzureOpenAIClient
+from app.api.dependencies import get_container
+from app.bootstrap import AppContainer, container
+from app.utils.metrics import REGISTRY
+
+
+# -------------------------------------------------
+# SINGLETON BOOTSTRAP (CRITICAL DESIGN)
+# -------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Dataset, LLM client, tools and agent are built once per worker
+    await run_in_threadpool(container.startup)
+    yield
+    await container.aclose()
+
 
 # -------------------------------------------------
 # FastAPI App
@@ -15,47 +27,32 @@ from app.utils.llm_client import AzureOpenAIClient
 app = FastAPI(
     title="Chatbot Pandas API",
     version="1.0.0",
-    description="ReAct-based data analytics agent"
+    description="ReAct-based data analytics agent",
+    lifespan=lifespan,
 )
 
+# Mount API routes
+app.include_router(router)
+
+
 # -------------------------------------------------
-# SINGLETON BOOTSTRAP (CRITICAL DESIGN)
+# Health (liveness) & Readiness Probes
 # -------------------------------------------------
+@app.get("/health")
+def health(container: AppContainer = Depends(get_container)):
+    return container.status()
 
-# Load dataset once
-df_manager = DataFrameManager()
-df_manager.load_from_csv(
-    "app/data/snapshots/G17_WFN_CONSOLIDATED_REPORT.csv"
-)
 
-# Azure OpenAI client
-llm_client = AzureOpenAIClient()
-
-# Tools (stateless)
-tools = {
-    "direct": DirectQueryTool(),
-    "list": ListTool(),
-    "aggregation": AggregationTool(),
-    "comparison": ComparisonTool(),
-}
-
-# Core agent
-agent = ReActAgent(
-    llm_client=llm_client,
-    dataframe_manager=df_manager,
-    tools=tools,
-)
+@app.get("/ready")
+def ready(container: AppContainer = Depends(get_container)):
+    status = container.status()
+    return JSONResponse(status_code=200 if container.ready else 503, content=status)
 
-# Mount API routes
-app.include_router(router)
 
 # -------------------------------------------------
-# TEMP Health Check (Phase 4.1 only)
+# Prometheus Metrics
 # -------------------------------------------------
-@app.get("/health")
-def health():
-    return {
-        "status": "ok",
-        "agent": "ready",
-        "tools": list(tools.keys())
-    }
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics(container: AppContainer = Depends(get_container)):
+    container.collect_metrics()
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
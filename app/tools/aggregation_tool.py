@@ -1,67 +1,226 @@
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
+import numpy as np
 import pandas as pd
 
+from app.data.filter_engine import filter_positions
 from app.tools.base_tool import BaseTool
 
 
 class AggregationTool(BaseTool):
+    """
+    Group-by aggregation over one or more key columns.
+
+    All requested metrics are computed from one grouping of the
+    (filtered) frame, or read from the aggregate cube when every metric
+    is pre-aggregated for the key. `having` conditions and top-k
+    selection then run on the small per-group table, so only the
+    groups asked for are returned.
+
+    Params take either the legacy single `operation` / `column` (result
+    column named after the operation) or a `metrics` list of
+    {"operation", "column"} (result columns "count", "<operation>_<column>").
+    """
+
     name = "aggregation"
 
+    # operation -> pandas aggregation used on the live path
+    AGG_FUNCTIONS = {
+        "count": "size",
+        "sum": "sum",
+        "average": "mean",
+        "std": "std",
+        "min": "min",
+        "max": "max",
+        "nunique": "nunique",
+    }
+
+    # Operations the aggregate cube can answer
+    CUBE_OPERATIONS = {"count", "sum", "average", "std"}
+
+    # Operations on any column type; the others need a numeric column
+    ANY_DTYPE_OPERATIONS = {"count", "nunique"}
+
     def execute(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
-        operation = params.get("operation")
         group_by = params.get("group_by")
-        column = params.get("column")
+        where = params.get("where")
+        having = params.get("having")
+        sort_by = params.get("sort_by")
+        order = params.get("order") or "desc"
+        limit = params.get("limit")
 
         # ----------------------------
         # Validate required params
         # ----------------------------
-        if not operation:
+        if not params.get("operation") and not params.get("metrics"):
             raise ValueError("Missing required parameter: operation")
 
         if not group_by:
             raise ValueError("Missing required parameter: group_by")
 
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Unsupported order: {order}")
+
+        if limit is not None and int(limit) < 1:
+            raise ValueError("limit must be at least 1")
+
         # ----------------------------
         # Normalize columns FIRST
         # ----------------------------
-        group_by = self._normalize_column(df, group_by)
-        column = self._normalize_column(df, column) if column else None
+        keys = [group_by] if isinstance(group_by, str) else list(group_by)
+        keys = list(dict.fromkeys(self._normalize_column(df, key) for key in keys))
 
-        # ----------------------------
-        # COUNT
-        # ----------------------------
-        if operation == "count":
-            result = (
-                df.groupby(group_by)
-                .size()
-                .reset_index(name="count")
-                .to_dict(orient="records")
-            )
+        metrics = self._metrics(df, params)
+
+        table = self._aggregate(df, keys, metrics, where)
 
         # ----------------------------
-        # SUM / AVERAGE
+        # HAVING: conditions on the per-group table
         # ----------------------------
-        elif operation in {"sum", "average"}:
-            if not column:
-                raise ValueError(f"'column' is required for operation '{operation}'")
+        if having:
+            with self._trace("having", rows_in=len(table)) as op:
+                positions = filter_positions(table.reset_index(), where=having)
+                table = table.iloc[positions]
+                op.set(rows_out=len(table))
 
-            self._validate_numeric_column(df, column)
+        groups = len(table)
 
-            agg_fn = "sum" if operation == "sum" else "mean"
+        if sort_by or limit:
+            with self._trace("top_k", rows_in=groups) as op:
+                table = _top_k(table, sort_by or metrics[0]["name"], order == "asc", limit)
+                op.set(rows_out=len(table))
 
-            result = (
-                df.groupby(group_by)[column]
-                .agg(agg_fn)
-                .reset_index(name=operation)
-                .to_dict(orient="records")
-            )
+        result = table.reset_index().to_dict(orient="records")
 
-        else:
-            raise ValueError(f"Unsupported operation: {operation}")
+        single = metrics[0] if len(metrics) == 1 else None
 
         return {
             "tool": self.name,
-            "operation": operation,
-            "group_by": group_by,
+            "operation": single["operation"] if single else None,
+            "group_by": keys[0] if isinstance(group_by, str) else keys,
+            "column": single["column"] if single else None,
+            "metrics": [metric["name"] for metric in metrics],
+            "where": where,
+            "having": having,
+            "groups": groups,
             "results": result,
         }
+
+    def _metrics(self, df: pd.DataFrame, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Validated [{"name", "operation", "column"}] for the request.
+        """
+        legacy = not params.get("metrics")
+        specs = [params] if legacy else params["metrics"]
+
+        metrics: Dict[str, Dict[str, Any]] = {}
+        for spec in specs:
+            operation = spec.get("operation")
+            column = spec.get("column")
+
+            if operation not in self.AGG_FUNCTIONS:
+                raise ValueError(f"Unsupported operation: {operation}")
+
+            column = self._normalize_column(df, column) if column else None
+
+            if operation != "count":
+                if not column:
+                    raise ValueError(f"'column' is required for operation '{operation}'")
+
+                if operation not in self.ANY_DTYPE_OPERATIONS:
+                    self._validate_numeric_column(df, column)
+
+            if legacy:
+                name = operation
+            else:
+                name = "count" if operation == "count" else f"{operation}_{column}"
+
+            metrics[name] = {"name": name, "operation": operation, "column": column}
+
+        return list(metrics.values())
+
+    def _aggregate(
+        self,
+        df: pd.DataFrame,
+        keys: List[str],
+        metrics: List[Dict[str, Any]],
+        where: Optional[Dict[str, Any]]
+    ) -> pd.DataFrame:
+        """
+        One row per group (indexed by the keys), one column per metric.
+        """
+        # ----------------------------
+        # Pre-aggregated cube (unfiltered frame)
+        # ----------------------------
+        cube = self._aggregate_cube(df) if not where else None
+        if cube is not None and all(m["operation"] in self.CUBE_OPERATIONS for m in metrics):
+            with self._trace("cube_lookup") as op:
+                columns = {
+                    m["name"]: cube.aggregate(keys, m["operation"], m["column"])
+                    for m in metrics
+                }
+                hit = all(series is not None for series in columns.values())
+                op.set(hit=hit)
+            if hit:
+                return pd.DataFrame(columns)
+
+        # ----------------------------
+        # Row filters: only the needed columns of matching rows
+        # ----------------------------
+        if where:
+            positions = self._filter_positions(df, {}, where)
+            measures = [m["column"] for m in metrics if m["operation"] != "count" and m["column"]]
+            needed = list(dict.fromkeys(keys + measures))
+            df = df[needed].take(positions)
+
+        # ----------------------------
+        # Live pandas fallback
+        # ----------------------------
+        # observed=True: categorical keys group on their integer codes
+        # and skip categories absent from this frame. The grouper (key
+        # factorization) is built once and shared by every metric.
+        with self._trace("groupby", rows_in=len(df)) as op:
+            self._scanned(len(df))
+            grouped = df.groupby(keys, observed=True)
+
+            columns = {}
+            for m in metrics:
+                if m["operation"] == "count":
+                    columns[m["name"]] = grouped.size()
+                else:
+                    columns[m["name"]] = grouped[m["column"]].agg(self.AGG_FUNCTIONS[m["operation"]])
+
+            table = pd.DataFrame(columns)
+            op.set(rows_out=len(table))
+
+        return table
+
+
+def _top_k(table: pd.DataFrame, sort_by: str, ascending: bool, limit: Optional[int]) -> pd.DataFrame:
+    """
+    The first `limit` groups ordered by a metric or key column.
+
+    Numeric orderings select the top k with np.argpartition (linear)
+    and only sort those k rows; missing values go last.
+    """
+    if sort_by in table.columns:
+        values = table[sort_by]
+    elif sort_by in table.index.names:
+        values = table.index.get_level_values(sort_by).to_series(index=table.index)
+    else:
+        raise ValueError(f"Invalid sort column: {sort_by}")
+
+    if not pd.api.types.is_numeric_dtype(values):
+        ordered = table.iloc[np.argsort(values.astype(str).to_numpy(), kind="stable")]
+        ordered = ordered if ascending else ordered.iloc[::-1]
+        return ordered.head(limit) if limit else ordered
+
+    key = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    key = np.where(np.isnan(key), np.inf, key if ascending else -key)
+
+    if limit and limit < len(key):
+        candidates = np.argpartition(key, limit - 1)[:limit]
+        selected = candidates[np.argsort(key[candidates], kind="stable")]
+    else:
+        selected = np.argsort(key, kind="stable")[:limit]
+
+    return table.iloc[selected]
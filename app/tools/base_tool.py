@@ -1,7 +1,36 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import functools
+import numpy as np
 import pandas as pd
 
+from app.data.aggregate_cube import AggregateCube
+from app.data.equality_index import EqualityIndex
+from app.data.filter_engine import scan_positions
+from app.data.text_index import TextIndex
+from app.utils.tracing import span, tracing_active
+
+
+# Rows examined by tool code in the current context, see count_rows_scanned
+_rows_scanned: ContextVar[Optional[List[int]]] = ContextVar("rows_scanned", default=None)
+
+
+@contextmanager
+def count_rows_scanned() -> Iterator[List[int]]:
+    """
+    Collect into counter[0] the rows tools examine inside the block:
+    frames masked or grouped, index candidates. Cube and index answers
+    add nothing.
+    """
+    counter = [0]
+    token = _rows_scanned.set(counter)
+    try:
+        yield counter
+    finally:
+        _rows_scanned.reset(token)
+
 
 class BaseTool(ABC):
     """
@@ -11,10 +40,40 @@ class BaseTool(ABC):
 
     name: str = "base"
 
+    def __init__(self, dataframe_manager=None):
+        # Optional: gives access to the indexes built at load time
+        self.df_manager = dataframe_manager
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        # Every concrete tool is traced without opting in
+        if "execute" in cls.__dict__:
+            cls.execute = _traced_execute(cls.__dict__["execute"])
+
     @abstractmethod
     def execute(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
         pass
 
+    # -------------------------------------------------
+    # Tracing hooks
+    # -------------------------------------------------
+
+    def _trace(self, operation: str, rows_in: Optional[int] = None):
+        """
+        Span for one pandas / index operation inside `execute`; set
+        `rows_out` on it when known. No-op unless the request is traced.
+        """
+        return span(f"{self.name}.{operation}", rows_in=rows_in)
+
+    def _scanned(self, rows: int) -> None:
+        """
+        Report rows this call examined (tool_rows_scanned_total).
+        """
+        counter = _rows_scanned.get()
+        if counter is not None:
+            counter[0] += int(rows)
+
     # -------------------------------------------------
     # Shared helpers
     # -------------------------------------------------
@@ -52,3 +111,89 @@ class BaseTool(ABC):
 
         if not pd.api.types.is_numeric_dtype(df[column]):
             raise ValueError(f"Column '{column}' is not numeric")
+
+    def _load_time_index(self, df: pd.DataFrame, name: str):
+        """
+        Manager index `name`, if it was built for this exact frame.
+        """
+        if self.df_manager is None:
+            return None
+
+        index = getattr(self.df_manager, name)
+        if index is None or not index.covers(df):
+            return None
+
+        return index
+
+    def _equality_index(self, df: pd.DataFrame) -> Optional[EqualityIndex]:
+        return self._load_time_index(df, "equality_index")
+
+    def _text_index(self, df: pd.DataFrame) -> Optional[TextIndex]:
+        return self._load_time_index(df, "text_index")
+
+    def _aggregate_cube(self, df: pd.DataFrame) -> Optional[AggregateCube]:
+        return self._load_time_index(df, "aggregate_cube")
+
+    def _filter_positions(
+        self,
+        df: pd.DataFrame,
+        filters: Dict[str, Any],
+        where: Optional[Dict[str, Any]] = None
+    ) -> np.ndarray:
+        """
+        Sorted row positions matching all column=value filters and the
+        `where` predicate tree (see app.data.filter_engine).
+        Callers materialize rows only once, at the end.
+        """
+        with self._trace("filter", rows_in=len(df)) as op:
+            positions, scanned = scan_positions(
+                df, filters, where, self._equality_index(df), self._text_index(df)
+            )
+            self._scanned(scanned)
+            op.set(rows_out=len(positions), rows_scanned=scanned, filters=list(filters), where=where)
+
+        return positions
+
+
+def clean_scalar(value: Any) -> Any:
+    """
+    JSON-friendly result scalar: NaN / inf -> None, NumPy scalars to
+    Python, whole floats -> int, other floats rounded to 4 places.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (np.integer, int)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        value = float(value)
+        if not np.isfinite(value):
+            return None
+        return int(value) if value.is_integer() else round(value, 4)
+    if pd.isna(value):
+        return None
+    return value
+
+
+def _traced_execute(execute):
+    @functools.wraps(execute)
+    def traced(self, *args, **kwargs):
+        if not tracing_active():
+            return execute(self, *args, **kwargs)
+
+        df = kwargs.get("df", args[0] if args else None)
+        rows_in = len(df) if isinstance(df, pd.DataFrame) else None
+
+        with span(f"tool.{self.name}", rows_in=rows_in) as current:
+            result = execute(self, *args, **kwargs)
+            current.set(rows_out=_result_rows(result))
+
+        return result
+
+    return traced
+
+
+def _result_rows(result: Dict[str, Any]) -> Optional[int]:
+    results = result.get("results") if isinstance(result, dict) else None
+    if isinstance(results, (list, dict)):
+        return len(results)
+    return None
@@ -1,44 +1,180 @@
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional
+import numpy as np
 import pandas as pd
-from app.tools.base_tool import BaseTool
+
+from app.tools.base_tool import BaseTool, clean_scalar
 
 
 class ComparisonTool(BaseTool):
+    """
+    Compare any number of groups of one column on a count, total or
+    average.
+
+    The per-group metric comes from one cube lookup (unfiltered frame)
+    or one group-by over the matching rows, so the cost does not depend
+    on how many groups are compared. Ranking, differences and ratios
+    against the baseline group are then computed on that small series.
+    """
+
     name = "comparison"
-    description = "Compare counts between two groups"
+    description = "Compare a count, total or average across groups"
 
-    def execute(self, params: Dict[str, Any]) -> Dict[str, Any]:
-        """
-        Expected params:
-        {
-            "df": pandas.DataFrame,
-            "group_by": str,
-            "values": list[str]   # exactly two values to compare
-        }
-        """
-        df: pd.DataFrame = params["df"]
-        group_by: str = params["group_by"]
-        values: list[str] = params["values"]
+    # operation -> pandas aggregation used on the live path
+    AGG_FUNCTIONS = {
+        "count": "size",
+        "sum": "sum",
+        "average": "mean",
+    }
+
+    def execute(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
+        operation = params.get("operation", "count")
+        group_by = params.get("group_by")
+        column = params.get("column")
+        values = params.get("values")
+        where = params.get("where")
+
+        if not group_by:
+            raise ValueError("Missing required parameter: group_by")
 
-        if group_by not in df.columns:
-            raise ValueError(f"Invalid comparison column: {group_by}")
+        if operation not in self.AGG_FUNCTIONS:
+            raise ValueError(f"Unsupported operation: {operation}")
 
-        if len(values) != 2:
-            raise ValueError("Comparison requires exactly two values")
+        group_by = self._normalize_column(df, group_by)
+        column = self._normalize_column(df, column) if column else None
 
-        result = {}
+        if operation != "count":
+            if not column:
+                raise ValueError(f"'column' is required for operation '{operation}'")
+            self._validate_numeric_column(df, column)
 
-        for value in values:
-            count = df[df[group_by] == value].shape[0]
-            result[value] = count
+        if values is not None:
+            if len(values) < 2:
+                raise ValueError("Comparison requires at least two values")
+            values = _coerce_values(df[group_by], values)
 
-        diff = result[values[1]] - result[values[0]]
+        series = self._per_group(df, operation, group_by, column, values, where)
+
+        # Requested groups in the order given; absent ones have no records
+        if values is not None:
+            series = series.reindex(values, fill_value=0 if operation == "count" else np.nan)
+
+        series = series.dropna()
+        if series.empty:
+            raise ValueError(f"No records to compare for {group_by}")
+
+        # Baseline: first requested value, else the largest group
+        baseline = values[0] if values is not None and values[0] in series.index else series.idxmax()
+
+        results = self._rank(series, operation, group_by, baseline)
 
         return {
             "tool": self.name,
-            "comparison_type": "count",
+            "operation": operation,
             "group_by": group_by,
-            "results": result,
-            "difference": diff,
-            "winner": values[1] if diff > 0 else values[0]
+            "column": column,
+            "where": where,
+            "baseline": clean_scalar(baseline),
+            "leader": results[0][group_by],
+            "results": results,
         }
+
+    def _per_group(
+        self,
+        df: pd.DataFrame,
+        operation: str,
+        group_by: str,
+        column: Optional[str],
+        values: Optional[List[Any]],
+        where: Optional[Dict[str, Any]]
+    ) -> pd.Series:
+        """
+        Metric indexed by group value, for every group that has rows.
+        """
+        cube = self._aggregate_cube(df) if not where else None
+        if cube is not None:
+            with self._trace("cube_lookup") as op:
+                series = cube.aggregate(group_by, operation, column)
+                op.set(hit=series is not None)
+            if series is not None:
+                return series
+
+        # Only the rows of the compared groups: one `in` lookup, not a
+        # full-table mask per value
+        conditions = [where] if where else []
+        if values is not None:
+            conditions.append({"in": {group_by: values}})
+
+        if conditions:
+            tree = conditions[0] if len(conditions) == 1 else {"and": conditions}
+            positions = self._filter_positions(df, {}, tree)
+            needed = [group_by] + ([column] if column and column != group_by else [])
+            df = df[needed].take(positions)
+
+        with self._trace("groupby", rows_in=len(df)) as op:
+            self._scanned(len(df))
+            grouped = df.groupby(group_by, observed=True)
+
+            if operation == "count":
+                series = grouped.size()
+            else:
+                series = grouped[column].agg(self.AGG_FUNCTIONS[operation])
+            op.set(rows_out=len(series))
+
+        return series
+
+    def _rank(
+        self,
+        series: pd.Series,
+        operation: str,
+        group_by: str,
+        baseline: Any
+    ) -> List[Dict[str, Any]]:
+        """
+        One record per group, best first, with its rank, share of the
+        total and difference / ratio against the baseline group.
+        """
+        metric = series.to_numpy(dtype=np.float64)
+        reference = metric[series.index.get_loc(baseline)]
+
+        ranks = series.rank(ascending=False, method="min").to_numpy()
+        order = np.argsort(-metric, kind="stable")
+        total = metric.sum()
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            difference = metric - reference
+            ratio = np.where(reference != 0, metric / reference, np.nan)
+            share = np.where(total != 0, metric / total * 100, np.nan)
+
+        frame = pd.DataFrame({
+            group_by: series.index,
+            operation: series.to_numpy(),
+            "rank": ranks,
+            "difference": difference,
+            "ratio": ratio,
+        })
+        # Shares of a total only mean something for additive metrics
+        if operation != "average":
+            frame["share_pct"] = share
+
+        return [
+            {key: clean_scalar(value) for key, value in row.items()}
+            for row in frame.iloc[order].to_dict(orient="records")
+        ]
+
+
+def _coerce_values(series: pd.Series, values: List[Any]) -> List[Any]:
+    """
+    Requested values in the column's own type ("2023" -> 2023 on a
+    numeric column), duplicates dropped.
+    """
+    dtype = series.cat.categories.dtype if isinstance(series.dtype, pd.CategoricalDtype) else series.dtype
+
+    if pd.api.types.is_numeric_dtype(dtype):
+        numeric = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+        if numeric.isna().any():
+            bad = [v for v, n in zip(values, numeric) if pd.isna(n)]
+            raise ValueError(f"Invalid values for numeric column: {bad}")
+        values = [clean_scalar(v) for v in numeric]
+
+    return list(dict.fromkeys(values))
+
@@ -25,27 +25,32 @@ class DirectQueryTool(BaseTool):
         Expected params:
         {
             "operation": "count",
-            "filters": { "COLUMN": value }  # optional
+            "filters": { "COLUMN": value },  # optional
+            "where": { predicate tree }      # optional, see filter_engine
         }
         """
 
         operation = params.get("operation", "count")
         filters = params.get("filters", {})
+        where = params.get("where")
 
-        # Apply filters if any
-        for column, value in filters.items():
+        for column in filters:
             if column not in df.columns:
                 raise ValueError(f"Invalid column: {column}")
-            df = df[df[column] == value]
+
+        # Counting needs positions only, never the rows themselves
+        positions = self._filter_positions(df, filters, where)
 
         # Supported operations
         if operation == "count":
-            result = len(df)
+            result = len(positions)
         else:
             raise ValueError(f"Unsupported operation: {operation}")
 
         return {
             "tool": self.name,
             "operation": operation,
+            "filters": filters,
+            "where": where,
             "value": result
         }
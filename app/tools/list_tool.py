@@ -1,5 +1,8 @@
+import re
+import numpy as np
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+from app.data.text_index import TOKEN_RE
 from app.tools.base_tool import BaseTool
 
 
@@ -11,19 +14,31 @@ class ListTool(BaseTool):
     name = "list"
     description = "Returns records matching given conditions"
 
+    # Column searched by a bare-string `contains` / `keywords`. This used
+    # to be QUESTION_TEXT, which is not a dataset column, so bare
+    # searches were silently dropped (unknown columns are skipped)
+    DEFAULT_TEXT_COLUMN = "QUESTION"
+
     def execute(
         self,
         df: pd.DataFrame,
         params: Dict[str, Any]
     ) -> Dict[str, Any]:
 
-        filters = params.get("filters", {})
-        contains = params.get("contains", {})
+        # Copy: semantic mappings below must not mutate the caller's plan
+        filters = dict(params.get("filters") or {})
+        contains = params.get("contains") or {}
+        keywords = params.get("keywords") or {}
 
-        # 🔧 NORMALIZATION FIX
+        # 🔧 NORMALIZATION FIX (bare text searches DEFAULT_TEXT_COLUMN)
         if isinstance(contains, str):
             contains = {
-                "QUESTION_TEXT": contains
+                self.DEFAULT_TEXT_COLUMN: contains
+            }
+
+        if isinstance(keywords, str):
+            keywords = {
+                self.DEFAULT_TEXT_COLUMN: keywords
             }
 
         # 🔧 Semantic mappings (optional but safe)
@@ -36,30 +51,96 @@ class ListTool(BaseTool):
         columns = params.get("columns")
         limit = params.get("limit", 10)
 
-        # Apply equality filters
-        for column, value in filters.items():
-            if column not in df.columns:
-                continue
-            df = df[df[column] == value]
+        # Apply equality filters (unknown columns are ignored)
+        filters = {
+            column: value
+            for column, value in filters.items()
+            if column in df.columns
+        }
+        positions = self._filter_positions(df, filters, params.get("where"))
+
+        # Apply text filters on the surviving rows only
+        searches = [
+            (column, text, "substring") for column, text in contains.items()
+        ] + [
+            (column, text, "keywords") for column, text in keywords.items()
+        ]
+        relevance = None
 
-        # Apply text contains filters
-        for column, text in contains.items():
+        for column, text, mode in searches:
             if column not in df.columns:
                 continue
-            df = df[df[column].str.contains(text, case=False, na=False)]
+            with self._trace(f"text_{mode}", rows_in=len(positions)) as op:
+                keep, scores = self._match_text(df, positions, column, text, mode)
+                positions = positions[keep]
+                op.set(rows_out=len(positions), column=column)
+            relevance = scores if relevance is None else relevance[keep] + scores
 
-        if columns:
-            df = df[columns]
+        if params.get("sort") == "relevance" and relevance is not None:
+            positions = positions[np.argsort(-relevance, kind="stable")]
 
-        if df.empty:
+        if not len(positions):
             return {
                 "tool": self.name,
                 "results": [],
                 "value": None
             }
 
+        # Materialize only the rows that are returned
+        with self._trace("materialize", rows_in=len(positions)) as op:
+            df = df.take(positions[:limit])
+
+            if columns:
+                df = df[columns]
+
+            records = df.to_dict(orient="records")
+            op.set(rows_out=len(records))
+
         return {
             "tool": self.name,
-            "results": df.head(limit).to_dict(orient="records"),
+            "results": records,
             "value": None
         }
+
+    def _match_text(
+        self,
+        df: pd.DataFrame,
+        positions: np.ndarray,
+        column: str,
+        text: str,
+        mode: str
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Keep-mask over `positions` and relevance of the kept rows.
+
+        Served from the load-time text index when possible; regex
+        patterns and unindexed columns fall back to a scan of the
+        surviving rows.
+        """
+        text_index = self._text_index(df)
+        hit = text_index.search(column, text, mode) if text_index else None
+
+        if hit is not None:
+            matched, matched_scores = hit
+            if not len(matched):
+                return np.zeros(len(positions), dtype=bool), np.empty(0)
+
+            idx = np.searchsorted(matched, positions)
+            idx[idx == len(matched)] = 0
+            keep = matched[idx] == positions
+            return keep, matched_scores[idx[keep]]
+
+        self._scanned(len(positions))
+        values = df[column].take(positions)
+
+        if mode == "keywords":
+            tokens = TOKEN_RE.findall(str(text).lower())
+            keep = np.full(len(positions), bool(tokens))
+            for token in tokens:
+                keep &= values.str.contains(
+                    rf"\b{re.escape(token)}\b", case=False, na=False
+                ).to_numpy(dtype=bool)
+        else:
+            keep = values.str.contains(text, case=False, na=False).to_numpy(dtype=bool)
+
+        return keep, np.zeros(int(keep.sum()))
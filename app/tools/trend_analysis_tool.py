@@ -0,0 +1,179 @@
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+from app.tools.base_tool import BaseTool, clean_scalar
+
+
+class TrendAnalysisTool(BaseTool):
+    """
+    Year-over-year trends of a metric, overall or per group.
+
+    The per-(group, year) metric comes from the aggregate cube when the
+    pair was pre-aggregated, else from one group-by; it is pivoted into
+    a groups x years matrix once and every statistic (change, percent
+    change, CAGR, least-squares slope) is computed for all groups at
+    the same time with NumPy.
+    """
+
+    name = "trend"
+    description = "How a count, total or average changes over the years"
+
+    time_column = "EFFECTIVE_YEAR"
+
+    # operation -> pandas aggregation used on the live path
+    AGG_FUNCTIONS = {
+        "count": "size",
+        "sum": "sum",
+        "average": "mean",
+    }
+
+    def execute(self, df: pd.DataFrame, params: Dict[str, Any]) -> Dict[str, Any]:
+        operation = params.get("operation", "count")
+        group_by = params.get("group_by")
+        column = params.get("column")
+        where = params.get("where")
+
+        if operation not in self.AGG_FUNCTIONS:
+            raise ValueError(f"Unsupported operation: {operation}")
+
+        if self.time_column not in df.columns:
+            raise ValueError(f"Trend analysis needs the {self.time_column} column")
+
+        group_by = self._normalize_column(df, group_by) if group_by else None
+        column = self._normalize_column(df, column) if column else None
+
+        if group_by == self.time_column:
+            group_by = None
+
+        if operation != "count":
+            if not column:
+                raise ValueError(f"'column' is required for operation '{operation}'")
+            self._validate_numeric_column(df, column)
+
+        series = self._per_group_year(df, operation, group_by, column, where)
+
+        with self._trace("pivot", rows_in=len(series)) as op:
+            if group_by:
+                # Absent (group, year) cells: no records, so zero for counts
+                fill = 0 if operation == "count" else np.nan
+                table = series.unstack(self.time_column, fill_value=fill)
+            else:
+                table = series.to_frame().T
+            # Groups with no values in any year have no trend
+            table = table.sort_index(axis=1).dropna(how="all")
+            op.set(rows_out=len(table))
+
+        years = [int(year) for year in table.columns]
+        stats = _trend_statistics(table.to_numpy(dtype=np.float64), np.asarray(years, dtype=np.float64))
+
+        label = group_by or "group"
+        groups = table.index if group_by else ["All"]
+        results: List[Dict[str, Any]] = []
+
+        for i, group in enumerate(groups):
+            row: Dict[str, Any] = {label: group}
+            row.update({str(year): clean_scalar(value) for year, value in zip(years, table.iloc[i])})
+            row.update({name: clean_scalar(values[i]) for name, values in stats.items()})
+            results.append(row)
+
+        return {
+            "tool": self.name,
+            "operation": operation,
+            "group_by": group_by,
+            "column": column,
+            "where": where,
+            "years": years,
+            "results": results,
+        }
+
+    def _per_group_year(
+        self,
+        df: pd.DataFrame,
+        operation: str,
+        group_by: Optional[str],
+        column: Optional[str],
+        where: Optional[Dict[str, Any]]
+    ) -> pd.Series:
+        """
+        Metric indexed by ([group_by,] year).
+        """
+        key = [group_by, self.time_column] if group_by else [self.time_column]
+
+        # Pre-aggregated (group, year) pairs cover the unfiltered frame only
+        cube = self._aggregate_cube(df) if not where else None
+        if cube is not None:
+            with self._trace("cube_lookup") as op:
+                series = cube.aggregate(key, operation, column)
+                op.set(hit=series is not None)
+            if series is not None:
+                return series
+
+        if where:
+            positions = self._filter_positions(df, {}, where)
+            needed = key + ([column] if column and column not in key else [])
+            df = df[needed].take(positions)
+
+        with self._trace("groupby", rows_in=len(df)) as op:
+            self._scanned(len(df))
+            grouped = df.groupby(key, observed=True)
+
+            if operation == "count":
+                series = grouped.size()
+            else:
+                series = grouped[column].agg(self.AGG_FUNCTIONS[operation])
+            op.set(rows_out=len(series))
+
+        return series
+
+
+def _trend_statistics(values: np.ndarray, years: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per-row trend statistics of a groups x years matrix (NaN = no data),
+    each computed for all rows at once.
+    """
+    groups, periods = values.shape
+    present = ~np.isnan(values)
+    observed = present.sum(axis=1)
+    rows = np.arange(groups)
+
+    # First / last year with data in each row
+    first_idx = np.argmax(present, axis=1)
+    last_idx = periods - 1 - np.argmax(present[:, ::-1], axis=1)
+
+    has_data = observed > 0
+    first = np.where(has_data, values[rows, first_idx], np.nan)
+    last = np.where(has_data, values[rows, last_idx], np.nan)
+    span = np.where(has_data, years[last_idx] - years[first_idx], np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = last - first
+        pct_change = np.where(first != 0, change / np.abs(first) * 100, np.nan)
+
+        # Compound annual growth only makes sense for positive endpoints
+        growing = (first > 0) & (last > 0) & (span > 0)
+        cagr = np.where(growing, (np.power(last / first, 1 / span) - 1) * 100, np.nan)
+
+        # Least-squares slope per row over the years that have data
+        weights = present.astype(np.float64)
+        filled = np.where(present, values, 0.0)
+        mean_year = (weights * years).sum(axis=1) / observed
+        mean_value = filled.sum(axis=1) / observed
+        centered = (years - mean_year[:, None]) * weights
+        slope = np.where(
+            observed >= 2,
+            (centered * (filled - mean_value[:, None])).sum(axis=1) / (centered ** 2).sum(axis=1),
+            np.nan,
+        )
+
+    return {
+        "first_year": np.where(has_data, years[first_idx], np.nan),
+        "first": first,
+        "last_year": np.where(has_data, years[last_idx], np.nan),
+        "last": last,
+        "change": change,
+        "pct_change": pct_change,
+        "cagr_pct": cagr,
+        "slope_per_year": slope,
+    }
+
@@ -0,0 +1,212 @@
+"""
+Local stand-in for the Azure OpenAI chat-completions API.
+
+Speaks enough of the wire format for the `openai` SDK (plain, tool-call
+and streaming completions) and adds configurable latency and error
+injection, so the whole pipeline can be benchmarked offline:
+
+    python -m app.utils.fake_openai_server --port 8081 \
+        --latency lognormal:0.4,0.5 --error-rate 0.01 \
+        --recordings tests/fixtures/llm_recordings.jsonl
+
+then point AZ_OAI_ENDPOINT at http://127.0.0.1:8081.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.utils.llm_replay import request_key
+from app.utils.token_estimator import estimate_tokens
+
+
+Responder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+TOKEN_SPLIT_RE = re.compile(r"\S+\s*|\s+")
+
+
+# -------------------------------------------------
+# Latency distributions
+# -------------------------------------------------
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    "fixed:0.2"            always 0.2 s
+    "uniform:0.1,0.5"      uniform between 0.1 and 0.5 s
+    "lognormal:0.4,0.5"    median 0.4 s, log-space sigma 0.5 (long tail)
+    "exponential:0.3"      mean 0.3 s
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+
+    if kind == "fixed":
+        return lambda rng: values[0] if values else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1 / values[0])
+
+    raise ValueError(f"Unsupported latency distribution: {spec}")
+
+
+# -------------------------------------------------
+# Responders
+# -------------------------------------------------
+def default_responder(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tool calls answer "none"; plain completions answer "OK".
+    """
+    if body.get("tools"):
+        return {"tool": "none", "arguments": "{}"}
+    return {"content": "OK"}
+
+
+def replay_responder(path: str, fallback: Responder = default_responder) -> Responder:
+    """
+    Serve responses recorded by RecordingLLMClient, keyed the same way.
+    """
+    recorded: Dict[str, Any] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                recorded[record["key"]] = record["response"]
+
+    def respond(body: Dict[str, Any]) -> Dict[str, Any]:
+        tools = body.get("tools")
+        method = "chat_with_tools" if tools else ("stream_chat" if body.get("stream") else "chat")
+        response = recorded.get(request_key(method, body.get("messages"), tools))
+
+        if response is None:
+            return fallback(body)
+        if isinstance(response, list):
+            return {"content": "".join(response)}
+        if isinstance(response, str):
+            return {"content": response}
+        return response
+
+    return respond
+
+
+# -------------------------------------------------
+# App
+# -------------------------------------------------
+def create_fake_openai_app(
+    latency: str = "fixed:0",
+    error_rate: float = 0.0,
+    responder: Optional[Responder] = None,
+    seed: Optional[int] = None
+) -> FastAPI:
+    app = FastAPI(title="Fake Azure OpenAI")
+    sample_latency = parse_latency(latency)
+    respond = responder or default_responder
+    rng = random.Random(seed)
+    app.state.requests = 0
+
+    async def completions(request: Request, deployment: str = "fake"):
+        body = await request.json()
+        app.state.requests += 1
+
+        await asyncio.sleep(sample_latency(rng))
+
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Injected failure", "type": "server_error"}},
+            )
+
+        reply = respond(body)
+        model = body.get("model") or deployment
+
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream_chunks(reply.get("content", ""), model),
+                media_type="text/event-stream",
+            )
+
+        return _completion(body, reply, model)
+
+    app.post("/openai/deployments/{deployment}/chat/completions")(completions)
+    app.post("/v1/chat/completions")(completions)
+
+    return app
+
+
+def _completion(body: Dict[str, Any], reply: Dict[str, Any], model: str) -> Dict[str, Any]:
+    message: Dict[str, Any] = {"role": "assistant", "content": reply.get("content")}
+    finish_reason = "stop"
+
+    if "tool" in reply:
+        message["content"] = None
+        message["tool_calls"] = [{
+            "id": "call_fake",
+            "type": "function",
+            "function": {"name": reply["tool"], "arguments": reply.get("arguments", "{}")},
+        }]
+        finish_reason = "tool_calls"
+
+    prompt_tokens = sum(
+        estimate_tokens(m.get("content") or "") for m in body.get("messages", [])
+    )
+    completion_tokens = estimate_tokens(json.dumps(reply))
+
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+async def _stream_chunks(content: str, model: str):
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+        payload = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    for token in TOKEN_SPLIT_RE.findall(content):
+        yield chunk({"content": token})
+    yield chunk({}, "stop")
+    yield "data: [DONE]\n\n"
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Azure OpenAI chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", default="fixed:0", help="e.g. lognormal:0.4,0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--recordings", help="JSONL written by RecordingLLMClient")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    responder = replay_responder(args.recordings) if args.recordings else None
+    app = create_fake_openai_app(args.latency, args.error_rate, responder, args.seed)
+
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
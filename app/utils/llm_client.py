@@ -1,10 +1,15 @@
+import asyncio
 import os
-from typing import List, Dict
+import time
+from typing import Any, AsyncIterator, List, Dict, Optional
 
+import httpx
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI
 
 from app.config import settings
+from app.utils.metrics import LLM_COMPLETION_TOKENS, LLM_PROMPT_TOKENS, LLM_SECONDS
+from app.utils.token_estimator import estimate_message_tokens, estimate_tokens
 
 load_dotenv()
 
@@ -14,11 +19,14 @@ class AzureOpenAIClient:
     Thin wrapper over Azure OpenAI Chat Completions.
     """
 
-    def __init__(self):
+    def __init__(self, timeout_seconds: Optional[float] = None, max_retries: Optional[int] = None):
+        # Per-call deadline and jittered retries on transient errors
         self.client = AzureOpenAI(
             api_key=os.getenv("AZ_OAI_API_KEY"),
-            api_version=os.getenv("AZ_OAI_API_VERSION"),
-            azure_endpoint= settings.AZ_OAI_ENDPOINT
+            api_version=settings.AZ_OAI_API_VERSION,
+            azure_endpoint= settings.AZ_OAI_ENDPOINT,
+            timeout=timeout_seconds if timeout_seconds is not None else settings.LLM_TIMEOUT_SECONDS,
+            max_retries=max_retries if max_retries is not None else settings.LLM_MAX_RETRIES,
         )
         self.deployment_name = os.getenv("AZ_OAI_DEPLOYMENT")
 
@@ -26,10 +34,138 @@ class AzureOpenAIClient:
         """
         Send messages to Azure OpenAI and return assistant response text.
         """
+        started = time.perf_counter()
         response = self.client.chat.completions.create(
             model= self.deployment_name,   # ✅ gpt-4o (deployment name) # type: ignore
             messages=messages,
             temperature=0.0,
         )
+        _record_usage("chat", started, response)
 
         return response.choices[0].message.content # type: ignore
+
+    def chat_with_tools(self, messages, tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Function-calling completion: {"tool", "arguments"} for the first
+        tool call, or {"content"} if the model answered in text.
+        """
+        started = time.perf_counter()
+        response = self.client.chat.completions.create(
+            model= self.deployment_name,   # type: ignore
+            messages=messages,
+            tools=tools,  # type: ignore
+            temperature=0.0,
+        )
+        _record_usage("chat_with_tools", started, response)
+
+        return _tool_reply(response.choices[0].message)
+
+
+class AsyncAzureOpenAIClient:
+    """
+    Async wrapper over Azure OpenAI Chat Completions.
+
+    All calls share one pooled HTTP client (keep-alive connections are
+    reused across requests) and at most `max_concurrency` completions
+    are in flight per process.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_connections: int = 32,
+        http_client: Optional[httpx.AsyncClient] = None,
+        max_retries: int = 2
+    ):
+        self._http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        )
+        self.client = AsyncAzureOpenAI(
+            api_key=os.getenv("AZ_OAI_API_KEY"),
+            api_version=settings.AZ_OAI_API_VERSION,
+            azure_endpoint= settings.AZ_OAI_ENDPOINT,
+            http_client=self._http_client,
+            max_retries=max_retries,
+        )
+        self.deployment_name = os.getenv("AZ_OAI_DEPLOYMENT")
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def chat(self, messages) -> str:
+        """
+        Send messages to Azure OpenAI and return assistant response text.
+        """
+        async with self._semaphore:
+            started = time.perf_counter()
+            response = await self.client.chat.completions.create(
+                model= self.deployment_name,   # type: ignore
+                messages=messages,
+                temperature=0.0,
+            )
+        _record_usage("chat", started, response)
+
+        return response.choices[0].message.content # type: ignore
+
+    async def chat_with_tools(self, messages, tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Function-calling completion: {"tool", "arguments"} for the first
+        tool call, or {"content"} if the model answered in text.
+        """
+        async with self._semaphore:
+            started = time.perf_counter()
+            response = await self.client.chat.completions.create(
+                model= self.deployment_name,   # type: ignore
+                messages=messages,
+                tools=tools,  # type: ignore
+                temperature=0.0,
+            )
+        _record_usage("chat_with_tools", started, response)
+
+        return _tool_reply(response.choices[0].message)
+
+    async def stream_chat(self, messages) -> AsyncIterator[str]:
+        """
+        Stream assistant response text as it is generated.
+        """
+        async with self._semaphore:
+            started = time.perf_counter()
+            completion_tokens = 0
+            stream = await self.client.chat.completions.create(
+                model= self.deployment_name,   # type: ignore
+                messages=messages,
+                temperature=0.0,
+                stream=True,
+            )
+
+            async for chunk in stream:  # type: ignore
+                if chunk.choices and chunk.choices[0].delta.content:
+                    completion_tokens += estimate_tokens(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+
+        # Streams carry no usage block: estimate both sides
+        LLM_SECONDS.observe(time.perf_counter() - started, method="stream_chat")
+        LLM_PROMPT_TOKENS.inc(estimate_message_tokens(messages), method="stream_chat")
+        LLM_COMPLETION_TOKENS.inc(completion_tokens, method="stream_chat")
+
+    async def aclose(self) -> None:
+        await self._http_client.aclose()
+
+
+def _record_usage(method: str, started: float, response) -> None:
+    LLM_SECONDS.observe(time.perf_counter() - started, method=method)
+
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_PROMPT_TOKENS.inc(usage.prompt_tokens or 0, method=method)
+        LLM_COMPLETION_TOKENS.inc(usage.completion_tokens or 0, method=method)
+
+
+def _tool_reply(message) -> Dict[str, Any]:
+    if message.tool_calls:
+        call = message.tool_calls[0]
+        return {"tool": call.function.name, "arguments": call.function.arguments}
+
+    return {"content": message.content or ""}
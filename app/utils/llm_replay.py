@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Protocol
+
+
+class LLMClient(Protocol):
+    """
+    What the agent needs from an LLM client. Implemented by
+    AsyncAzureOpenAIClient, ResilientLLMClient and the record / replay
+    clients below.
+    """
+
+    async def chat(self, messages) -> str: ...
+
+    async def chat_with_tools(self, messages, tools: List[Dict[str, Any]]) -> Dict[str, Any]: ...
+
+    def stream_chat(self, messages) -> AsyncIterator[str]: ...
+
+    async def aclose(self) -> None: ...
+
+
+class ReplayMissError(LookupError):
+    """A replayed request has no recording."""
+
+
+def request_key(method: str, messages, tools: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Stable key for one LLM request (method + messages + tool schema).
+    """
+    payload = json.dumps(
+        {"method": method, "messages": messages, "tools": tools},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# -------------------------------------------------
+# Recording
+# -------------------------------------------------
+class RecordingLLMClient:
+    """
+    Passes every call through to `inner` and appends the request /
+    response pair to a JSONL file (streams are recorded as token lists).
+    """
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def chat(self, messages) -> str:
+        response = await self.inner.chat(messages)
+        self._write("chat", messages, None, response)
+        return response
+
+    async def chat_with_tools(self, messages, tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        response = await self.inner.chat_with_tools(messages, tools)
+        self._write("chat_with_tools", messages, tools, response)
+        return response
+
+    async def stream_chat(self, messages) -> AsyncIterator[str]:
+        tokens = []
+        async for token in self.inner.stream_chat(messages):
+            tokens.append(token)
+            yield token
+        self._write("stream_chat", messages, None, tokens)
+
+    async def aclose(self) -> None:
+        if hasattr(self.inner, "aclose"):
+            await self.inner.aclose()
+
+    def _write(self, method: str, messages, tools, response: Any) -> None:
+        record = {
+            "key": request_key(method, messages, tools),
+            "method": method,
+            "messages": messages,
+            "tools": tools,
+            "response": response,
+        }
+        line = json.dumps(record, default=str)
+
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# -------------------------------------------------
+# Replay
+# -------------------------------------------------
+class ReplayLLMClient:
+    """
+    Serves recorded responses by request key, deterministically and
+    without network. `latency_seconds` optionally simulates the provider
+    so pipeline timings stay meaningful.
+    """
+
+    def __init__(self, path: str, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self._responses: Dict[str, Any] = {}
+
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    # Last recording of a request wins
+                    self._responses[record["key"]] = record["response"]
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    async def chat(self, messages) -> str:
+        return await self._replay(request_key("chat", messages))
+
+    async def chat_with_tools(self, messages, tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self._replay(request_key("chat_with_tools", messages, tools))
+
+    async def stream_chat(self, messages) -> AsyncIterator[str]:
+        tokens = await self._replay(request_key("stream_chat", messages))
+        for token in tokens:
+            yield token
+
+    async def aclose(self) -> None:
+        return None
+
+    async def _replay(self, key: str) -> Any:
+        if key not in self._responses:
+            raise ReplayMissError(f"No recorded LLM response for request {key[:12]}")
+
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+
+        return self._responses[key]
@@ -0,0 +1,323 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import httpx
+import openai
+
+
+T = TypeVar("T")
+
+# Errors worth retrying (and counted against the circuit breaker)
+TRANSIENT_ERRORS = (
+    asyncio.TimeoutError,
+    httpx.TransportError,
+    openai.APIConnectionError,   # includes APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint the breaker considers down."""
+
+
+# -------------------------------------------------
+# Circuit breaker
+# -------------------------------------------------
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive transient
+    failures; open -> half-open after `reset_seconds`, letting one probe
+    through; the probe's outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._maybe_half_open()
+
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def release_probe(self) -> None:
+        """
+        Free the half-open probe slot without a verdict (the probe was
+        cancelled), so the next call can probe instead.
+        """
+        with self._lock:
+            self._probing = False
+
+    def _maybe_half_open(self) -> None:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+            self._probing = False
+
+
+# -------------------------------------------------
+# Latency tracking (hedge threshold)
+# -------------------------------------------------
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        p-th percentile in seconds, or None until `min_samples` are in.
+        """
+        if len(self._samples) < self.min_samples:
+            return None
+
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+# -------------------------------------------------
+# Resilient async LLM client
+# -------------------------------------------------
+class ResilientLLMClient:
+    """
+    Wraps an async LLM client (`chat`, `chat_with_tools`, `stream_chat`)
+    with:
+
+    - a per-call deadline
+    - a hedged second request once the first has been running longer
+      than the p-th percentile of recent latencies (first response wins,
+      the other is cancelled)
+    - retries with full-jitter exponential backoff on transient errors
+    - a circuit breaker that fails fast with CircuitOpenError while the
+      endpoint is unhealthy
+    """
+
+    def __init__(
+        self,
+        inner,
+        timeout_seconds: float = 30.0,
+        hedge_percentile: Optional[float] = 95.0,
+        max_retries: int = 2,
+        backoff_seconds: float = 0.2,
+        max_backoff_seconds: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        latency: Optional[LatencyTracker] = None
+    ):
+        self.inner = inner
+        self.timeout_seconds = timeout_seconds
+        self.hedge_percentile = hedge_percentile
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency or LatencyTracker()
+
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+        self.timeouts = 0
+
+    # ---------- Client interface ----------
+
+    async def chat(self, messages) -> str:
+        return await self._call(lambda: self.inner.chat(messages))
+
+    async def chat_with_tools(self, messages, tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self._call(lambda: self.inner.chat_with_tools(messages, tools))
+
+    async def stream_chat(self, messages) -> AsyncIterator[str]:
+        """
+        Streams are not hedged or retried once tokens flow; the deadline
+        applies to the first token.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit is open")
+
+        settled = False
+        try:
+            stream = self.inner.stream_chat(messages).__aiter__()
+            first = await asyncio.wait_for(stream.__anext__(), self.timeout_seconds)
+        except StopAsyncIteration:
+            settled = True
+            self.breaker.record_success()
+            return
+        except TRANSIENT_ERRORS:
+            settled = True
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            # The endpoint answered (e.g. 400): it is healthy
+            settled = True
+            self.breaker.record_success()
+            raise
+        finally:
+            # Cancelled before the first token: no verdict, free the probe
+            if not settled:
+                self.breaker.release_probe()
+
+        self.breaker.record_success()
+        yield first
+
+        async for token in stream:
+            yield token
+
+    async def aclose(self) -> None:
+        if hasattr(self.inner, "aclose"):
+            await self.inner.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "circuit": self.breaker.state,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hedge_after_seconds": self._hedge_delay(),
+        }
+
+    # ---------- Policy ----------
+
+    async def _call(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM circuit is open")
+
+            settled = False
+            try:
+                result = await asyncio.wait_for(
+                    self._hedged(make_call),
+                    self.timeout_seconds
+                )
+            except TRANSIENT_ERRORS as e:
+                settled = True
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                self.breaker.record_failure()
+
+                if attempt == self.max_retries:
+                    raise
+
+            except Exception:
+                # The endpoint answered (e.g. 400): it is healthy
+                settled = True
+                self.breaker.record_success()
+                raise
+
+            else:
+                settled = True
+                self.breaker.record_success()
+                return result
+
+            finally:
+                # Cancelled (client disconnect, lost hedge, outer deadline):
+                # no verdict on the endpoint, but a half-open probe must
+                # not hold the slot forever
+                if not settled:
+                    self.breaker.release_probe()
+
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt))
+
+        raise AssertionError("unreachable")
+
+    async def _hedged(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        started = time.perf_counter()
+        tasks = [asyncio.ensure_future(make_call())]
+        delay = self._hedge_delay()
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done:
+                result = tasks[0].result()
+                self.latency.record(time.perf_counter() - started)
+                return result
+
+            # Primary is slow: race a second request against it
+            self.hedges += 1
+            tasks.append(asyncio.ensure_future(make_call()))
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is tasks[1]:
+                            self.hedge_wins += 1
+                        # Slow and hedged calls count too, or the p-th
+                        # percentile (the hedge delay) could only fall
+                        self.latency.record(time.perf_counter() - started)
+                        return task.result()
+                    error = task.exception()
+
+            raise error  # type: ignore[misc]
+
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not self.hedge_percentile:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        ceiling = min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt)
+        return random.uniform(0, ceiling)
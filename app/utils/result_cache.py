@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class ResultCache:
+    """
+    LRU + TTL cache for tool results, bounded by approximate size in bytes.
+
+    Keys combine the tool name, canonicalized params and the dataset
+    generation; when a new generation shows up every older entry is
+    dropped at once.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: float = 600,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+
+        # key -> (value, size in bytes, expiry timestamp)
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self._generation: Optional[Hashable] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ---------- Keys ----------
+
+    @staticmethod
+    def make_key(tool_name: str, params: Dict[str, Any], generation: Hashable) -> str:
+        """
+        Canonical key: dict order and null-valued params do not matter.
+        """
+        return json.dumps(
+            [tool_name, _canonical(params), generation],
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str
+        )
+
+    # ---------- Access ----------
+
+    def get(self, key: str, generation: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._check_generation(generation)
+
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, generation: Hashable, value: Any) -> None:
+        size = _estimate_bytes(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_generation(generation)
+
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, self._clock() + self.ttl_seconds)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    # ---------- Internals ----------
+
+    def _check_generation(self, generation: Hashable) -> None:
+        if generation != self._generation:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+def _canonical(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            str(k): _canonical(v)
+            for k, v in value.items()
+            if v is not None
+        }
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def _estimate_bytes(value: Any) -> int:
+    return len(json.dumps(value, separators=(",", ":"), default=str))
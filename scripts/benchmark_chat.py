@@ -0,0 +1,131 @@
+"""
+Offline chat pipeline benchmark
+
+Purpose:
+- Run plan -> tool -> answer for a set of questions without network
+- LLM answered by the in-process fake chat-completions server (with a
+  latency distribution) or by recordings from LLM_MODE=record
+- Print per-stage latency percentiles
+
+Usage:
+    python -m scripts.benchmark_chat --latency lognormal:0.4,0.5 --rounds 5
+    python -m scripts.benchmark_chat --replay tests/fixtures/llm_recordings.jsonl
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+
+from app.bootstrap import CUBE_PAIRS
+from app.agents.answer_renderer import AnswerRenderer
+from app.agents.fast_planner import FastPathPlanner
+from app.agents.reAct_agents import AsyncReActAgent
+from app.agents.result_compactor import ResultCompactor
+from app.config import settings
+from app.data.dataframe_manager import DataFrameManager
+from app.tools.aggregation_tool import AggregationTool
+from app.tools.comparison_tool import ComparisonTool
+from app.tools.direct_query_tool import DirectQueryTool
+from app.tools.list_tool import ListTool
+from app.tools.trend_analysis_tool import TrendAnalysisTool
+from app.utils.fake_openai_server import create_fake_openai_app, replay_responder
+from app.utils.llm_client import AsyncAzureOpenAIClient
+from app.utils.llm_replay import ReplayLLMClient
+
+
+QUESTIONS = [
+    "How many initiatives by site country?",
+    "Average score per category",
+    "How many initiatives in 2024 for Breastfeeding Support?",
+    "List initiatives in 2024 for Breastfeeding Support",
+    "Which initiatives mention parental leave?",
+    "How has average score changed over the years by category?",
+    "Compare Nigeria and Ghana",
+    "What is the maturity of companies doing well?",
+]
+
+
+def build_agent(args) -> AsyncReActAgent:
+    df_manager = DataFrameManager(cube_pairs=CUBE_PAIRS)
+    df_manager.load_from_csv_or_snapshot(settings.DATA_SNAPSHOT_PATH)
+
+    if args.replay and not args.latency:
+        llm = ReplayLLMClient(args.replay)
+    else:
+        responder = replay_responder(args.replay) if args.replay else None
+        app = create_fake_openai_app(args.latency or "fixed:0.3", responder=responder, seed=0)
+        llm = AsyncAzureOpenAIClient(
+            http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app)),
+            max_retries=0,
+        )
+
+    tools = {
+        "direct": DirectQueryTool(df_manager),
+        "list": ListTool(df_manager),
+        "aggregation": AggregationTool(df_manager),
+        "trend": TrendAnalysisTool(df_manager),
+        "comparison": ComparisonTool(df_manager),
+    }
+
+    return AsyncReActAgent(
+        llm_client=llm,
+        dataframe_manager=df_manager,
+        tools=tools,
+        fast_planner=FastPathPlanner(df_manager),
+        answer_renderer=AnswerRenderer(),
+        result_compactor=ResultCompactor(),
+    )
+
+
+async def run(agent: AsyncReActAgent, rounds: int) -> Dict[str, List[float]]:
+    timings: Dict[str, List[float]] = {"plan": [], "execute": [], "answer": [], "total": []}
+
+    for _ in range(rounds):
+        for question in QUESTIONS:
+            started = time.perf_counter()
+
+            plan = await agent.plan(question)
+            planned = time.perf_counter()
+
+            tool_response = await agent.execute_plan(plan)
+            executed = time.perf_counter()
+
+            await agent.generate_answer(question, tool_response)
+            answered = time.perf_counter()
+
+            timings["plan"].append(planned - started)
+            timings["execute"].append(executed - planned)
+            timings["answer"].append(answered - executed)
+            timings["total"].append(answered - started)
+
+    return timings
+
+
+def report(timings: Dict[str, List[float]]) -> None:
+    print(f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+    for stage, values in timings.items():
+        ordered = sorted(values)
+        p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        print(
+            f"{stage:<10}"
+            f"{statistics.median(ordered) * 1000:>10.1f}"
+            f"{p95 * 1000:>10.1f}"
+            f"{ordered[-1] * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    """
+    Manual execution entry point
+    """
+    parser = argparse.ArgumentParser(description="Offline chat pipeline benchmark")
+    parser.add_argument("--latency", help="fake server latency, e.g. lognormal:0.4,0.5")
+    parser.add_argument("--replay", help="JSONL recordings (LLM_MODE=record)")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    report(asyncio.run(run(build_agent(args), args.rounds)))
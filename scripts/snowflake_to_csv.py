@@ -4,14 +4,15 @@ POC Snowflake → CSV exporter
 Purpose:
 - Pull data from Snowflake
 - Store as CSV snapshot for offline analytics
+- Store a columnar (Arrow IPC / Feather) copy next to the CSV
+  so the app can memory-map it at startup
 - Decoupled from application runtime
 """
 
 import os
 from pathlib import Path
-import pandas as pd
 
-from app.data.snowflake_connector import SnowflakeConnector
+from app.data.dataframe_manager import DataFrameManager
 
 
 class SnowflakeCSVExporter:
@@ -25,11 +26,15 @@ class SnowflakeCSVExporter:
         csv_name: str | None = None,
     ) -> str:
         """
-        Fetch full Snowflake table and write CSV.
+        Fetch full Snowflake table and write CSV
+        plus its columnar snapshot.
 
         Returns:
             Path to generated CSV file
         """
+        # Imported here: snapshotting an existing CSV needs no connector
+        from app.data.snowflake_connector import SnowflakeConnector
+
         connector = SnowflakeConnector()
 
         try:
@@ -45,11 +50,35 @@ class SnowflakeCSVExporter:
             df.to_csv(output_path, index=False)
             print(f"CSV written to: {output_path}")
 
+            self.write_columnar_snapshot(str(output_path))
+
             return str(output_path)
 
         finally:
             connector.close()
 
+    def write_columnar_snapshot(self, csv_path: str) -> str:
+        """
+        Write the Feather snapshot that DataFrameManager memory-maps.
+
+        The CSV is parsed back through DataFrameManager, so the
+        snapshot stores the app's optimized dtypes (categoricals as
+        Arrow dictionaries) and loads already typed. Also usable on
+        existing CSVs.
+
+        Returns:
+            Path to generated snapshot file
+        """
+        snapshot_path = DataFrameManager.snapshot_path_for(csv_path)
+
+        manager = DataFrameManager()
+        manager.load_from_csv(csv_path)
+
+        DataFrameManager.write_snapshot(manager.get_dataframe(), str(snapshot_path))
+        print(f"Columnar snapshot written to: {snapshot_path}")
+
+        return str(snapshot_path)
+
 
 if __name__ == "__main__":
     """
@@ -143,8 +143,7 @@ def test_comparison_tool():
     tool = ComparisonTool()
 
     print("\nTEST: Compare 2023 vs 2024")
-    result = tool.execute({
-        "df": df_manager.get_dataframe(),
+    result = tool.execute(df_manager.get_dataframe(), {
         "group_by": "EFFECTIVE_YEAR",
         "values": [2023, 2024]
     })
@@ -1,13 +1,22 @@
+import asyncio
 import os
+import time
 import pytest
 
-from app.agents.reAct_agents import ReActAgent
+from app.agents.answer_renderer import AnswerRenderer
+from app.agents.fast_planner import FastPathPlanner
+from app.agents.plan_cache import PlanCache
+from app.agents.result_compactor import ResultCompactor
+from app.agents.reAct_agents import AsyncReActAgent, ReActAgent
 from app.data.dataframe_manager import DataFrameManager
 from app.tools.direct_query_tool import DirectQueryTool
 from app.tools.list_tool import ListTool
 from app.tools.aggregation_tool import AggregationTool
 from app.tools.comparison_tool import ComparisonTool
+from app.tools.trend_analysis_tool import TrendAnalysisTool
 from app.utils.llm_client import AzureOpenAIClient
+from app.utils.resilience import CircuitOpenError
+from app.utils.token_estimator import estimate_tokens
 
 
 # -------------------------------------------------------------------
@@ -102,3 +111,449 @@ def test_list_tool_execution(agent):
     assert "results" in response
     assert isinstance(response["results"], list)
     assert len(response["results"]) > 0
+
+
+# -------------------------------------------------------------------
+# OFFLINE HELPERS: scripted LLM (no network)
+# -------------------------------------------------------------------
+class ScriptedLLM:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def chat(self, messages, **kwargs):
+        self.calls.append(messages)
+        return self.responses.pop(0)
+
+
+def _offline_agent(df_manager, llm, **kwargs):
+    tools = {
+        "direct": DirectQueryTool(df_manager),
+        "list": ListTool(df_manager),
+        "aggregation": AggregationTool(df_manager),
+        "trend": TrendAnalysisTool(df_manager),
+        "comparison": ComparisonTool(df_manager),
+    }
+    return ReActAgent(
+        llm_client=llm,
+        dataframe_manager=df_manager,
+        tools=tools,
+        **kwargs,
+    )
+
+
+# -------------------------------------------------------------------
+# TEST 5: Plan cache skips the planning LLM call for paraphrases
+# -------------------------------------------------------------------
+def test_plan_cache_reuses_similar_query(df_manager):
+    plan_json = (
+        '{"tool": "aggregation", "params": '
+        '{"operation": "count", "group_by": "SITE_COUNTRY", "column": null}}'
+    )
+    llm = ScriptedLLM(plan_json)
+    agent = _offline_agent(df_manager, llm, plan_cache=PlanCache())
+
+    first = agent.plan("How many initiatives per country?")
+    second = agent.plan("number of initiatives by country")
+
+    assert first == second
+    assert len(llm.calls) == 1
+
+
+def test_plan_cache_misses_on_different_values():
+    cache = PlanCache()
+    schema = ("CATEGORY", "EFFECTIVE_YEAR")
+
+    cache.store("list initiatives in 2024", schema, {"tool": "list", "params": {}})
+
+    assert cache.lookup("list initiatives in 2023", schema) is None
+    assert cache.lookup("how many initiatives per category", schema) is None
+    assert cache.lookup("list initiatives in 2024", ("OTHER",)) is None
+
+
+def test_plan_cache_misses_on_negation_and_columns():
+    cache = PlanCache()
+    schema = ("CATEGORY", "SITE_NAME", "SITE_COUNTRY", "VERIFICATION_STATUS")
+
+    query = (
+        "list breastfeeding support initiatives in India at gold "
+        "classification level that are verified"
+    )
+    cache.store(query, schema, {"tool": "list", "params": {}})
+
+    assert cache.lookup(query.replace("that are", "which are"), schema) is not None
+    assert cache.lookup(query.replace("are verified", "are not verified"), schema) is None
+    assert cache.lookup(query.replace("are verified", "aren't verified"), schema) is None
+
+    cache.store("How many initiatives per country?", schema, {"tool": "aggregation", "params": {}})
+
+    assert cache.lookup("number of initiatives by countries", schema) is not None
+    assert cache.lookup("How many initiatives per site?", schema) is None
+
+
+# -------------------------------------------------------------------
+# TEST 6: Async agent overlaps slow LLM calls
+# -------------------------------------------------------------------
+class SlowAsyncLLM:
+    def __init__(self, response, delay):
+        self.response = response
+        self.delay = delay
+
+    async def chat(self, messages, **kwargs):
+        await asyncio.sleep(self.delay)
+        return self.response
+
+
+def test_async_agent_runs_concurrently(df_manager):
+    plan_json = '{"tool": "direct", "params": {"operation": "count"}}'
+    agent = AsyncReActAgent(
+        llm_client=SlowAsyncLLM(plan_json, delay=0.2),
+        dataframe_manager=df_manager,
+        tools={"direct": DirectQueryTool(df_manager)},
+    )
+
+    async def burst():
+        return await asyncio.gather(*(agent.run(f"count rows {i}") for i in range(10)))
+
+    started = time.perf_counter()
+    results = asyncio.run(burst())
+    elapsed = time.perf_counter() - started
+
+    assert all(r["value"] == len(df_manager.get_dataframe()) for r in results)
+    assert elapsed < 1.0
+
+
+# -------------------------------------------------------------------
+# TEST 7: Fast path answers common shapes without the LLM
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("query, expected", [
+    (
+        "How many initiatives by site country?",
+        {"tool": "aggregation", "params": {"operation": "count", "group_by": "SITE_COUNTRY", "column": None}},
+    ),
+    (
+        "Average score per category",
+        {"tool": "aggregation", "params": {"operation": "average", "group_by": "CATEGORY", "column": "SCORE"}},
+    ),
+    (
+        "How many initiatives in 2024 for Breastfeeding Support?",
+        {"tool": "direct", "params": {"operation": "count", "filters": {"EFFECTIVE_YEAR": 2024, "CATEGORY": "Breastfeeding Support"}}},
+    ),
+    (
+        "List initiatives in 2024 for Breastfeeding Support",
+        {"tool": "list", "params": {"filters": {"EFFECTIVE_YEAR": 2024, "CATEGORY": "Breastfeeding Support"}}},
+    ),
+    (
+        "How many initiatives since 2023 for Breastfeeding Support?",
+        {"tool": "direct", "params": {
+            "operation": "count",
+            "filters": {"CATEGORY": "Breastfeeding Support"},
+            "where": {"range": {"EFFECTIVE_YEAR": {"gte": 2023}}},
+        }},
+    ),
+    (
+        "How has average score changed over the years by category?",
+        {"tool": "trend", "params": {"operation": "average", "group_by": "CATEGORY", "column": "SCORE"}},
+    ),
+    (
+        "Average score in 2023 vs 2024",
+        {"tool": "comparison", "params": {"operation": "average", "group_by": "EFFECTIVE_YEAR", "values": [2023, 2024], "column": "SCORE"}},
+    ),
+    (
+        "Average score by category and year",
+        {"tool": "aggregation", "params": {"operation": "average", "group_by": ["CATEGORY", "EFFECTIVE_YEAR"], "column": "SCORE"}},
+    ),
+    (
+        "Top 5 sites by average score",
+        {"tool": "aggregation", "params": {"operation": "average", "group_by": "SITE_NAME", "column": "SCORE", "limit": 5}},
+    ),
+    (
+        "How many initiatives by site country in 2023 and 2024?",
+        {"tool": "aggregation", "params": {
+            "operation": "count",
+            "group_by": "SITE_COUNTRY",
+            "column": None,
+            "where": {"in": {"EFFECTIVE_YEAR": [2023, 2024]}},
+        }},
+    ),
+])
+def test_fast_path_skips_llm(df_manager, query, expected):
+    llm = ScriptedLLM()
+    agent = _offline_agent(df_manager, llm, fast_planner=FastPathPlanner(df_manager))
+
+    assert agent.plan(query) == expected
+    assert llm.calls == []
+
+
+def test_fast_path_defers_to_llm_when_unsure(df_manager):
+    planner = FastPathPlanner(df_manager)
+
+    # Free-text intent and counting a dimension are left to the LLM
+    for query in [
+        "Can you show me breastfeeding initiatives that had anything to do with parental leave?",
+        "How many surveys are currently present?",
+    ]:
+        plan = planner.plan(query)
+        assert plan is None or plan["confidence"] < 0.75
+
+    # Negation would invert a filter: always left to the LLM
+    for query in [
+        "Average score by category not in 2024",
+        "Average score by category except 2024",
+        "Average score by category excluding 2024",
+        "How many initiatives without Breastfeeding Support?",
+        "Count initiatives other than 2024 by country",
+    ]:
+        assert planner.plan(query) is None, query
+
+    # One unexplained qualifier is enough to distrust the template
+    plan = planner.plan("Average score of failed initiatives by category")
+    assert plan is None or plan["confidence"] < 0.75
+
+    plan_json = '{"tool": "none", "params": {}}'
+    llm = ScriptedLLM(plan_json)
+    agent = _offline_agent(df_manager, llm, fast_planner=planner)
+
+    assert agent.plan("What is the maturity of companies doing well?")["tool"] == "none"
+    assert len(llm.calls) == 1
+
+
+# -------------------------------------------------------------------
+# TEST 8: Small structured results are answered from templates
+# -------------------------------------------------------------------
+def test_template_answers_skip_llm(df_manager):
+    llm = ScriptedLLM()
+    agent = _offline_agent(df_manager, llm, answer_renderer=AnswerRenderer(max_rows=10))
+
+    direct = agent._execute_plan({
+        "tool": "direct",
+        "params": {"operation": "count", "filters": {"EFFECTIVE_YEAR": 2024}},
+    })
+    answer = agent.generate_answer("How many records in 2024?", direct)
+    assert answer == f"There are {direct['value']:,} matching records for EFFECTIVE_YEAR = 2024."
+
+    aggregation = agent._execute_plan({
+        "tool": "aggregation",
+        "params": {"operation": "average", "group_by": "CATEGORY", "column": "SCORE"},
+    })
+    lines = agent.generate_answer("Average score by category", aggregation).splitlines()
+    assert lines[0] == "Average SCORE by CATEGORY:"
+    assert len(lines) == len(aggregation["results"]) + 1
+
+    trend = agent._execute_plan({
+        "tool": "trend",
+        "params": {"operation": "count", "where": {"eq": {"CATEGORY": "Breastfeeding Support"}}},
+    })
+    lines = agent.generate_answer("How has breastfeeding support grown?", trend).splitlines()
+    assert lines[0].startswith("Number of records per year")
+    assert lines[1].startswith("- All: ")
+    assert "CAGR" in lines[1]
+
+    comparison = agent._execute_plan({
+        "tool": "comparison",
+        "params": {"group_by": "EFFECTIVE_YEAR", "values": [2023, 2024]},
+    })
+    lines = agent.generate_answer("2023 vs 2024", comparison).splitlines()
+    assert lines[0] == "Number of records by EFFECTIVE_YEAR, compared with 2023:"
+    assert lines[-1].endswith("(baseline)")
+
+    assert llm.calls == []
+
+
+def test_large_and_list_results_go_to_llm(df_manager):
+    renderer = AnswerRenderer(max_rows=2)
+
+    aggregation = {
+        "tool": "aggregation", "operation": "count", "group_by": "CATEGORY",
+        "results": [{"CATEGORY": c, "count": 1} for c in "abc"],
+    }
+    listing = {"tool": "list", "results": [{"QUESTION": "q"}]}
+
+    assert renderer.render(aggregation) is None
+    assert renderer.render(listing) is None
+
+    # Top-k keeps the rendered answer small
+    top = {**aggregation, "results": aggregation["results"][:2], "groups": 3}
+    assert renderer.render(top).splitlines()[0] == "Number of records by CATEGORY (2 of 3 groups):"
+
+    having = {**top, "groups": 2, "having": {"range": {"count": {"gt": 10}}}}
+    assert renderer.render(having).splitlines()[0] == "Number of records by CATEGORY with count > 10:"
+
+
+# -------------------------------------------------------------------
+# TEST 9: Answer data is compacted to the token budget
+# -------------------------------------------------------------------
+def _rows(n):
+    return [
+        {
+            "INITIATIVE_NAME": f"Initiative {i}",
+            "CATEGORY": "Breastfeeding Support",
+            "QUESTION": f"Q{i}: which of these statements best describes your leave policy? " * 3,
+            "NOTES": "internal note " * 20,
+            "PROVIDENCE_AND_EVIDENCE": None,
+        }
+        for i in range(n)
+    ]
+
+
+def test_compactor_drops_low_value_columns_and_hoists_constants():
+    text = ResultCompactor().compact("Which initiatives offer leave?", _rows(3))
+
+    assert "NOTES" not in text
+    assert "PROVIDENCE_AND_EVIDENCE" not in text
+    assert "Constant for all rows: CATEGORY=Breastfeeding Support" in text
+    assert text.count("Breastfeeding Support") == 1
+    assert "INITIATIVE_NAME | QUESTION" in text
+
+    # Named in the question -> kept
+    assert "NOTES" in ResultCompactor().compact("Show the notes", _rows(3))
+
+
+def test_compactor_respects_budget_and_summarizes_overflow():
+    text = ResultCompactor(token_budget=300, max_cell_chars=80).compact("list", _rows(50))
+
+    assert estimate_tokens(text) <= 300
+    assert "more rows not shown" in text
+    rows = [line for line in text.splitlines() if line.startswith("Initiative ")]
+    assert rows
+    assert all(len(cell) <= 80 for row in rows for cell in row.split(" | "))
+
+
+# -------------------------------------------------------------------
+# TEST 10: Planning prompt = static cached prefix + small user message
+# -------------------------------------------------------------------
+def test_planning_prefix_is_static_and_built_once(df_manager):
+    plan_json = '{"tool": "none", "params": {}}'
+    llm = ScriptedLLM(plan_json, plan_json)
+    agent = _offline_agent(df_manager, llm)
+
+    agent.plan("What is the maturity of companies doing well?")
+    agent.plan("Which sites are the most impressive?")
+
+    first, second = llm.calls
+    assert first[0] == second[0]
+    assert first[0]["role"] == "system"
+    assert "User query" not in first[0]["content"]
+    assert first[1] == {"role": "user", "content": "User query:\nWhat is the maturity of companies doing well?"}
+
+    stats = agent.planning_token_stats()
+    assert stats["prefix_builds"] == 1
+    assert stats["requests"] == 2
+    assert stats["query_tokens"] < stats["prefix_tokens"] / 10
+
+
+# -------------------------------------------------------------------
+# TEST 11: Plans are schema-validated, with one repair turn
+# -------------------------------------------------------------------
+class ScriptedToolLLM(ScriptedLLM):
+    def chat_with_tools(self, messages, tools, **kwargs):
+        self.calls.append(messages)
+        self.tools = tools
+        return self.responses.pop(0)
+
+
+def test_function_calling_plan_is_validated_and_normalized(df_manager):
+    llm = ScriptedToolLLM({
+        "tool": "aggregation",
+        "arguments": '{"operation": "count", "group_by": "site country"}',
+    })
+    agent = _offline_agent(df_manager, llm)
+
+    plan = agent.plan("Which places are busiest?")
+
+    assert plan == {
+        "tool": "aggregation",
+        "params": {"operation": "count", "group_by": "SITE_COUNTRY"},
+    }
+    assert {t["function"]["name"] for t in llm.tools} == {"direct", "list", "aggregation", "comparison", "trend", "none"}
+
+
+def test_invalid_plan_gets_one_repair_turn(df_manager):
+    llm = ScriptedLLM(
+        '{"tool": "aggregation", "params": {"operation": "count", "group_by": "STAGE"}}',
+        '{"tool": "aggregation", "params": {"operation": "count", "group_by": "CLASSIFICATION_LEVEL"}}',
+    )
+    agent = _offline_agent(df_manager, llm)
+
+    plan = agent.plan("Which stage are companies at?")
+
+    assert plan["params"]["group_by"] == "CLASSIFICATION_LEVEL"
+    assert len(llm.calls) == 2
+    assert "Unknown columns: STAGE" in llm.calls[1][-1]["content"]
+
+    # Still invalid after the repair turn -> ValueError (HTTP 400)
+    llm = ScriptedLLM("not json", '{"tool": "list", "params": {"bogus": 1}}')
+    with pytest.raises(ValueError):
+        _offline_agent(df_manager, llm).plan("Which stage are companies at?")
+    assert len(llm.calls) == 2
+
+
+# -------------------------------------------------------------------
+# TEST 12: Batch plans concurrently and executes each plan once
+# -------------------------------------------------------------------
+def test_run_batch_overlaps_planning_and_dedupes_plans(df_manager):
+    plan_json = '{"tool": "direct", "params": {"operation": "count"}}'
+    agent = AsyncReActAgent(
+        llm_client=SlowAsyncLLM(plan_json, delay=0.2),
+        dataframe_manager=df_manager,
+        tools={"direct": DirectQueryTool(df_manager)},
+    )
+
+    queries = [f"count rows {i}" for i in range(10)] + ["count rows 0"]
+
+    started = time.perf_counter()
+    outcomes, distinct_plans = asyncio.run(agent.run_batch(queries, max_concurrency=16))
+    elapsed = time.perf_counter() - started
+
+    assert len(outcomes) == 11
+    assert all(o["value"] == len(df_manager.get_dataframe()) for o in outcomes)
+    assert distinct_plans == 1
+    assert elapsed < 1.0
+
+    # Only identical questions are merged: "and" / "or" variants are
+    # planned separately even though they normalize alike
+    planned = []
+
+    class CountingLLM(SlowAsyncLLM):
+        async def chat(self, messages, **kwargs):
+            planned.append(messages[-1]["content"])
+            return await super().chat(messages, **kwargs)
+
+    agent = AsyncReActAgent(
+        llm_client=CountingLLM(plan_json, delay=0),
+        dataframe_manager=df_manager,
+        tools={"direct": DirectQueryTool(df_manager)},
+    )
+    queries = [
+        "count rows in India and Ghana",
+        "Count rows in India and Ghana?",
+        "count rows in India or Ghana",
+    ]
+    outcomes, _ = asyncio.run(agent.run_batch(queries))
+
+    assert len(outcomes) == 3
+    assert len(planned) == 2
+
+
+# -------------------------------------------------------------------
+# TEST 13: Open LLM circuit falls back to the fast path
+# -------------------------------------------------------------------
+class OpenCircuitLLM:
+    def chat(self, messages, **kwargs):
+        raise CircuitOpenError("LLM circuit is open")
+
+
+def test_open_circuit_uses_fast_path_guess(df_manager):
+    planner = FastPathPlanner(df_manager)
+    agent = _offline_agent(
+        df_manager,
+        OpenCircuitLLM(),
+        fast_planner=planner,
+        fast_path_min_confidence=1.0,   # never trusted normally
+    )
+
+    plan = agent.plan("How many initiatives by site country?")
+    assert plan["params"]["group_by"] == "SITE_COUNTRY"
+
+    with pytest.raises(CircuitOpenError):
+        agent.plan("What is the maturity of companies doing well?")
@@ -1,3 +1,6 @@
+import json
+
+import pytest
 from fastapi.testclient import TestClient
 
 from app.main import app
@@ -5,6 +8,16 @@ from app.main import app
 client = TestClient(app)
 
 
+# -------------------------------------------------
+# Lifespan (dataset + agent are built on startup)
+# -------------------------------------------------
+
+@pytest.fixture(scope="module", autouse=True)
+def started_app():
+    with client:
+        yield
+
+
 # -------------------------------------------------
 # Health Check
 # -------------------------------------------------
@@ -19,6 +32,24 @@ def test_health_endpoint():
     assert isinstance(data["tools"], list)
 
 
+# -------------------------------------------------
+# Readiness Probe
+# -------------------------------------------------
+
+def test_ready_endpoint_after_startup():
+    from app.bootstrap import container
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["agent"] == "ready"
+
+    # Derived structures are built before readiness, not on first query
+    df_manager = container.df_manager
+    assert df_manager._equality_index is not None
+    assert df_manager._text_index is not None
+    assert df_manager._aggregate_cube is not None
+
+
 # -------------------------------------------------
 # Chat API – List Query
 # -------------------------------------------------
@@ -92,3 +123,170 @@ def test_chat_empty_query():
 
     response = client.post("/api/chat", json=payload)
     assert response.status_code in (400, 422)
+
+
+# -------------------------------------------------
+# Offline LLM (no network) for pipeline-shape tests
+# -------------------------------------------------
+
+class FakeAsyncLLM:
+    def __init__(self, plan: str, answer_tokens):
+        self.plan = plan
+        self.answer_tokens = list(answer_tokens)
+
+    async def chat(self, messages, **kwargs):
+        if "analytics reasoning engine" in messages[0]["content"]:
+            return self.plan
+        return "".join(self.answer_tokens)
+
+    async def stream_chat(self, messages, **kwargs):
+        for token in self.answer_tokens:
+            yield token
+
+
+@pytest.fixture()
+def fake_llm(monkeypatch):
+    from app.bootstrap import container
+
+    def install(plan, answer_tokens=("ok",)):
+        llm = FakeAsyncLLM(plan, answer_tokens)
+        monkeypatch.setattr(container.agent, "llm", llm)
+        return llm
+
+    return install
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+# -------------------------------------------------
+# Chat API – Streaming (SSE)
+# -------------------------------------------------
+
+def test_chat_stream_events(fake_llm):
+    # List answers come from the LLM (small aggregations use templates)
+    fake_llm(
+        '{"tool": "list", "params": {"filters": {"EFFECTIVE_YEAR": 2024}}}',
+        answer_tokens=["There ", "are ", "many ", "initiatives."],
+    )
+
+    response = client.post("/api/chat/stream", json={"query": "Which initiatives mention leave?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(response.text)
+    names = [name for name, _ in events]
+
+    assert names[:2] == ["plan", "result"]
+    assert names[-1] == "done"
+    assert "".join(data["text"] for name, data in events if name == "token") == (
+        "There are many initiatives."
+    )
+    assert events[1][1]["results"][0]["EFFECTIVE_YEAR"] == 2024
+
+
+def test_chat_stream_reports_errors(fake_llm):
+    fake_llm("not json at all")
+
+    response = client.post("/api/chat/stream", json={"query": "??"})
+    events = _parse_sse(response.text)
+
+    assert events[-1][0] == "error"
+    assert events[-1][1]["status"] == 400
+
+
+# -------------------------------------------------------------------
+# TEST: Batch chat (deduplicated planning, per-item status)
+# -------------------------------------------------------------------
+def test_chat_batch(fake_llm):
+    fake_llm(
+        '{"tool": "list", "params": {"filters": {"EFFECTIVE_YEAR": 2024}}}',
+        answer_tokens=["Listed."],
+    )
+
+    response = client.post("/api/chat/batch", json={"queries": [
+        "Which initiatives mention leave?",
+        "which initiatives mention leave",
+        "Average score per category",
+        "   ",
+    ]})
+    assert response.status_code == 200
+
+    data = response.json()
+    items = data["items"]
+
+    assert [item["status"] for item in items] == [200, 200, 200, 400]
+    assert items[0]["answer"] == "Listed."
+    assert items[0]["results"] == items[1]["results"]
+    assert items[2]["tool"] == "aggregation"
+    assert items[3]["error"] == "Query must not be empty"
+    assert data["distinct_plans"] == 2
+
+
+def test_chat_batch_reports_item_errors(fake_llm):
+    fake_llm("not json at all")
+
+    response = client.post("/api/chat/batch", json={"queries": ["??", "How many initiatives?"]})
+    items = response.json()["items"]
+
+    assert items[0]["status"] == 400
+    assert items[1]["status"] == 200
+
+
+# -------------------------------------------------------------------
+# TEST: Prometheus metrics
+# -------------------------------------------------------------------
+def test_metrics_endpoint(fake_llm):
+    fake_llm('{"tool": "list", "params": {"filters": {"EFFECTIVE_YEAR": 2024}}}')
+    client.post("/api/chat", json={"query": "Average score per category"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+
+    text = response.text
+    assert 'chat_stage_seconds_count{stage="plan"}' in text
+    assert 'chat_plan_source_total{source="fast_path"}' in text
+    assert 'tool_rows_scanned_total{tool="aggregation"}' in text
+    assert 'dataframe_memory_bytes{part="dataframe"}' in text
+    assert 'cache_hit_ratio{cache="result"}' in text
+
+
+# -------------------------------------------------------------------
+# TEST: Opt-in request traces
+# -------------------------------------------------------------------
+def _span_names(node):
+    return [node["name"]] + [name for child in node["children"] for name in _span_names(child)]
+
+
+def test_chat_trace_opt_in(fake_llm):
+    # Plan not used elsewhere, so the tool is not served from the result cache
+    fake_llm(
+        '{"tool": "list", "params": {"filters": {"CATEGORY": "Breastfeeding Support"}, "limit": 3}}',
+        answer_tokens=["Listed."],
+    )
+    payload = {"query": "Which initiatives talk about nursing rooms?"}
+
+    traced = client.post("/api/chat?trace=1", json=payload).json()
+    trace = traced["trace"]
+    assert trace["name"] == "chat"
+
+    plan, execute, answer = trace["children"]
+    assert plan["name"] == "plan"
+    assert plan["attributes"]["plan_source"] in ("llm", "plan_cache")
+
+    assert execute["attributes"]["tool"] == "list"
+    assert "list.filter" in _span_names(execute)
+
+    assert answer["children"][0]["name"] == "llm.answer"
+
+    untraced = client.post("/api/chat", json=payload).json()
+    assert "trace" not in untraced
+
+    by_header = client.post("/api/chat", json=payload, headers={"X-Trace": "1"}).json()
+    assert by_header["trace"]["children"][1]["attributes"]["result_cache"] == "hit"
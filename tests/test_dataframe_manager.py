@@ -0,0 +1,285 @@
+import pandas as pd
+import pytest
+
+from app.data.dataframe_manager import DataFrameManager
+from app.data.filter_engine import filter_positions
+
+
+CSV_PATH = "app/data/snapshots/G17_WFN_CONSOLIDATED_REPORT.csv"
+
+
+# -------------------------------------------------------------------
+# FIXTURE: CSV copied into a temp dir (snapshots are written beside it)
+# -------------------------------------------------------------------
+@pytest.fixture()
+def csv_copy(tmp_path):
+    target = tmp_path / "report.csv"
+    target.write_bytes(open(CSV_PATH, "rb").read())
+    return str(target)
+
+
+# -------------------------------------------------------------------
+# TEST 1: Snapshot round-trip matches CSV
+# -------------------------------------------------------------------
+def test_snapshot_matches_csv(csv_copy):
+    from_csv = DataFrameManager()
+    from_csv.load_from_csv(csv_copy)
+
+    snapshot_path = DataFrameManager.snapshot_path_for(csv_copy)
+    DataFrameManager.write_snapshot(from_csv.get_dataframe(), str(snapshot_path))
+
+    from_snapshot = DataFrameManager()
+    from_snapshot.load_from_snapshot(str(snapshot_path))
+
+    pd.testing.assert_frame_equal(
+        from_csv.get_dataframe(),
+        from_snapshot.get_dataframe(),
+    )
+
+
+# -------------------------------------------------------------------
+# TEST 2: Lazy column selection
+# -------------------------------------------------------------------
+def test_snapshot_loads_selected_columns(csv_copy):
+    manager = DataFrameManager()
+    manager.load_from_csv(csv_copy)
+
+    snapshot_path = DataFrameManager.snapshot_path_for(csv_copy)
+    DataFrameManager.write_snapshot(manager.get_dataframe(), str(snapshot_path))
+
+    manager.load_from_snapshot(str(snapshot_path), columns=["CATEGORY", "SCORE"])
+
+    assert manager.get_dataframe().columns.tolist() == ["CATEGORY", "SCORE"]
+
+
+# -------------------------------------------------------------------
+# TEST 3: CSV fallback writes the snapshot for the next start
+# -------------------------------------------------------------------
+def test_csv_fallback_writes_snapshot(csv_copy):
+    snapshot_path = DataFrameManager.snapshot_path_for(csv_copy)
+    assert not snapshot_path.exists()
+
+    manager = DataFrameManager()
+    manager.load_from_csv_or_snapshot(csv_copy)
+
+    assert snapshot_path.exists()
+    assert len(manager.get_dataframe()) > 0
+
+    # Written under a temp name and renamed; nothing left behind
+    assert sorted(path.name for path in snapshot_path.parent.iterdir()) == [
+        "report.csv", "report.feather",
+    ]
+
+
+def test_csv_fallback_skips_snapshot_written_meanwhile(csv_copy, monkeypatch):
+    snapshot_path = DataFrameManager.snapshot_path_for(csv_copy)
+    load_from_csv = DataFrameManager.load_from_csv
+    write_snapshot = DataFrameManager.write_snapshot
+    writes = []
+
+    # Another worker finishes the snapshot while this one parses the CSV
+    def load_and_race(self, file_path):
+        load_from_csv(self, file_path)
+        write_snapshot(self.get_dataframe(), str(snapshot_path))
+
+    monkeypatch.setattr(DataFrameManager, "load_from_csv", load_and_race)
+    monkeypatch.setattr(
+        DataFrameManager, "write_snapshot",
+        staticmethod(lambda df, file_path: writes.append(file_path)),
+    )
+
+    DataFrameManager().load_from_csv_or_snapshot(csv_copy)
+
+    assert snapshot_path.exists()
+    assert writes == []
+
+
+def test_exporter_snapshot_loads_with_optimized_dtypes(csv_copy):
+    from scripts.snowflake_to_csv import SnowflakeCSVExporter
+
+    snapshot_path = SnowflakeCSVExporter(
+        output_dir=str(DataFrameManager.snapshot_path_for(csv_copy).parent)
+    ).write_columnar_snapshot(csv_copy)
+
+    from_csv = DataFrameManager()
+    from_csv.load_from_csv(csv_copy)
+
+    manager = DataFrameManager()
+    manager.load_from_snapshot(snapshot_path)
+    df = manager.get_dataframe()
+
+    assert isinstance(df["CATEGORY"].dtype, pd.CategoricalDtype)
+    assert df["EFFECTIVE_YEAR"].dtype.itemsize < 8
+    pd.testing.assert_frame_equal(df, from_csv.get_dataframe())
+
+
+# -------------------------------------------------------------------
+# TEST: Snapshot loads defer the index and cube builds to first use
+# -------------------------------------------------------------------
+def test_snapshot_load_builds_indexes_lazily(csv_copy):
+    DataFrameManager().load_from_csv_or_snapshot(csv_copy)
+
+    manager = DataFrameManager()
+    manager.load_from_csv_or_snapshot(csv_copy)
+
+    assert manager._equality_index is None
+    assert manager._text_index is None
+    assert manager._aggregate_cube is None
+
+    # Built on first property access, then reused
+    index, cube = manager.equality_index, manager.aggregate_cube
+
+    assert index is not None and cube is not None
+    assert manager.equality_index is index
+    assert manager.text_index.covers(manager.get_dataframe())
+    assert cube.aggregate("CATEGORY", "count").sum() == len(manager.get_dataframe())
+
+    # A reload drops the previous frame's structures
+    manager.load_from_csv_or_snapshot(csv_copy)
+    assert manager._equality_index is None
+    assert manager.equality_index is not index
+
+
+# -------------------------------------------------------------------
+# TEST 4: Low-cardinality strings are dictionary-encoded
+# -------------------------------------------------------------------
+def test_dtype_optimization_and_memory_report():
+    manager = DataFrameManager()
+    manager.load_from_csv(CSV_PATH)
+    df = manager.get_dataframe()
+
+    assert isinstance(df["CATEGORY"].dtype, pd.CategoricalDtype)
+    assert df["EFFECTIVE_YEAR"].dtype.itemsize < 8
+
+    report = manager.memory_report()
+    assert report["rows"] == len(df)
+    assert report["total_bytes"] < report["original_bytes"]
+    assert {row["column"] for row in report["columns"]} == set(df.columns)
+
+
+# -------------------------------------------------------------------
+# TEST 5: Equality filters on categorical codes
+# -------------------------------------------------------------------
+def test_filter_dataframe_on_categorical():
+    raw = pd.read_csv(CSV_PATH)
+
+    manager = DataFrameManager()
+    manager.load_from_dataframe(raw)
+
+    filtered = manager.filter_dataframe(
+        {"CATEGORY": "Breastfeeding Support", "EFFECTIVE_YEAR": 2024}
+    )
+    expected = raw[
+        (raw["CATEGORY"] == "Breastfeeding Support")
+        & (raw["EFFECTIVE_YEAR"] == 2024)
+    ]
+
+    assert len(filtered) == len(expected) > 0
+    assert len(manager.filter_dataframe({"CATEGORY": "No Such Category"})) == 0
+
+
+# -------------------------------------------------------------------
+# TEST 6: Equality index agrees with boolean masks
+# -------------------------------------------------------------------
+def test_equality_index_matches_masks():
+    raw = pd.read_csv(CSV_PATH)
+
+    manager = DataFrameManager()
+    manager.load_from_dataframe(raw)
+    index = manager.equality_index
+
+    assert index is not None
+    assert {"CATEGORY", "EFFECTIVE_YEAR", "SITE_COUNTRY"} <= set(index.columns)
+    assert "PROVIDENCE_AND_EVIDENCE" not in index.columns
+
+    filters = {
+        "CATEGORY": "Breastfeeding Support",
+        "EFFECTIVE_YEAR": 2024,
+        "SITE_COUNTRY": raw["SITE_COUNTRY"].iloc[0],
+    }
+    expected = raw.index[
+        (raw["CATEGORY"] == filters["CATEGORY"])
+        & (raw["EFFECTIVE_YEAR"] == filters["EFFECTIVE_YEAR"])
+        & (raw["SITE_COUNTRY"] == filters["SITE_COUNTRY"])
+    ]
+
+    assert manager.filter_positions(filters).tolist() == expected.tolist()
+
+    with pytest.raises(ValueError):
+        manager.filter_positions({"NOT_A_COLUMN": 1})
+
+
+# -------------------------------------------------------------------
+# TEST: Predicate trees match the equivalent pandas expressions
+# -------------------------------------------------------------------
+def test_filter_engine_matches_pandas():
+    raw = pd.read_csv(CSV_PATH)
+
+    manager = DataFrameManager()
+    manager.load_from_dataframe(raw)
+    df = manager.get_dataframe()
+
+    countries = raw["SITE_COUNTRY"].dropna().unique()[:3].tolist()
+    cases = [
+        (
+            {"in": {"SITE_COUNTRY": countries}},
+            raw["SITE_COUNTRY"].isin(countries),
+        ),
+        (
+            {"in": {"SITE_COUNTRY": [countries[0], countries[0]]}},
+            raw["SITE_COUNTRY"] == countries[0],
+        ),
+        (
+            {"and": [
+                {"range": {"EFFECTIVE_YEAR": {"gte": 2023, "lte": 2024}}},
+                {"range": {"SCORE": {"gt": 0}}},
+            ]},
+            raw["EFFECTIVE_YEAR"].between(2023, 2024) & (raw["SCORE"] > 0),
+        ),
+        (
+            {"or": [{"is_null": "SCORE"}, {"eq": {"CATEGORY": "Breastfeeding Support"}}]},
+            raw["SCORE"].isna() | (raw["CATEGORY"] == "Breastfeeding Support"),
+        ),
+        (
+            {"and": [
+                {"not": {"eq": {"EFFECTIVE_YEAR": 2024}}},
+                {"contains": {"QUESTION": "leave"}},
+            ]},
+            (raw["EFFECTIVE_YEAR"] != 2024)
+            & raw["QUESTION"].str.contains("leave", case=False, na=False),
+        ),
+        (
+            {"not": {"contains": {"PROVIDENCE_AND_EVIDENCE": "policy|procedure"}}},
+            ~raw["PROVIDENCE_AND_EVIDENCE"].str.contains("policy|procedure", case=False, na=False),
+        ),
+    ]
+
+    for where, expected in cases:
+        indexed = manager.filter_positions({}, where)
+        scanned = filter_positions(df, where=where)
+
+        assert indexed.tolist() == raw.index[expected].tolist(), where
+        assert scanned.tolist() == indexed.tolist(), where
+
+    combined = manager.filter_positions(
+        {"CATEGORY": "Breastfeeding Support"},
+        {"in": {"EFFECTIVE_YEAR": [2023, 2024]}},
+    )
+    expected = (raw["CATEGORY"] == "Breastfeeding Support") & raw["EFFECTIVE_YEAR"].isin([2023, 2024])
+    assert combined.tolist() == raw.index[expected].tolist()
+
+
+@pytest.mark.parametrize("where", [
+    {"between": {"EFFECTIVE_YEAR": [2020, 2024]}},
+    {"range": {"EFFECTIVE_YEAR": {"from": 2020}}},
+    {"in": {"CATEGORY": "Breastfeeding Support"}},
+    {"and": []},
+    {"range": {"CATEGORY": {"gte": 1}}},
+    {"eq": {"NOT_A_COLUMN": 1}},
+])
+def test_filter_engine_rejects_bad_trees(where):
+    manager = DataFrameManager()
+    manager.load_from_dataframe(pd.read_csv(CSV_PATH))
+
+    with pytest.raises(ValueError):
+        manager.filter_positions({}, where)
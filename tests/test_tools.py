@@ -0,0 +1,401 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data.dataframe_manager import DataFrameManager
+from app.tools.aggregation_tool import AggregationTool
+from app.tools.base_tool import BaseTool, count_rows_scanned
+from app.tools.direct_query_tool import DirectQueryTool
+from app.tools.comparison_tool import ComparisonTool
+from app.tools.list_tool import ListTool
+from app.tools.trend_analysis_tool import TrendAnalysisTool
+from app.utils.tracing import start_trace
+
+
+CSV_PATH = "app/data/snapshots/G17_WFN_CONSOLIDATED_REPORT.csv"
+
+
+# -------------------------------------------------------------------
+# FIXTURES: raw CSV frame and the manager's optimized frame
+# -------------------------------------------------------------------
+@pytest.fixture(scope="session")
+def raw_df():
+    return pd.read_csv(CSV_PATH)
+
+
+@pytest.fixture(scope="session")
+def df_manager(raw_df):
+    manager = DataFrameManager()
+    manager.load_from_dataframe(raw_df)
+    return manager
+
+
+@pytest.fixture(scope="session")
+def df(df_manager):
+    return df_manager.get_dataframe()
+
+
+# -------------------------------------------------------------------
+# TEST 1: Aggregation on categorical keys matches object keys
+# -------------------------------------------------------------------
+def test_aggregation_count_on_categorical(df, raw_df):
+    tool = AggregationTool()
+
+    result = tool.execute(df, {"operation": "count", "group_by": "CATEGORY"})
+    expected = raw_df.groupby("CATEGORY").size()
+
+    assert {row["CATEGORY"]: row["count"] for row in result["results"]} == expected.to_dict()
+
+
+# -------------------------------------------------------------------
+# TEST 2: Aggregation average
+# -------------------------------------------------------------------
+def test_aggregation_average(df, raw_df):
+    tool = AggregationTool()
+
+    result = tool.execute(
+        df, {"operation": "average", "group_by": "effective year", "column": "score"}
+    )
+    expected = raw_df.groupby("EFFECTIVE_YEAR")["SCORE"].mean()
+
+    assert [row["EFFECTIVE_YEAR"] for row in result["results"]] == expected.index.tolist()
+    assert [row["average"] for row in result["results"]] == pytest.approx(expected.tolist())
+
+
+# -------------------------------------------------------------------
+# TEST 3: Direct count served from the equality index
+# -------------------------------------------------------------------
+def test_direct_count_uses_index(df, raw_df, df_manager):
+    filters = {"CATEGORY": "Breastfeeding Support", "EFFECTIVE_YEAR": 2024}
+    expected = len(
+        raw_df[
+            (raw_df["CATEGORY"] == "Breastfeeding Support")
+            & (raw_df["EFFECTIVE_YEAR"] == 2024)
+        ]
+    )
+
+    indexed = DirectQueryTool(df_manager).execute(df, {"filters": filters})
+    scanned = DirectQueryTool().execute(df, {"filters": filters})
+
+    assert indexed["value"] == scanned["value"] == expected
+
+
+# -------------------------------------------------------------------
+# TEST 4: List with equality + contains filters
+# -------------------------------------------------------------------
+def test_list_filters_and_contains(df, raw_df, df_manager):
+    params = {
+        "filters": {"CATEGORY": "Breastfeeding Support", "NOT_A_COLUMN": "x"},
+        "contains": {"QUESTION": "parental leave"},
+        "columns": ["INITIATIVE_NAME", "QUESTION"],
+        "limit": 5,
+    }
+    expected = raw_df[
+        (raw_df["CATEGORY"] == "Breastfeeding Support")
+        & raw_df["QUESTION"].str.contains("parental leave", case=False, na=False)
+    ][["INITIATIVE_NAME", "QUESTION"]].head(5).to_dict(orient="records")
+
+    result = ListTool(df_manager).execute(df, params)
+
+    assert result["results"] == expected
+
+
+# -------------------------------------------------------------------
+# TEST 5: Text index agrees with str.contains scans
+# -------------------------------------------------------------------
+@pytest.mark.parametrize(
+    "column,text",
+    [
+        ("QUESTION", "parental leave"),
+        ("QUESTION", "Programme"),
+        ("ANSWER", "no"),
+        ("ANSWER", "not applicable|unavailable"),
+        ("PROVIDENCE_AND_EVIDENCE", "policy"),
+    ],
+)
+def test_list_contains_index_matches_scan(df, df_manager, column, text):
+    params = {"contains": {column: text}, "limit": 10_000}
+
+    # Free text is indexed too, not only low-cardinality columns
+    if column == "PROVIDENCE_AND_EVIDENCE":
+        assert column not in df_manager.equality_index.columns
+        assert column in df_manager.text_index.columns
+
+    indexed = ListTool(df_manager).execute(df, params)
+    scanned = ListTool().execute(df, params)
+
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(indexed["results"]), pd.DataFrame(scanned["results"])
+    )
+
+
+# -------------------------------------------------------------------
+# TEST 6: Keyword search and relevance ordering
+# -------------------------------------------------------------------
+def test_list_keywords_with_relevance(df, raw_df, df_manager):
+    params = {
+        "keywords": "leave parental",
+        "columns": ["QUESTION"],
+        "sort": "relevance",
+        "limit": 10_000,
+    }
+
+    indexed = ListTool(df_manager).execute(df, params)
+    scanned = ListTool().execute(df, params)
+
+    assert len(indexed["results"]) == len(scanned["results"]) > 0
+    assert all(
+        "parental" in row["QUESTION"].lower() and "leave" in row["QUESTION"].lower()
+        for row in indexed["results"]
+    )
+
+
+# -------------------------------------------------------------------
+# TEST 7: Aggregation cube answers match live group-bys
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("operation", ["count", "sum", "average", "std"])
+@pytest.mark.parametrize("group_by", ["CATEGORY", "EFFECTIVE_YEAR", "SITE_COUNTRY"])
+def test_aggregation_cube_matches_live(df, df_manager, operation, group_by):
+    params = {"operation": operation, "group_by": group_by, "column": "SCORE"}
+
+    from_cube = AggregationTool(df_manager).execute(df, params)
+    live = AggregationTool().execute(df, params)
+
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(from_cube["results"]),
+        pd.DataFrame(live["results"]),
+        check_dtype=False,
+    )
+
+
+def test_aggregate_cube_pairs():
+    manager = DataFrameManager(cube_pairs=[("CATEGORY", "EFFECTIVE_YEAR")])
+    manager.load_from_csv(CSV_PATH)
+    df = manager.get_dataframe()
+
+    series = manager.aggregate_cube.aggregate(
+        ["CATEGORY", "EFFECTIVE_YEAR"], "sum", "TOTAL_SCORE_BY_INITIATIVES"
+    )
+    expected = df.groupby(["CATEGORY", "EFFECTIVE_YEAR"], observed=True)[
+        "TOTAL_SCORE_BY_INITIATIVES"
+    ].sum()
+
+    pd.testing.assert_series_equal(series, expected, check_names=False)
+    assert manager.aggregate_cube.aggregate(["SITE_NAME", "CATEGORY"], "count") is None
+
+
+# -------------------------------------------------------------------
+# TEST: Multi-key, multi-metric aggregation with HAVING and top-k
+# -------------------------------------------------------------------
+def test_aggregation_metrics_having_top_k(raw_df):
+    manager = DataFrameManager(cube_pairs=[("CATEGORY", "EFFECTIVE_YEAR")])
+    manager.load_from_dataframe(raw_df)
+    df = manager.get_dataframe()
+
+    keys = ["CATEGORY", "EFFECTIVE_YEAR"]
+    metrics = [{"operation": "count"}, {"operation": "average", "column": "SCORE"}]
+
+    # Every metric pre-aggregated for the pair: cube and live agree
+    from_cube = AggregationTool(manager).execute(df, {"group_by": keys, "metrics": metrics})
+    live = AggregationTool().execute(df, {"group_by": keys, "metrics": metrics})
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(from_cube["results"]),
+        pd.DataFrame(live["results"]),
+        check_dtype=False,
+    )
+
+    params = {
+        "group_by": keys,
+        "metrics": metrics + [
+            {"operation": "max", "column": "SCORE"},
+            {"operation": "nunique", "column": "SITE_NAME"},
+        ],
+        "having": {"range": {"count": {"gte": 50}}},
+        "sort_by": "average_SCORE",
+        "limit": 3,
+    }
+    result = AggregationTool(manager).execute(df, params)
+
+    expected = (
+        df.groupby(keys, observed=True)
+        .agg(
+            count=("SCORE", "size"),
+            average_SCORE=("SCORE", "mean"),
+            max_SCORE=("SCORE", "max"),
+            nunique_SITE_NAME=("SITE_NAME", "nunique"),
+        )
+        .query("count >= 50")
+    )
+    top = expected.sort_values("average_SCORE", ascending=False).head(3).reset_index()
+
+    assert result["metrics"] == ["count", "average_SCORE", "max_SCORE", "nunique_SITE_NAME"]
+    assert result["groups"] == len(expected)
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(result["results"]), top, check_dtype=False, check_categorical=False
+    )
+
+    bottom = AggregationTool().execute(df, {**params, "order": "asc", "limit": 2})
+    assert [row["average_SCORE"] for row in bottom["results"]] == pytest.approx(
+        expected["average_SCORE"].nsmallest(2).tolist()
+    )
+
+    with pytest.raises(ValueError):
+        AggregationTool().execute(df, {**params, "sort_by": "median_SCORE"})
+
+
+# -------------------------------------------------------------------
+# TEST: Trend statistics from the cube pairs match a live pivot
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("operation", ["count", "average"])
+def test_trend_cube_matches_live_and_statistics(raw_df, operation):
+    manager = DataFrameManager(cube_pairs=[("CATEGORY", "EFFECTIVE_YEAR")])
+    manager.load_from_dataframe(raw_df)
+    df = manager.get_dataframe()
+    params = {"operation": operation, "group_by": "CATEGORY", "column": "SCORE"}
+
+    from_cube = TrendAnalysisTool(manager).execute(df, params)
+    live = TrendAnalysisTool().execute(df, params)
+
+    pd.testing.assert_frame_equal(
+        pd.DataFrame(from_cube["results"]),
+        pd.DataFrame(live["results"]),
+        check_dtype=False,
+    )
+
+    row = from_cube["results"][0]
+    years = [year for year in from_cube["years"] if row[str(year)] is not None]
+    values = [row[str(year)] for year in years]
+
+    assert row["first"] == values[0] and row["last"] == values[-1]
+    assert row["change"] == pytest.approx(values[-1] - values[0], abs=1e-3)
+    assert row["slope_per_year"] == pytest.approx(np.polyfit(years, values, 1)[0], abs=1e-3)
+    assert row["cagr_pct"] == pytest.approx(
+        ((values[-1] / values[0]) ** (1 / (years[-1] - years[0])) - 1) * 100, abs=1e-2
+    )
+
+
+# -------------------------------------------------------------------
+# TEST: N-way comparisons rank, diff and ratio against the baseline
+# -------------------------------------------------------------------
+@pytest.mark.parametrize("values", [["2023", 2024], None])
+def test_comparison_ranks_groups(df, df_manager, values):
+    params = {"group_by": "effective year", "values": values}
+
+    from_cube = ComparisonTool(df_manager).execute(df, params)
+    live = ComparisonTool().execute(df, params)
+    assert from_cube["results"] == live["results"]
+
+    counts = df["EFFECTIVE_YEAR"].value_counts()
+    if values:
+        counts = counts.loc[[2023, 2024]]
+    baseline = from_cube["baseline"]
+
+    rows = from_cube["results"]
+    assert [row["EFFECTIVE_YEAR"] for row in rows] == counts.sort_values(ascending=False).index.tolist()
+    assert [row["rank"] for row in rows] == list(range(1, len(rows) + 1))
+
+    for row in rows:
+        count = counts[row["EFFECTIVE_YEAR"]]
+        assert row["count"] == count
+        assert row["difference"] == count - counts[baseline]
+        assert row["ratio"] == pytest.approx(count / counts[baseline], abs=1e-4)
+
+
+def test_comparison_average_with_where(df):
+    result = ComparisonTool().execute(df, {
+        "operation": "average",
+        "group_by": "SITE_COUNTRY",
+        "column": "SCORE",
+        "values": ["Ghana", "Nigeria", "Atlantis"],
+        "where": {"range": {"EFFECTIVE_YEAR": {"gte": 2023}}},
+    })
+
+    recent = df[df["EFFECTIVE_YEAR"] >= 2023]
+    expected = recent.groupby("SITE_COUNTRY", observed=True)["SCORE"].mean()
+
+    # Groups without records have no average and are left out
+    by_country = {row["SITE_COUNTRY"]: row for row in result["results"]}
+    assert set(by_country) == {"Ghana", "Nigeria"}
+    assert result["baseline"] == "Ghana"
+    assert by_country["Nigeria"]["average"] == pytest.approx(expected["Nigeria"], abs=1e-4)
+    assert by_country["Nigeria"]["ratio"] == pytest.approx(expected["Nigeria"] / expected["Ghana"], abs=1e-3)
+
+    with pytest.raises(ValueError):
+        ComparisonTool().execute(df, {"group_by": "SITE_COUNTRY", "values": ["Ghana"]})
+
+
+# -------------------------------------------------------------------
+# TEST: `where` trees on list / direct / aggregation
+# -------------------------------------------------------------------
+def test_tools_accept_where_trees(df, raw_df, df_manager):
+    where = {"and": [
+        {"range": {"EFFECTIVE_YEAR": {"gte": 2023}}},
+        {"not": {"is_null": "SCORE"}},
+    ]}
+    mask = (raw_df["EFFECTIVE_YEAR"] >= 2023) & raw_df["SCORE"].notna()
+
+    direct = DirectQueryTool(df_manager).execute(df, {"where": where})
+    assert direct["value"] == int(mask.sum())
+
+    listed = ListTool(df_manager).execute(df, {"where": where, "columns": ["EFFECTIVE_YEAR"], "limit": 1000})
+    assert len(listed["results"]) == min(1000, int(mask.sum()))
+    assert all(row["EFFECTIVE_YEAR"] >= 2023 for row in listed["results"])
+
+    aggregated = AggregationTool(df_manager).execute(
+        df, {"operation": "average", "group_by": "CATEGORY", "column": "SCORE", "where": where}
+    )
+    expected = raw_df[mask].groupby("CATEGORY")["SCORE"].mean()
+    actual = {row["CATEGORY"]: row["average"] for row in aggregated["results"]}
+
+    assert actual.keys() == expected.to_dict().keys()
+    for category, value in expected.items():
+        assert actual[category] == pytest.approx(value)
+
+
+# -------------------------------------------------------------------
+# TEST: Rows scanned reflect index and cube use, not the frame size
+# -------------------------------------------------------------------
+def test_rows_scanned_reflect_indexes(df, df_manager):
+    def scanned(tool, params):
+        with count_rows_scanned() as counter:
+            tool.execute(df, params)
+        return counter[0]
+
+    count = {"operation": "count", "group_by": "CATEGORY"}
+    assert scanned(AggregationTool(df_manager), count) == 0          # cube
+    assert scanned(AggregationTool(), count) == len(df)              # live group-by
+
+    filters = {"filters": {"CATEGORY": "Breastfeeding Support"}}
+    matches = int((df["CATEGORY"] == "Breastfeeding Support").sum())
+    assert scanned(DirectQueryTool(df_manager), filters) == matches  # index candidates
+    assert scanned(DirectQueryTool(), filters) == len(df)            # mask
+
+
+# -------------------------------------------------------------------
+# TEST: Tools are traced through BaseTool, including new subclasses
+# -------------------------------------------------------------------
+def test_tools_are_traced_automatically(df, df_manager):
+    class HeadTool(BaseTool):
+        name = "head"
+
+        def execute(self, df, params):
+            return {"tool": self.name, "results": df.head(3).to_dict(orient="records")}
+
+    params = {"filters": {"CATEGORY": "Breastfeeding Support"}, "contains": {"QUESTION": "leave"}}
+
+    with start_trace("test") as root:
+        HeadTool().execute(df, {})
+        result = ListTool(df_manager).execute(df=df, params=params)
+
+    head, listed = root.children
+    assert head.name == "tool.head"
+    assert head.attributes == {"rows_in": len(df), "rows_out": 3}
+
+    assert listed.name == "tool.list"
+    assert listed.attributes["rows_out"] == len(result["results"])
+    operations = [child.name for child in listed.children]
+    assert operations == ["list.filter", "list.text_substring", "list.materialize"]
+    assert all(child.duration_ms is not None for child in listed.children)
+
+    # Untraced calls record nothing
+    assert len(ListTool(df_manager).execute(df, params)["results"]) == len(result["results"])
@@ -0,0 +1,402 @@
+import asyncio
+import time
+import httpx
+import openai
+import pytest
+
+from app.agents.plan_cache import canonical_query
+from app.utils.fake_openai_server import create_fake_openai_app
+from app.utils.llm_client import AsyncAzureOpenAIClient
+from app.utils.llm_replay import RecordingLLMClient, ReplayLLMClient, ReplayMissError
+from app.utils.metrics import LLM_PROMPT_TOKENS, MetricsRegistry
+from app.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LatencyTracker,
+    ResilientLLMClient,
+)
+from app.utils.result_cache import ResultCache
+from app.utils.single_flight import SingleFlight
+from app.utils.token_estimator import estimate_tokens
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+# -------------------------------------------------------------------
+# TEST 1: Canonical keys ignore dict order and null params
+# -------------------------------------------------------------------
+def test_result_cache_key_is_canonical():
+    a = ResultCache.make_key("list", {"filters": {"A": 1, "B": 2}, "limit": None}, 1)
+    b = ResultCache.make_key("list", {"filters": {"B": 2, "A": 1}}, 1)
+    c = ResultCache.make_key("list", {"filters": {"A": 1, "B": 2}}, 2)
+
+    assert a == b
+    assert a != c
+
+
+# -------------------------------------------------------------------
+# TEST 2: TTL expiry and hit/miss counters
+# -------------------------------------------------------------------
+def test_result_cache_ttl():
+    clock = FakeClock()
+    cache = ResultCache(max_bytes=1024, ttl_seconds=10, clock=clock)
+
+    cache.put("k", 1, {"value": 1})
+    assert cache.get("k", 1) == {"value": 1}
+
+    clock.now = 11
+    assert cache.get("k", 1) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+# -------------------------------------------------------------------
+# TEST 3: Byte-bounded LRU eviction
+# -------------------------------------------------------------------
+def test_result_cache_lru_eviction():
+    cache = ResultCache(max_bytes=70, ttl_seconds=60)
+
+    cache.put("a", 1, {"value": "x" * 20})
+    cache.put("b", 1, {"value": "y" * 20})
+    assert cache.get("a", 1) is not None
+
+    cache.put("c", 1, {"value": "z" * 20})
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+# -------------------------------------------------------------------
+# TEST 4: A new dataset generation invalidates everything
+# -------------------------------------------------------------------
+def test_result_cache_generation_invalidation():
+    cache = ResultCache()
+
+    cache.put("k", 1, {"value": 1})
+    assert cache.get("k", 2) is None
+
+    cache.put("k", 2, {"value": 2})
+    assert cache.get("k", 2) == {"value": 2}
+    assert cache.stats()["entries"] == 1
+
+
+# -------------------------------------------------------------------
+# TEST 5: Local token estimate
+# -------------------------------------------------------------------
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    # "initiatives" is 3 tokens, "?" one
+    assert estimate_tokens("How many initiatives?") == 6
+    # Longer text costs proportionally more
+    assert estimate_tokens("word " * 100) == 100
+
+
+# -------------------------------------------------------------------
+# TEST 6: Single-flight coalesces concurrent identical calls
+# -------------------------------------------------------------------
+def test_single_flight_shares_one_computation():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return {"answer": key}
+
+    async def burst():
+        same = [flight.do("q", lambda: compute("q")) for _ in range(20)]
+        other = flight.do("other", lambda: compute("other"))
+        return await asyncio.gather(*same, other)
+
+    results = asyncio.run(burst())
+
+    assert calls.count("q") == 1
+    assert calls.count("other") == 1
+    assert all(r == {"answer": "q"} for r in results[:20])
+    assert flight.stats()["shared"] == 19
+    assert flight.stats()["in_flight"] == 0
+
+    # Finished keys are forgotten: the next call computes again
+    asyncio.run(flight.do("q", lambda: compute("q")))
+    assert calls.count("q") == 2
+
+
+def test_single_flight_keys_only_coalesce_identical_questions():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute(query):
+        calls.append(query)
+        await asyncio.sleep(0.05)
+        return {"answer": query}
+
+    queries = [
+        "initiatives in India and Kenya",
+        "Initiatives  in India and Kenya?",
+        "initiatives in India or Kenya",
+    ]
+
+    async def burst():
+        return await asyncio.gather(*(
+            flight.do(canonical_query(q), lambda q=q: compute(q)) for q in queries
+        ))
+
+    results = asyncio.run(burst())
+
+    assert calls == [queries[0], queries[2]]
+    assert results[1] == results[0]
+    assert results[2] == {"answer": queries[2]}
+
+
+def test_single_flight_shares_errors():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad plan")
+
+    async def burst():
+        return await asyncio.gather(
+            *(flight.do("q", fail) for _ in range(3)),
+            return_exceptions=True
+        )
+
+    errors = asyncio.run(burst())
+
+    assert all(isinstance(e, ValueError) for e in errors)
+    assert flight.stats()["calls"] == 1
+
+
+# -------------------------------------------------------------------
+# TEST 7: Circuit breaker, retries, deadlines and hedging
+# -------------------------------------------------------------------
+class FlakyLLM:
+    """Async LLM whose calls follow a script of delays / errors."""
+
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+
+    async def chat(self, messages):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        await asyncio.sleep(step)
+        return f"reply after {step}"
+
+
+def test_circuit_breaker_opens_and_half_opens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.now = 10
+    assert breaker.allow()          # one probe
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_resilient_client_retries_transient_errors():
+    llm = FlakyLLM(asyncio.TimeoutError(), 0.0)
+    client = ResilientLLMClient(llm, backoff_seconds=0.001, hedge_percentile=None)
+
+    assert asyncio.run(client.chat([])) == "reply after 0.0"
+    assert llm.calls == 2
+    assert client.retries == 1
+
+
+def test_resilient_client_deadline_then_circuit_opens():
+    llm = FlakyLLM(1.0)
+    client = ResilientLLMClient(
+        llm,
+        timeout_seconds=0.02,
+        max_retries=1,
+        backoff_seconds=0.001,
+        hedge_percentile=None,
+        breaker=CircuitBreaker(failure_threshold=2),
+    )
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.chat([]))
+    assert client.timeouts == 2
+
+    # Fails fast without calling the endpoint
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.chat([]))
+    assert llm.calls == 2
+
+
+def test_resilient_client_hedges_slow_calls():
+    latency = LatencyTracker(min_samples=1)
+    latency.record(0.01)
+    llm = FlakyLLM(1.0, 0.0)
+    client = ResilientLLMClient(llm, hedge_percentile=95, latency=latency)
+
+    started = time.perf_counter()
+    assert asyncio.run(client.chat([])) == "reply after 0.0"
+
+    assert time.perf_counter() - started < 0.5
+    assert client.hedges == 1 and client.hedge_wins == 1
+
+
+def test_cancelled_half_open_probe_releases_the_slot():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+
+    client = ResilientLLMClient(FlakyLLM(1.0), hedge_percentile=None, breaker=breaker)
+
+    async def cancel_probe():
+        probe = asyncio.ensure_future(client.chat([]))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(cancel_probe())
+
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_hedged_calls_feed_the_latency_window():
+    latency = LatencyTracker(min_samples=1)
+    latency.record(0.01)
+    client = ResilientLLMClient(FlakyLLM(0.05), hedge_percentile=95, latency=latency)
+
+    asyncio.run(client.chat([]))
+
+    assert client.hedges == 1
+    assert latency.percentile(100) >= 0.05
+
+
+# -------------------------------------------------------------------
+# TEST 8: Record / replay and the fake chat-completions server
+# -------------------------------------------------------------------
+class EchoLLM:
+    async def chat(self, messages):
+        return "echo: " + messages[-1]["content"]
+
+    async def stream_chat(self, messages):
+        for token in ["a", "b"]:
+            yield token
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "recordings.jsonl")
+    recorder = RecordingLLMClient(EchoLLM(), path)
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def record():
+        reply = await recorder.chat(messages)
+        tokens = [t async for t in recorder.stream_chat(messages)]
+        return reply, tokens
+
+    recorded = asyncio.run(record())
+
+    replay = ReplayLLMClient(path)
+
+    async def play():
+        reply = await replay.chat(messages)
+        tokens = [t async for t in replay.stream_chat(messages)]
+        return reply, tokens
+
+    assert asyncio.run(play()) == recorded == ("echo: hi", ["a", "b"])
+
+    with pytest.raises(ReplayMissError):
+        asyncio.run(replay.chat([{"role": "user", "content": "never recorded"}]))
+
+
+def _fake_server_client(**server_kwargs):
+    app = create_fake_openai_app(**server_kwargs)
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    return AsyncAzureOpenAIClient(http_client=http_client, max_retries=0)
+
+
+def test_fake_server_speaks_chat_completions():
+    client = _fake_server_client(responder=lambda body: {"content": "hello there"})
+
+    async def calls():
+        reply = await client.chat([{"role": "user", "content": "hi"}])
+        tokens = [t async for t in client.stream_chat([{"role": "user", "content": "hi"}])]
+        tool = await client.chat_with_tools(
+            [{"role": "user", "content": "hi"}],
+            [{"type": "function", "function": {"name": "none", "parameters": {"type": "object"}}}],
+        )
+        await client.aclose()
+        return reply, tokens, tool
+
+    reply, tokens, tool = asyncio.run(calls())
+
+    assert reply == "hello there"
+    assert "".join(tokens) == "hello there"
+    assert tool == {"content": "hello there"}
+
+
+def test_fake_server_failures_open_the_circuit():
+    client = ResilientLLMClient(
+        _fake_server_client(error_rate=1.0),
+        max_retries=1,
+        backoff_seconds=0.001,
+        hedge_percentile=None,
+        breaker=CircuitBreaker(failure_threshold=2),
+    )
+
+    with pytest.raises(openai.InternalServerError):
+        asyncio.run(client.chat([{"role": "user", "content": "hi"}]))
+
+    assert client.breaker.state == "open"
+
+
+# -------------------------------------------------------------------
+# TEST: Metrics registry (Prometheus text format)
+# -------------------------------------------------------------------
+def test_metrics_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ["route"])
+    latency = registry.histogram("latency_seconds", "Latency", ["stage"], buckets=[0.1, 1.0])
+
+    requests.inc(route="/api/chat")
+    requests.inc(2, route="/api/chat")
+    latency.observe(0.05, stage="plan")
+    latency.observe(0.5, stage="plan")
+    latency.observe(5.0, stage="plan")
+
+    text = registry.render()
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/api/chat"} 3' in text
+    assert 'latency_seconds_bucket{stage="plan",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="plan",le="1"} 2' in text
+    assert 'latency_seconds_bucket{stage="plan",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="plan"} 3' in text
+    assert registry.counter("requests_total", "Requests") is requests
+
+
+def test_llm_client_records_token_usage():
+    client = _fake_server_client(responder=lambda body: {"content": "hello there"})
+    before = LLM_PROMPT_TOKENS.value(method="chat")
+
+    async def call():
+        reply = await client.chat([{"role": "user", "content": "count the initiatives"}])
+        await client.aclose()
+        return reply
+
+    assert asyncio.run(call()) == "hello there"
+    assert LLM_PROMPT_TOKENS.value(method="chat") > before